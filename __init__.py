@@ -3,6 +3,7 @@ from flask_login import LoginManager
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy import event
 from dotenv import load_dotenv
 import os
 
@@ -37,8 +38,19 @@ app.config['SECRET_KEY'] = SECRET_KEY
 app.config['SESSION_COOKIE_NAME'] = SESSION_COOKIE_NAME 
 app.config['JWT_TOKEN_NAME'] = JWT_TOKEN_NAME 
 
+# Authenticated user cache settings, a size of 0 disables the cache
+app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE') or 1024)  # users kept per worker
+app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL') or 30)  # seconds before a user is reloaded
+app.config['USER_CACHE_STAMP'] = os.environ.get('USER_CACHE_STAMP') or os.path.join(app.instance_path, 'user-cache.stamp')  # moved forward on every user change, read by every worker
+
+# Password hashing settings, new hashes use PASSWORD_HASH_ITERATIONS and existing hashes keep their own count
+app.config['PASSWORD_HASH_ITERATIONS'] = int(os.environ.get('PASSWORD_HASH_ITERATIONS') or 600000)  # pbkdf2:sha256 cost
+# Every server worker has its own hashing pool, so the CPUs are divided between the gunicorn workers
+SERVER_WORKERS = int(os.environ.get('GUNICORN_WORKERS') or 1)
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS') or max(1, (os.cpu_count() or 1) // SERVER_WORKERS))  # hashing processes per worker, 0 hashes on the request thread
+
 # Database settings 
-dbName = 'frostbyte_data'
+dbName = os.environ.get('DB_NAME') or 'frostbyte_data'  # the tests use their own database
 DB_ENDPOINT = os.environ.get('DB_ENDPOINT') or None
 DB_USERNAME = os.environ.get('DB_USERNAME') or None
 DB_PASSWORD = os.environ.get('DB_PASSWORD') or None
@@ -64,14 +76,84 @@ app.config['SQLALCHEMY_DATABASE_STRING'] = dbString
 app.config['SQLALCHEMY_DATABASE_URI'] = dbURI
 app.config['SQLALCHEMY_BACKUP_URI'] = backupURI
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Connection pool of each server worker process, sized to the worker's request threads (see gunicorn.conf.py)
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE') or os.environ.get('GUNICORN_THREADS') or 5)  # connections kept open per worker
+app.config['DB_POOL_OVERFLOW'] = int(os.environ.get('DB_POOL_OVERFLOW') or 10)  # extra connections opened under load
+app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE') or 280)  # seconds before a MySQL connection is replaced
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': app.config['DB_POOL_SIZE'],
+    'max_overflow': app.config['DB_POOL_OVERFLOW'],
+}
+if DB_ENDPOINT and DB_USERNAME and DB_PASSWORD:
+    # Replace connections before the server's wait_timeout closes them, and check each one when it is checked out
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'].update(pool_recycle=app.config['DB_POOL_RECYCLE'], pool_pre_ping=True)
+# SQLite settings applied to every new connection, WAL lets readers run alongside the one writer
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS') or 5000)  # wait for the write lock before "database is locked"
+app.config['SQLITE_CACHE_SIZE_KB'] = int(os.environ.get('SQLITE_CACHE_SIZE_KB') or 20000)  # page cache per connection
+app.config['SQLITE_MMAP_SIZE_MB'] = int(os.environ.get('SQLITE_MMAP_SIZE_MB') or 256)  # database read through memory mapping, 0 disables
+# Writes that fail on a lock are rolled back and run again with exponential backoff (see model/retry.py)
+app.config['DB_LOCK_RETRIES'] = int(os.environ.get('DB_LOCK_RETRIES') or 5)  # attempts after the first
+app.config['DB_LOCK_BACKOFF_MS'] = int(os.environ.get('DB_LOCK_BACKOFF_MS') or 20)  # wait before the first retry, doubled each time
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
 
+if dbURI.startswith('sqlite'):
+    with app.app_context():
+        @event.listens_for(db.engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            """Applies the SQLite performance settings to a new connection."""
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
+            cursor.execute(f"PRAGMA busy_timeout={app.config['SQLITE_BUSY_TIMEOUT_MS']}")
+            cursor.execute(f"PRAGMA cache_size=-{app.config['SQLITE_CACHE_SIZE_KB']}")
+            cursor.execute(f"PRAGMA mmap_size={app.config['SQLITE_MMAP_SIZE_MB'] * 1024 * 1024}")
+            cursor.execute('PRAGMA temp_store=MEMORY')
+            cursor.close()
+
+# Chatbot settings, asynchronous replies are generated by a bounded pool of worker threads
+app.config['CHATBOT_WORKERS'] = int(os.environ.get('CHATBOT_WORKERS') or 4)  # concurrent model calls per server worker
+app.config['CHATBOT_QUEUE_SIZE'] = int(os.environ.get('CHATBOT_QUEUE_SIZE') or 32)  # queued plus running prompts before POSTs get 503
+app.config['CHATBOT_MAX_WAIT'] = int(os.environ.get('CHATBOT_MAX_WAIT') or 30)  # longest long-poll in seconds
+app.config['CHATBOT_SESSIONS'] = int(os.environ.get('CHATBOT_SESSIONS') or 256)  # signed in users with a chat session per server worker
+app.config['CHATBOT_HISTORY_TOKENS'] = int(os.environ.get('CHATBOT_HISTORY_TOKENS') or 2000)  # estimated tokens of history sent with each prompt
+
+# Chatbot response cache settings, a size of 0 disables the cache and a similarity of 0 only matches exact prompts
+app.config['CHATBOT_CACHE_SIZE'] = int(os.environ.get('CHATBOT_CACHE_SIZE') or 1000)  # cached responses kept in the database
+app.config['CHATBOT_CACHE_TTL'] = int(os.environ.get('CHATBOT_CACHE_TTL') or 7 * 24 * 3600)  # seconds before a response is regenerated
+app.config['CHATBOT_CACHE_SIMILARITY'] = float(os.environ.get('CHATBOT_CACHE_SIMILARITY') or 0)  # shingle similarity (0-1) for near-duplicate prompts
+
+# Analytics ingestion settings, single events are written in batches when ANALYTICS_BUFFER_MS is above 0
+app.config['ANALYTICS_BUFFER_MS'] = int(os.environ.get('ANALYTICS_BUFFER_MS') or 0)  # longest wait before buffered events are written
+app.config['ANALYTICS_BUFFER_ROWS'] = int(os.environ.get('ANALYTICS_BUFFER_ROWS') or 500)  # buffered events that trigger an early write
+app.config['ANALYTICS_BUFFER_MAX'] = int(os.environ.get('ANALYTICS_BUFFER_MAX') or 50000)  # most events held, the oldest are dropped beyond it
+
+# Weather settings, conditions are cached per rounded location and city names are geocoded once
+app.config['WEATHER_API_URL'] = os.environ.get('WEATHER_API_URL') or 'http://api.weatherapi.com/v1/current.json'
+app.config['WEATHER_API_KEY'] = os.environ.get('WEATHER_API_KEY') or '9bb9d39671474da4b83164647252402'
+app.config['WEATHER_TTL'] = int(os.environ.get('WEATHER_TTL') or 300)  # seconds current conditions are reused
+app.config['WEATHER_GEOCODE_TTL'] = int(os.environ.get('WEATHER_GEOCODE_TTL') or 24 * 3600)  # seconds a city's coordinates are reused
+app.config['WEATHER_TIMEOUT'] = int(os.environ.get('WEATHER_TIMEOUT') or 5)  # seconds before an upstream call is abandoned
+app.config['WEATHER_POOL_SIZE'] = int(os.environ.get('WEATHER_POOL_SIZE') or 10)  # pooled upstream connections
+app.config['WEATHER_REFRESH_INTERVAL'] = int(os.environ.get('WEATHER_REFRESH_INTERVAL') or 600)  # seconds between park refreshes, 0 disables
+app.config['WEATHER_HISTORY_DAYS'] = int(os.environ.get('WEATHER_HISTORY_DAYS') or 7)  # days of park observations kept
+app.config['WEATHER_LOCK_FILE'] = os.environ.get('WEATHER_LOCK_FILE') or os.path.join(app.instance_path, 'weather-refresher.lock')  # held by the one worker refreshing parks
+
 # Image upload settings 
 app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # maximum size of uploaded content
 app.config['UPLOAD_EXTENSIONS'] = ['.jpg', '.png', '.gif']  # supported file types
 app.config['UPLOAD_FOLDER'] = os.path.join(app.instance_path, 'uploads')
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+app.config['IMAGE_MAX_PIXELS'] = int(os.environ.get('IMAGE_MAX_PIXELS') or 50_000_000)  # largest width x height decoded, about 200 MB as RGBA
+app.config['IMAGE_WORKERS'] = int(os.environ.get('IMAGE_WORKERS') or 3)  # threads resizing upload variants, 0 resizes on the request thread
+
+# Metrics settings
+app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR') or os.path.join(app.instance_path, 'metrics')  # snapshot file per server worker
+app.config['METRICS_FLUSH_SECONDS'] = int(os.environ.get('METRICS_FLUSH_SECONDS') or 15)  # seconds between snapshots, 0 reports this worker only
+app.config['QUERY_LOG_SIZE'] = int(os.environ.get('QUERY_LOG_SIZE') or 1000)  # query fingerprints kept per window, 0 disables the slow-query log
+app.config['QUERY_LOG_SLOW_MS'] = int(os.environ.get('QUERY_LOG_SLOW_MS') or 100)  # statements slower than this are listed individually
+app.config['QUERY_LOG_WINDOW'] = int(os.environ.get('QUERY_LOG_WINDOW') or 3600)  # seconds per window, the log covers the last one to two
+app.config['QUERY_LOG_N_PLUS_ONE'] = int(os.environ.get('QUERY_LOG_N_PLUS_ONE') or 10)  # runs of one query in a request that flag an N+1 pattern
 
 # GITHUB settings
 app.config['GITHUB_API_URL'] = 'https://api.github.com'
@@ -2,7 +2,9 @@ from flask import Blueprint, request, jsonify
 from flask_restful import Api, Resource
 from __init__ import app
 from __init__ import db
-from model.analytics import Analytics
+from model.analytics import Analytics, analytics_buffer
+from model.bulk import BulkInsertError
+from model.rating_stats import ChannelRatingStats
 
 # Define a Blueprint for the analytics API
 analytics_blueprint = Blueprint('analytics', __name__, url_prefix='/api')
@@ -23,6 +25,11 @@ class AnalyticsAPI:
             if not all(field in data for field in required_fields):
                 return {'message': 'Missing required fields'}, 400
 
+            # With the write-behind buffer on, the entry is queued and written with the next batch
+            if analytics_buffer.enabled:
+                analytics_buffer.add({field: data[field] for field in required_fields})
+                return {'message': 'Analytics entry queued'}, 202
+
             # Create and save a new analytics entry
             try:
                 analytics = Analytics(
@@ -63,55 +70,36 @@ class AnalyticsAPI:
             if not isinstance(data_list, list):
                 return {'message': 'Expected a list of analytics data'}, 400
 
-            results = {'success': 0, 'errors': []}
-
-            for data in data_list:
-                try:
-                    # Validate input
-                    required_fields = ['channel_id', 'user_id', 'stars']
-                    if not all(field in data for field in required_fields):
-                        raise ValueError('Missing required fields')
-
-                    # Create and save analytics entry
-                    analytics = Analytics(
-                        channel_id=data['channel_id'],
-                        user_id=data['user_id'],
-                        stars=data['stars'],
-                    )
-                    analytics.create() 
-                    results['success'] += 1
-                except Exception as e:
-                    results['errors'].append({'data': data, 'error': str(e)})
+            # Validate every entry, then insert the valid ones in batched transactions
+            try:
+                results = Analytics.bulk_create(data_list)
+            except BulkInsertError as e:
+                # The chunks before the failure are committed, pending lists the indexes of the entries to send again
+                return e.results, 503
 
-            return jsonify(results), 207
+            return results, 207 if results['errors'] else 201
 
     class _SUMMARY(Resource):
         def get(self):
             """
-            Retrieve overall analytics summary data (reviews, stars) for all parks.
+            Retrieve overall analytics summary data (reviews, stars) for all parks,
+            read from the per channel totals in channel_rating_stats.
             """
             try:
-                analytics_summary = (
-                    db.session.query(
-                        Analytics.channel_id,
-                        db.func.avg(Analytics.stars).label('stars'),
-                        db.func.count(Analytics.id).label('total_reviews')
-                    )
-                    .group_by(Analytics.channel_id)
-                    .all()
-                )
+                analytics_summary = ChannelRatingStats.summary('analytics')
 
                 if not analytics_summary:
                     return {'message': 'No analytics data available'}, 404
 
-                return jsonify([
+                return [
                     {
-                        "channel_id": entry.channel_id,
-                        "stars": round(entry.stars, 1),
-                        "total_reviews": entry.total_reviews
+                        "channel_id": stats['channel_id'],
+                        "stars": stats['average'],
+                        "total_reviews": stats['count'],
+                        "histogram": stats['histogram']
                     }
-                    for entry in analytics_summary
-                ]), 200
+                    for stats in (entry.read() for entry in analytics_summary)
+                ], 200
             except Exception as e:
                 return {'message': f'An error occurred: {str(e)}'}, 500
 
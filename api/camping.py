@@ -6,6 +6,7 @@ from __init__ import app
 from api.jwt_authorize import token_required
 from model.camping_post import camping
 from model.channel import Channel
+from model.serializer import bulk_read
 
 
 camping_api = Blueprint('camping_api', __name__, url_prefix='/api')
@@ -115,8 +116,8 @@ class CampingAPI:
             
             # Find all posts by channel ID and user ID
             camping_posts = camping.query.filter_by(_channel_id=data['channel_id']).all()
-            # Prepare a JSON list of all the posts, using list comprehension
-            json_ready = [campingPost.read() for campingPost in camping_posts]
+            # Prepare a JSON list of all the posts, resolving users and channels in bulk
+            json_ready = bulk_read(camping_posts)
             # Return a JSON list, converting Python dictionaries to JSON format
             return jsonify(json_ready)
 
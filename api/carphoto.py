@@ -2,39 +2,57 @@ from flask import Blueprint, g, request
 from flask_restful import Api, Resource
 from api.jwt_authorize import token_required
 from model.frostbyte import Frostbyte
-from model.carPhoto import car_base64_decode, car_base64_upload, car_file_delete, default_car_decode
+from api.images import wants_base64, image_variant, upload_filename, upload_path, send_image
+from model.carPhoto import car_base64_decode, car_base64_upload, car_file_delete, default_car_decode, default_car_path
 
 car_api = Blueprint('car_photo_api', __name__, url_prefix='/api/id')
 api = Api(car_api)
 
 class _CarPhoto(Resource):
     """
-    Retrieves the current user's Car picture as a base64 encoded string.
+    Retrieves the current user's Car picture as the image file.
 
-    This endpoint allows users to fetch their Car picture. The Car picture is returned as a base64 encoded string,
-    which can be directly used in the src attribute of an img tag on the client side. This method ensures that only the
+    This endpoint allows users to fetch their Car picture. The Car picture is sent as the binary image,
+    with an ETag and Last-Modified so the client can revalidate its copy and get a 304 when it is unchanged.
+    A smaller copy is sent with ?size=thumb or ?size=medium. With ?format=base64 the picture is instead returned as a base64 encoded string in JSON, which can be directly
+    used in the src attribute of an img tag on the client side. This method ensures that only the
     authenticated user can access their Car picture.
 
     The process involves:
     1. Verifying the user's authentication and retrieving the current user object.
-    2. Checking if the current user has a Car picture set.
-    3. If a Car picture is set, the image file is read, and its content is base64 encoded.
-    4. The base64 encoded string of the image is returned in the response.
+    2. Checking if the current user has a Car picture set, falling back to the default picture if not.
+    3. The image file is sent, or read and base64 encoded when asked for.
 
     Returns:
-    - A JSON object containing the base64 encoded string of the Car picture under the key 'car' if the operation is successful.
+    - The image, or a JSON object containing the base64 encoded string of the Car picture under the key 'car'.
     - HTTP status code 200 if the Car picture is successfully retrieved.
-    - HTTP status code 404 if the Car picture is not set for the current user.
+    - HTTP status code 304 if the client's copy of the Car picture is current.
+    - HTTP status code 400 if the size is not thumb, medium or full.
+    - HTTP status code 404 with the default picture if the Car picture is not set for the current user.
     - HTTP status code 500 if an error occurs while reading the Car picture from the server.
     """
     @token_required()
     def get(self):
         current_user = g.current_user
+        variant = image_variant()
+        if not variant:
+            return {'message': 'Size must be thumb, medium or full.'}, 400
+
+        if not wants_base64():
+            if not current_user.car:
+                response = send_image(default_car_path())
+                response.status_code = 404
+                return response
+            path = upload_path(current_user.uid, current_user.car, variant)
+            if not path:
+                return {'message': 'An error occurred while reading the car picture.'}, 500
+            return send_image(path)
+
         if not current_user.car or current_user.car == "":
             return {"message": "Car picture is not set.",
                     "car": default_car_decode()}, 404
         
-        base64_encode = car_base64_decode(current_user.uid, current_user.car)
+        base64_encode = car_base64_decode(current_user.uid, upload_filename(current_user.uid, current_user.car, variant) or current_user.car)
 
         if not base64_encode:
             return {'message': 'An error occurred while reading the car picture.'}, 500
@@ -97,8 +115,8 @@ class _CarPhoto(Resource):
         Updates the user's Car picture with a new image provided as base64 encoded data.
 
         This endpoint allows users to update their Car picture by sending a PUT request with base64 encoded image data.
-        The image is decoded and saved to a secure location on the server, and the user's profile information is updated
-        to reference the new image file.
+        The image is decoded, checked and saved in thumb, medium and full sizes on the server, and the user's profile
+        information is updated to reference the new image file.
 
         The function requires a valid authentication token and expects the base64 image data to be included in the request's JSON body
         under the key 'car'. If the image data is not provided, or if any error occurs during the upload process or while updating
@@ -107,7 +125,7 @@ class _CarPhoto(Resource):
         Returns:
         - A JSON object with a message indicating the success or failure of the operation.
         - HTTP status code 200 if the Car picture was updated successfully.
-        - HTTP status code 400 if the base64 image data is missing from the request.
+        - HTTP status code 400 if the base64 image data is missing from the request or is not a PNG, JPEG, GIF or WebP image.
         - HTTP status code 500 if an error occurs during the upload process or while updating the database.
         """
         current_user = g.current_user
@@ -117,15 +135,21 @@ class _CarPhoto(Resource):
             return {'message': 'Base64 image data required.'}, 400
         base64_image = request.json['car']
        
-        # Make an image file from the base64 data 
-        filename = car_base64_upload(base64_image, current_user.uid)
+        # Make the image files from the base64 data 
+        try:
+            filename = car_base64_upload(base64_image, current_user.uid)
+        except ValueError as e:
+            return {'message': str(e)}, 400
         if not filename:
             return {'message': 'An error occurred while uploading the Car picture'}, 500
         
         # Update the user's Car picture to the uploaded file
         try:
             # write the filename reference to the database
+            previous = current_user.car
             current_user.update({"car": filename})
+            if previous and previous != filename:
+                car_file_delete(current_user.uid, previous)
             return {'message': 'Car picture updated successfully'}, 200
         except Exception as e:
             return {'message': f'A database error occurred while assigning Car picture: {str(e)}'}, 500
@@ -4,6 +4,7 @@ from flask_restful import Api, Resource  # used for REST API building
 from datetime import datetime
 from __init__ import app
 from api.jwt_authorize import token_required
+from api.pagination import list_response
 from model.channel import Channel
 from model.group import Group
 from model.frostbyte import Frostbyte
@@ -142,17 +143,10 @@ class ChannelAPI:
         
         def get(self):
             """
-            Retrieve all channels.
+            Retrieve all channels, optionally one keyset page at a time (?limit=&after=) or as an NDJSON stream (?format=ndjson).
             """
-            # Find all the channels
-            channels = Channel.query.all()
-            # Prepare a JSON list of all the channels, using list comprehension
-            json_ready = []
-            for channel in channels:
-                channel_data = channel.read()
-                json_ready.append(channel_data)
-            # Return a JSON list, converting Python dictionaries to JSON format
-            return jsonify(json_ready)
+            # Prepare a JSON list of the channels, using list comprehension
+            return list_response(Channel.query, Channel, lambda channels: [channel.read() for channel in channels])
 
     class _BULK_FILTER(Resource):
         @token_required()
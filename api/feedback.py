@@ -5,6 +5,7 @@ from datetime import datetime
 from __init__ import app
 from api.jwt_authorize import token_required
 from model.feedback import Feedback
+from model.serializer import bulk_read
 
 """
 This Blueprint object is used to define APIs for the Feedback model.
@@ -38,7 +39,7 @@ class FeedbackAPI:
             # Obtain the request data sent by the RESTful client API
             data = request.get_json()
             # Create a new feedback object using the data from the request
-            feedback = feedback(data['content'], data['post_id'], current_user.id)
+            feedback = Feedback(data['content'], current_user.id, data['post_id'])
             # Save the feedback object using the Object Relational Mapper (ORM) method defined in the model
             feedback.create()
             # Return response to the client in JSON format, converting Python dictionaries to JSON format
@@ -51,8 +52,8 @@ class FeedbackAPI:
             post_id = data['id']
             # Find all the feedbacks by the current user
             feedbacks = Feedback.query.filter(Feedback._post_id == data['id']).all()
-            # Prepare a JSON list of all the feedbacks, uses for loop shortcut called list comprehension
-            json_ready = [feedback.read() for feedback in feedbacks]
+            # Prepare a JSON list of all the feedbacks, resolving users and posts in bulk
+            json_ready = bulk_read(feedbacks)
             # Return a JSON list, converting Python dictionaries to JSON format
             return jsonify(json_ready)
 
@@ -1,13 +1,18 @@
 import jwt
+import json
 import os
-from flask import Blueprint, request, jsonify, current_app, Response, g
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, request, jsonify, current_app, Response, g, stream_with_context
 from flask_restful import Api, Resource  # used for REST API building
 from datetime import datetime
 from __init__ import db, app
-from api.jwt_authorize import token_required
+from api.jwt_authorize import token_required, current_user_or_none
 import google.generativeai as genai
 from dotenv import load_dotenv
-from model.gemini import AIMessage
+from model.gemini import AIMessage, response_cache
 
 # Define Flask Blueprint and API
 gemini_api = Blueprint('gemini_api', __name__, url_prefix='/api')
@@ -44,36 +49,331 @@ model = genai.GenerativeModel(
     system_instruction=system_instruction,
 )
 
-class Chatbot(Resource):
-    def __init__(self):
-        self.history = []
-        self.chat_session = model.start_chat(history=self.history)  # Persistent session
+FALLBACK_RESPONSE = "Sorry, I couldn't process that."
+
+
+def lookup_response(user_input, history, path):
+    """
+    Looks up the cached response of a prompt. A prompt that starts a conversation, or a standalone prompt in any
+    conversation, has a response that does not depend on earlier messages and is shared through the cache.
+
+    Args:
+        user_input (str): The prompt.
+        history (list): The earlier messages of the conversation, empty or None for a new conversation.
+        path (str): The path the prompt came from, eg chat, stream or async, for the cache counters.
+
+    Returns:
+        tuple: Whether the response of the prompt can be cached, and the cached response or None.
+    """
+    if history and not response_cache.standalone(user_input):
+        response_cache.uncacheable(path)
+        return False, None
+    return True, response_cache.get(user_input, path)
+
+
+def generate_ai_response(user_input, chat_session=None, path="anonymous"):
+    """
+    Generates a response from the Google Generative AI model, in a new chat session unless one is given.
+    Prompts that do not depend on earlier context are answered from the response cache when possible, without calling the model.
+    """
+    cacheable, cached = lookup_response(user_input, chat_session.history if chat_session else None, path)
+    if cached is not None:
+        return cached
+    return model_response(user_input, chat_session, cacheable) or FALLBACK_RESPONSE
+
+
+def model_response(user_input, chat_session=None, cacheable=False):
+    """
+    Sends a prompt to the model, in a new chat session unless one is given, and returns the response text or None
+    when the model fails. A cacheable response is only cached when the chat had no history, so the shared answer
+    never depends on one user's conversation.
+    """
+    shared = cacheable and (chat_session is None or not chat_session.history)
+    try:
+        if chat_session is None:
+            chat_session = model.start_chat(history=[])
+        response = chat_session.send_message(user_input)
+        if not response.text:
+            return None
+    except Exception as e:
+        print(f"Error generating AI response: {str(e)}")
+        return None
+    response_text = response.text.rstrip("\n")
+    if shared:
+        response_cache.set(user_input, response_text)
+    return response_text
+
 
-    def generate_ai_response(self, user_input):
-        """Generates a response from the Google Generative AI model."""
+def stream_ai_response(user_input, chat_session=None, path="anonymous"):
+    """
+    Yields the response from the Google Generative AI model in pieces as the model produces them, in a new chat
+    session unless one is given. For prompts that do not depend on earlier context a cached response is yielded
+    in one piece, and a completed response is added to the cache.
+    """
+    cacheable, cached = lookup_response(user_input, chat_session.history if chat_session else None, path)
+    if cached is not None:
+        yield cached
+        return
+    yield from model_stream(user_input, chat_session, cacheable)
+
+
+def model_stream(user_input, chat_session=None, cacheable=False):
+    """
+    Yields the pieces of the model response to a prompt, and caches a cacheable response once it is complete
+    when the chat had no history.
+    """
+    shared = cacheable and (chat_session is None or not chat_session.history)
+    if chat_session is None:
+        chat_session = model.start_chat(history=[])
+    parts = []
+    for chunk in chat_session.send_message(user_input, stream=True):
+        if chunk.text:
+            parts.append(chunk.text)
+            yield chunk.text
+    if parts and shared:
+        response_cache.set(user_input, "".join(parts).rstrip("\n"))
+
+
+class ChatQueue:
+    """
+    Runs chatbot generations in a bounded pool of worker threads.
+
+    A prompt is accepted only while fewer than CHATBOT_QUEUE_SIZE prompts are queued or running, so slow model
+    calls never pile up without limit. The reply is written to its pending AIMessage row when it is ready and
+    any request long-polling for it is woken up.
+    """
+    def __init__(self, workers, queue_size):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chatbot")
+        self.slots = threading.BoundedSemaphore(queue_size)
+        self.events = {}  # message id -> Event set when the reply is stored
+        self.running = 0  # prompts being generated, the other events are still queued
+        self.lock = threading.Lock()
+
+    def submit(self, ai_message_id, user_input, user_id=None):
+        """
+        Queue a prompt for the pending AI message, returns False if the queue is full.
+        The prompt of a signed in user is answered in their pooled chat session.
+        """
+        if not self.slots.acquire(blocking=False):
+            return False
+        with self.lock:
+            self.events[ai_message_id] = threading.Event()
+        self.executor.submit(self._generate, ai_message_id, user_input, user_id)
+        return True
+
+    def waiting(self):
+        """Returns the number of queued prompts that no worker thread has started yet."""
+        with self.lock:
+            return len(self.events) - self.running
+
+    def _generate(self, ai_message_id, user_input, user_id):
+        """Generate the reply and store it in the pending AI message, runs on a worker thread."""
+        with self.lock:
+            self.running += 1
         try:
-            response = self.chat_session.send_message(user_input)
-            return response.text.rstrip("\n") if response.text else "Sorry, I couldn't process that."
+            with app.app_context():
+                if user_id is None:
+                    response_text = generate_ai_response(user_input)
+                else:
+                    response_text = chat_sessions.send(user_id, user_input, "async")
+                ai_message = AIMessage.query.get(ai_message_id)
+                if ai_message:
+                    ai_message.update({"message": response_text, "category": "ai_response"})
         except Exception as e:
-            print(f"Error generating AI response: {str(e)}")
-            return "Sorry, I couldn't process that."
-
-
-    def update_history(self, role: str, message: str):
-        """Update the conversation history and save messages to the database."""
-        if len(self.history) >= self.MAX_HISTORY:
-            self.history.pop(0)  # Maintain a maximum history length
-        self.history.append({"role": role, "parts": [message]})
-
-        ai_message = AIMessage(
-            message=message,
-            author=role,
-            category="response" if role == "assistant" else "user"
-        )
-        ai_message.create()
-        return ai_message.id  # Return the ID of the created message
-    
-    
+            print(f"Error storing AI response {ai_message_id}: {str(e)}")
+        finally:
+            self.slots.release()
+            with self.lock:
+                self.running -= 1
+                event = self.events.pop(ai_message_id, None)
+            if event:
+                event.set()
+
+    def wait(self, ai_message_id, timeout):
+        """
+        Wait up to timeout seconds for a reply generated by this process.
+        Replies generated by another server process are picked up by the caller re-reading the row.
+        """
+        with self.lock:
+            event = self.events.get(ai_message_id)
+        if event:
+            event.wait(timeout)
+        else:
+            time.sleep(min(timeout, 0.5))
+
+
+chat_queue = ChatQueue(app.config['CHATBOT_WORKERS'], app.config['CHATBOT_QUEUE_SIZE'])
+
+
+def estimate_tokens(text):
+    """Estimates the number of model tokens in a text, about 4 characters per token."""
+    return len(text) // 4 + 1
+
+
+class ChatSession:
+    """The conversation of one user, the history sent to the model and the chat session built from it."""
+    def __init__(self, history):
+        self.history = history  # [{"role": "user" or "model", "parts": [text]}, ...], oldest first
+        self.tokens = sum(estimate_tokens(turn["parts"][0]) for turn in history)
+        self.chat = None  # model chat session, built on first use and rebuilt after the history is trimmed
+        self.lock = threading.Lock()  # one prompt at a time per user
+
+
+class ChatSessionPool:
+    """
+    Keeps the chat sessions of the most recently active signed in users.
+
+    At most CHATBOT_SESSIONS sessions are kept per server worker, the least recently used is evicted first.
+    The history of a session is capped at about CHATBOT_HISTORY_TOKENS tokens by dropping the oldest exchanges,
+    so the memory of a session and the size of each prompt stay bounded. An evicted session, or one held by
+    another server worker, is rebuilt from the user's saved AIMessage rows the next time it is needed.
+    """
+    def __init__(self, maxsize, token_budget):
+        self.maxsize = maxsize
+        self.token_budget = token_budget
+        self.sessions = OrderedDict()  # user id -> ChatSession
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        """Returns the chat session of a user, rehydrating it from the database when it is not in the pool."""
+        with self.lock:
+            session = self.sessions.get(user_id)
+            if session is not None:
+                self.sessions.move_to_end(user_id)
+                return session
+        session = ChatSession(self._rehydrate(user_id))
+        with self.lock:
+            session = self.sessions.setdefault(user_id, session)
+            self.sessions.move_to_end(user_id)
+            while len(self.sessions) > self.maxsize:
+                self.sessions.popitem(last=False)
+        return session
+
+    def pop(self, user_id):
+        """Drops the session of a user, so it is rebuilt from the database on the next prompt."""
+        with self.lock:
+            self.sessions.pop(user_id, None)
+
+    def _rehydrate(self, user_id):
+        """Loads the newest messages of a user that fit in the token budget, oldest first."""
+        messages = AIMessage.query \
+            .filter(AIMessage._user_id == user_id, AIMessage.category.in_(["user_message", "ai_response"])) \
+            .order_by(AIMessage.id.desc()) \
+            .limit(self.token_budget)  # every message is at least one token
+        history, tokens = [], 0
+        for message in messages:
+            tokens += estimate_tokens(message.message)
+            if tokens > self.token_budget:
+                break
+            history.append({"role": "user" if message.author == "user" else "model", "parts": [message.message]})
+        history.reverse()
+        # The model expects the conversation to start with a user turn and alternate, so a prompt that is
+        # still waiting for its reply, eg a queued async message, is left out
+        while history and history[0]["role"] != "user":
+            history.pop(0)
+        while history and history[-1]["role"] != "model":
+            history.pop()
+        return history
+
+    def send(self, user_id, user_input, path="chat"):
+        """
+        Sends a prompt in the chat session of a user and records the exchange in the session history.
+        A standalone prompt is answered from the response cache when possible, even after earlier messages, and
+        otherwise in a new chat without the history, so the answer can be cached for every user.
+
+        Args:
+            user_id (int): The ID of the signed in user.
+            user_input (str): The prompt.
+            path (str): The path the prompt came from, for the cache counters. Defaults to chat.
+
+        Returns:
+            str: The response text.
+        """
+        session = self.get(user_id)
+        with session.lock:
+            cacheable, response_text = lookup_response(user_input, session.history, path)
+            # A cached answer, or one generated without the history, never reached the session's model chat
+            resend = response_text is not None or cacheable
+            if response_text is None:
+                response_text = model_response(user_input, self._chat(session, cacheable), cacheable)
+            if response_text is None:
+                session.chat = None  # the model chat may hold the unanswered prompt
+                return FALLBACK_RESPONSE
+            self._record(session, user_input, response_text, resend)
+        return response_text
+
+    def stream(self, user_id, user_input):
+        """
+        Sends a prompt in the chat session of a user and yields the response in pieces as the model produces them,
+        then records the exchange in the session history. The session is held until the response is complete.
+
+        Args:
+            user_id (int): The ID of the signed in user.
+            user_input (str): The prompt.
+
+        Yields:
+            str: The pieces of the response text.
+        """
+        session = self.get(user_id)
+        with session.lock:
+            cacheable, cached = lookup_response(user_input, session.history, "stream")
+            if cached is not None:
+                yield cached
+                self._record(session, user_input, cached, True)
+                return
+            parts = []
+            try:
+                for text in model_stream(user_input, self._chat(session, cacheable), cacheable):
+                    parts.append(text)
+                    yield text
+            except BaseException:
+                session.chat = None  # the model session may hold the unanswered prompt, eg the client went away
+                raise
+            if not parts:
+                session.chat = None  # nothing came back, the turn is not recorded
+                return
+            self._record(session, user_input, "".join(parts).rstrip("\n"), cacheable)
+
+    def _chat(self, session, cacheable):
+        """
+        Returns the model chat to answer a prompt in. A cacheable prompt gets a new chat without the history, so
+        the cached answer carries nothing of the user's conversation, other prompts the session's chat.
+        """
+        if cacheable:
+            return model.start_chat(history=[])
+        if session.chat is None:
+            session.chat = model.start_chat(history=list(session.history))
+        return session.chat
+
+    def _record(self, session, user_input, response_text, resend):
+        """Adds an exchange to the session history, trimming the oldest exchanges beyond the token budget."""
+        session.history.append({"role": "user", "parts": [user_input]})
+        session.history.append({"role": "model", "parts": [response_text]})
+        session.tokens += estimate_tokens(user_input) + estimate_tokens(response_text)
+        trimmed = False
+        while session.tokens > self.token_budget and len(session.history) > 2:
+            for turn in session.history[:2]:
+                session.tokens -= estimate_tokens(turn["parts"][0])
+            del session.history[:2]
+            trimmed = True
+        # An answer from outside the session's model chat, or a trimmed history, is resent with the history
+        if trimmed or resend:
+            session.chat = None
+
+
+chat_sessions = ChatSessionPool(app.config['CHATBOT_SESSIONS'], app.config['CHATBOT_HISTORY_TOKENS'])
+
+
+class Chatbot(Resource):
+    def generate_ai_response(self, user_input, user):
+        """
+        Generates a response from the Google Generative AI model, in the pooled chat session of a signed in user
+        so earlier messages are kept as context, or as a single prompt for anonymous users.
+        """
+        if user is None:
+            return generate_ai_response(user_input)
+        return chat_sessions.send(user.id, user_input)
+
     def post(self):
         """Handles POST requests to send a message and get a response."""
         try:
@@ -85,19 +385,16 @@ class Chatbot(Resource):
             if not user_input:
                 return jsonify({"error": "User input is required"}), 400
 
-            # Save the user's message to the database and get its ID
-            user_message = AIMessage(message=user_input, author="user", category="user_message")
-            db.session.add(user_message)
-            db.session.commit()
-            user_message_id = user_message.id  # Get the auto-generated ID
-
             # Generate AI response using Google Generative AI
-            response_text = self.generate_ai_response(user_input)
+            user = current_user_or_none()
+            user_id = user.id if user else None
+            response_text = self.generate_ai_response(user_input, user)
 
-            # Save the AI's response to the database and get its ID
-            ai_message = AIMessage(message=response_text, author="assistant", category="ai_response")
-            db.session.add(ai_message)
-            db.session.commit()
+            # Save the user's message and the AI's response to the database in one commit and get their IDs
+            user_message = AIMessage(message=user_input, author="user", category="user_message", user_id=user_id)
+            ai_message = AIMessage(message=response_text, author="assistant", category="ai_response", user_id=user_id)
+            AIMessage.create_all([user_message, ai_message])
+            user_message_id = user_message.id  # Get the auto-generated ID
             ai_message_id = ai_message.id  # Get the auto-generated ID
 
             return jsonify({
@@ -127,9 +424,10 @@ class Chatbot(Resource):
             if not message:
                 return jsonify({"error": "Message not found"}), 404
 
-            # Update the message content
+            # Update the message content, the user's chat session is rebuilt with it on their next prompt
             message.message = new_message
             db.session.commit()
+            chat_sessions.pop(message._user_id)
 
             return jsonify({"message": "Message updated successfully"})
         except Exception as e:
@@ -151,13 +449,142 @@ class Chatbot(Resource):
             if not message:
                 return jsonify({"error": "Message not found"}), 404
 
-            # Delete the message
+            # Delete the message, the user's chat session is rebuilt without it on their next prompt
             db.session.delete(message)
             db.session.commit()
+            chat_sessions.pop(message._user_id)
 
             return '', 204  # Return a 204 No Content to indicate successful deletion
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
+class ChatbotStream(Resource):
+    def post(self):
+        """
+        Streams the chatbot response as newline delimited JSON while the model generates it.
+
+        Each piece of text is sent as {"type": "chunk", "text": ...} as soon as it arrives, followed by one
+        {"type": "done", ...} line with the message IDs and full response once both messages are saved.
+        """
+        data = request.get_json(silent=True)
+        if not data:
+            return {"error": "Invalid JSON"}, 400
+
+        user_input = data.get("user_input")
+        if not user_input:
+            return {"error": "User input is required"}, 400
+
+        # Signed in users are answered in their pooled chat session, with their earlier messages as context
+        user = current_user_or_none()
+        user_id = user.id if user else None
+
+        def generate():
+            parts = []
+            try:
+                pieces = chat_sessions.stream(user_id, user_input) if user_id else stream_ai_response(user_input)
+                for text in pieces:
+                    parts.append(text)
+                    yield json.dumps({"type": "chunk", "text": text}) + "\n"
+                response_text = "".join(parts).rstrip("\n") or FALLBACK_RESPONSE
+            except Exception as e:
+                print(f"Error streaming AI response: {str(e)}")
+                response_text = "".join(parts).rstrip("\n") or FALLBACK_RESPONSE
+                yield json.dumps({"type": "error", "error": FALLBACK_RESPONSE}) + "\n"
+
+            # Save the user's message and the assembled AI response once, in one commit
+            user_message = AIMessage(message=user_input, author="user", category="user_message", user_id=user_id)
+            ai_message = AIMessage(message=response_text, author="assistant", category="ai_response", user_id=user_id)
+            AIMessage.create_all([user_message, ai_message])
+            yield json.dumps({
+                "type": "done",
+                "user_message_id": user_message.id,
+                "ai_message_id": ai_message.id,
+                "user_input": user_input,
+                "model_response": response_text
+            }) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+class ChatbotAsync(Resource):
+    @token_required()
+    def post(self):
+        """
+        Queues a message for the chatbot and returns at once with the ID of the pending reply,
+        which is then read with GET /api/chatbot/async/<id> by the same user.
+        """
+        data = request.get_json(silent=True)
+        if not data:
+            return {"error": "Invalid JSON"}, 400
+
+        user_input = data.get("user_input")
+        if not user_input:
+            return {"error": "User input is required"}, 400
+
+        # Save the user's message and a pending AI message in one commit
+        user_id = g.current_user.id
+        user_message = AIMessage(message=user_input, author="user", category="user_message", user_id=user_id)
+        ai_message = AIMessage(message="", author="assistant", category="pending", user_id=user_id)
+        AIMessage.create_all([user_message, ai_message])
+
+        if not chat_queue.submit(ai_message.id, user_input, user_id):
+            ai_message.update({"message": "Sorry, the chatbot is busy. Please try again.", "category": "error"})
+            return {"error": "Chatbot is busy, try again later", "ai_message_id": ai_message.id}, 503
+
+        return {
+            "user_message_id": user_message.id,
+            "ai_message_id": ai_message.id,
+            "user_input": user_input,
+            "status": "pending"
+        }, 202
+
+
+class ChatbotAsyncReply(Resource):
+    @token_required()
+    def get(self, message_id):
+        """
+        Returns the reply for a queued message of the signed in user. With ?wait=N the request long-polls
+        for up to N seconds (at most CHATBOT_MAX_WAIT) while the reply is still pending.
+        """
+        wait = min(request.args.get("wait", 0, type=float), app.config['CHATBOT_MAX_WAIT'])
+        deadline = time.monotonic() + max(wait, 0)
+        query = AIMessage.query.filter_by(id=message_id, _user_id=g.current_user.id)
+
+        ai_message = query.first()
+        while ai_message and ai_message.category == "pending" and time.monotonic() < deadline:
+            chat_queue.wait(message_id, deadline - time.monotonic())
+            # End the read transaction, so the re-read sees the reply written by another session or worker
+            # instead of the same REPEATABLE READ snapshot on MySQL
+            db.session.rollback()
+            ai_message = query.first()
+
+        if not ai_message:
+            return {"error": "Message not found"}, 404
+
+        status = ai_message.category if ai_message.category in ("pending", "error") else "complete"
+        return {
+            "ai_message_id": ai_message.id,
+            "status": status,
+            "model_response": None if status == "pending" else ai_message.message
+        }, 200
+
+
+class ChatbotCache(Resource):
+    @token_required("Admin")
+    def get(self):
+        """Returns the response cache counters, including its hit ratio overall and per path."""
+        return response_cache.stats(), 200
+
+    @token_required("Admin")
+    def delete(self):
+        """Deletes every cached response."""
+        response_cache.clear()
+        return '', 204
+
+
 # Add Chatbot resource to the API
-api.add_resource(Chatbot, '/chatbot')
\ No newline at end of file
+api.add_resource(Chatbot, '/chatbot')
+api.add_resource(ChatbotStream, '/chatbot/stream')
+api.add_resource(ChatbotAsync, '/chatbot/async')
+api.add_resource(ChatbotAsyncReply, '/chatbot/async/<int:message_id>')
+api.add_resource(ChatbotCache, '/chatbot/cache')
\ No newline at end of file
@@ -0,0 +1,78 @@
+import os
+from flask import request, send_file, current_app
+from model.images import IMAGE_VARIANTS, DEFAULT_VARIANT, variant_filename
+
+def wants_base64():
+    """
+    Checks if the client asked for the image as base64 encoded JSON, the older response format,
+    either with ?format=base64 or an Accept header that prefers application/json over images.
+
+    Returns:
+        bool: True if the response should be JSON with the base64 encoded image.
+    """
+    if request.args.get('format') == 'base64':
+        return True
+    return request.accept_mimetypes.best == 'application/json'
+
+def image_variant():
+    """
+    Returns the image size variant asked for with ?size=thumb, medium or full.
+
+    Returns:
+        str: The variant, DEFAULT_VARIANT when none is given, or None when the size is not a known variant.
+    """
+    variant = request.args.get('size', DEFAULT_VARIANT)
+    return variant if variant in IMAGE_VARIANTS else None
+
+def upload_filename(user_uid, filename, variant=DEFAULT_VARIANT):
+    """
+    Returns the name of the stored file for a size variant of an uploaded image of a user.
+    Images uploaded before size variants were stored only have the original, which is used for every variant.
+
+    Args:
+        user_uid (str): The unique identifier for the user.
+        filename (str): The stored filename of the image.
+        variant (str): One of IMAGE_VARIANTS.
+
+    Returns:
+        str: The name of the file, or None when it does not exist.
+    """
+    for name in (variant_filename(filename, variant), filename):
+        if os.path.isfile(os.path.join(current_app.config['UPLOAD_FOLDER'], user_uid, name)):
+            return name
+    return None
+
+def upload_path(user_uid, filename, variant=DEFAULT_VARIANT):
+    """
+    Returns the path of the stored file for a size variant of an uploaded image of a user.
+
+    Args:
+        user_uid (str): The unique identifier for the user.
+        filename (str): The stored filename of the image.
+        variant (str): One of IMAGE_VARIANTS.
+
+    Returns:
+        str: The path of the file, or None when it does not exist.
+    """
+    name = upload_filename(user_uid, filename, variant)
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], user_uid, name) if name else None
+
+def send_image(path):
+    """
+    Sends an image file as the binary response body.
+
+    The file is streamed with the server's file wrapper (sendfile under gunicorn) rather than read into memory,
+    and the response carries an ETag and Last-Modified so a client that sends If-None-Match or If-Modified-Since
+    gets a 304 without the body. Images sit behind a login and are replaced in place on upload, so they are
+    marked private and revalidated on each use.
+
+    Args:
+        path (str): The path of the image file.
+
+    Returns:
+        Response: The image response, or 304 Not Modified.
+    """
+    response = send_file(path, conditional=True, etag=True, max_age=0)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
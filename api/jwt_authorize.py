@@ -2,7 +2,25 @@ from flask import request
 from flask import current_app, g
 from functools import wraps
 import jwt
-from model.frostbyte import Frostbyte
+from model.frostbyte import find_cached_by_uid
+
+def current_user_or_none():
+    """
+    Returns the user of a valid JWT cookie, or None for anonymous requests and invalid tokens.
+
+    Used by endpoints that serve anonymous users too but keep per-user state for signed in users.
+
+    Returns:
+        Frostbyte: The authenticated user, or None.
+    """
+    token = request.cookies.get(current_app.config["JWT_TOKEN_NAME"])
+    if not token:
+        return None
+    try:
+        data = jwt.decode(token, current_app.config["SECRET_KEY"], algorithms=["HS256"])
+        return find_cached_by_uid(data["_uid"])
+    except (jwt.InvalidTokenError, KeyError):
+        return None
 
 def token_required(roles=None):
     """
@@ -12,7 +30,7 @@ def token_required(roles=None):
     
     1. Checks for the presence of a valid JWT token in the request cookie.
     2. Decodes the token and retrieves the user data.
-    3. Checks if the user data is found in the database.
+    3. Checks if the user data is found in the authenticated user cache or the database.
     4. Checks if the user has the required role.
     5. Sets the current_user in the global context (Flask's g object).
     6. Returns the decorated function if all checks pass.
@@ -41,7 +59,7 @@ def token_required(roles=None):
 
             try:
                 data = jwt.decode(token, current_app.config["SECRET_KEY"], algorithms=["HS256"])
-                current_user = Frostbyte.query.filter_by(_uid=data["_uid"]).first()
+                current_user = find_cached_by_uid(data["_uid"])
                 if not current_user:
                     return {
                         "message": "User not found",
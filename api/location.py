@@ -4,7 +4,12 @@ from flask_restful import Api, Resource
 from datetime import datetime
 from __init__ import app
 from api.jwt_authorize import token_required
+from api.pagination import list_response, MAX_LIMIT
+from model.bulk import is_id
 from model.locationmodel import Location
+from model.channel import Channel
+from model.geo import MAX_DISTANCE_KM
+from model.weather import nearest_parks
 
 # Define the Blueprint for the Location API
 location_api = Blueprint('location_api', __name__, url_prefix='/api')
@@ -21,54 +26,149 @@ class LocationAPI:
         @token_required()
         def post(self):
             """
-            Store or update the user's location.
+            Store or update the user's location in a channel, with one upsert statement.
             """
             current_user = g.current_user
-            data = request.get_json()
+            data = request.get_json(silent=True)
 
             # Validate required fields
-            if not data or 'latitude' not in data or 'longitude' not in data:
-                return {'message': 'Latitude and Longitude are required'}, 400
-
-            latitude = data['latitude']
-            longitude = data['longitude']
-
-            # Check if a location entry already exists for the user
-            existing_location = Location.query.filter_by(user_id=current_user.id).first()
-            if existing_location:
-                # Update the existing location
-                existing_location.latitude = latitude
-                existing_location.longitude = longitude
-                existing_location.update()
-                return jsonify(existing_location.read())
-
-            # Create a new location entry
-            new_location = Location(user_id=current_user.id, latitude=latitude, longitude=longitude)
-            new_location.create()
-            return jsonify(new_location.read())
+            point = _location_point(data)
+            if isinstance(point, str):
+                return {'message': point}, 400
+            if Channel.query.get(point[0]) is None:
+                return {'message': f'Channel {point[0]} not found'}, 404
+
+            return jsonify(Location.upsert(current_user.id, *point))
 
         @token_required()
         def get(self):
             """
-            Retrieve the user's last known location.
+            Retrieve the user's last known location, optionally in one ?channel_id=.
             """
             current_user = g.current_user
-            location = Location.query.filter_by(user_id=current_user.id).first()
+            query = Location.query.filter_by(user_id=current_user.id)
+            if request.args.get('channel_id', type=int) is not None:
+                query = query.filter_by(channel_id=request.args.get('channel_id', type=int))
+            location = query.order_by(Location.timestamp.desc()).first()
 
             if not location:
                 return {'message': 'Location not found'}, 404
 
             return jsonify(location.read())
 
+    class _BATCH(Resource):
+        @token_required()
+        def post(self):
+            """
+            Store a track of the user's locations sent at once, as a list of {channel_id, latitude, longitude}
+            points, oldest first. The newest point of each channel is kept, written with one upsert per chunk.
+            """
+            current_user = g.current_user
+            data = request.get_json(silent=True)
+            if not isinstance(data, list):
+                return {'message': 'Expected a list of locations'}, 400
+
+            results = {'errors': [], 'success_count': 0, 'error_count': 0}
+            points = [(index, _location_point(item)) for index, item in enumerate(data)]
+            channel_ids = {point[0] for _, point in points if not isinstance(point, str)}
+            channels = {id for (id,) in Channel.query.with_entities(Channel.id).filter(Channel.id.in_(channel_ids))} if channel_ids else set()
+
+            valid = []
+            for index, point in points:
+                if isinstance(point, str):
+                    results['errors'].append({'message': f'Location {index}: {point}'})
+                elif point[0] not in channels:
+                    results['errors'].append({'message': f'Location {index}: Channel {point[0]} not found'})
+                else:
+                    valid.append(point)
+            results['error_count'] = len(results['errors'])
+            results['success_count'] = Location.upsert_many(current_user.id, valid) if valid else 0
+            return results, 207 if results['errors'] else 201
+
     class _ALL_LOCATIONS(Resource):
         def get(self):
             """
-            Retrieve all stored locations (admin endpoint).
+            Retrieve all stored locations (admin endpoint), optionally one keyset page at a time (?limit=&after=)
+            or as an NDJSON stream (?format=ndjson).
+            """
+            return list_response(Location.query, Location, lambda locations: [location.read() for location in locations])
+
+    class _NEARBY(Resource):
+        @token_required()
+        def get(self):
+            """
+            Retrieve the locations within ?radius_km= of ?lat=&lon=, nearest first, optionally of one ?channel_id=.
             """
-            locations = Location.query.all()
-            results = [location.read() for location in locations]
-            return jsonify(results)
+            point = _point()
+            if point is None:
+                return {'message': 'lat must be a number between -90 and 90 and lon between -180 and 180'}, 400
+            radius_km = request.args.get('radius_km', type=float)
+            if radius_km is None or not 0 < radius_km <= MAX_DISTANCE_KM:
+                return {'message': f'radius_km must be a number between 0 and {MAX_DISTANCE_KM:.0f}'}, 400
+
+            query = Location.query
+            if request.args.get('channel_id', type=int) is not None:
+                query = query.filter_by(channel_id=request.args.get('channel_id', type=int))
+            return jsonify(_with_distance(Location.within(point[0], point[1], radius_km, query)))
+
+    class _NEAREST(Resource):
+        @token_required()
+        def get(self):
+            """
+            Retrieve the ?k= locations nearest to ?lat=&lon=. With ?by=channel only the nearest location of each
+            channel is counted, so a channel nobody has shared a location in is never returned.
+            With ?by=park the k nearest parks are returned instead, ranked by the coordinates of the park channels.
+            """
+            point = _point()
+            if point is None:
+                return {'message': 'lat must be a number between -90 and 90 and lon between -180 and 180'}, 400
+            k = request.args.get('k', 10, type=int)
+            if not 0 < k <= MAX_LIMIT:
+                return {'message': f'k must be an integer between 1 and {MAX_LIMIT}'}, 400
+
+            if request.args.get('by') == 'park':
+                parks = nearest_parks(point[0], point[1], k)
+                return jsonify([dict(channel.read(), distance_km=round(distance, 3)) for channel, distance in parks])
+
+            nearest = Location.nearest(point[0], point[1], k, distinct_channels=request.args.get('by') == 'channel')
+            return jsonify(_with_distance(nearest))
+
+
+def _location_point(data):
+    """
+    Validates a location sent by a client.
+
+    Returns:
+        tuple or str: (channel_id, latitude, longitude), or the error message when the location is invalid.
+    """
+    if not isinstance(data, dict) or 'latitude' not in data or 'longitude' not in data:
+        return 'Latitude and Longitude are required'
+    if not is_id(data.get('channel_id')):
+        return 'Channel ID is required'
+    latitude, longitude = data['latitude'], data['longitude']
+    # bool is a subclass of int, so true and false are rejected by type
+    if type(latitude) not in (int, float) or type(longitude) not in (int, float) \
+            or not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        return 'Latitude must be a number between -90 and 90 and Longitude between -180 and 180'
+    return data['channel_id'], float(latitude), float(longitude)
+
+
+def _point():
+    """Reads the ?lat= and ?lon= query parameters, returns (lat, lon) or None when they are missing or out of range."""
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    if lat is None or lon is None or not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        return None
+    return lat, lon
+
+
+def _with_distance(found):
+    """Serializes (Location, distance) tuples, adding distance_km to each location."""
+    return [dict(location.read(), distance_km=round(distance, 3)) for location, distance in found]
 
 # Map endpoints to the API
 api.add_resource(LocationAPI._CRUD, '/location')
 api.add_resource(LocationAPI._ALL_LOCATIONS, '/locations')
+api.add_resource(LocationAPI._BATCH, '/locations/batch')
+api.add_resource(LocationAPI._NEARBY, '/locations/near')
+api.add_resource(LocationAPI._NEAREST, '/locations/nearest')
@@ -0,0 +1,330 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from flask import Blueprint, Response, g, has_request_context, request
+from sqlalchemy import event
+from __init__ import app, db
+from api.jwt_authorize import token_required
+
+"""
+Request and SQL metrics
+
+Every request is timed from before_request to after_request, and every SQL statement it runs is counted and
+timed with SQLAlchemy cursor events, per Flask endpoint. Each server worker keeps its own numbers in memory
+and writes them to a snapshot file in METRICS_DIR every METRICS_FLUSH_SECONDS, and GET /metrics adds up the
+snapshots of all running workers and returns them in the Prometheus text format.
+"""
+
+# Snapshot intervals after which the file of a worker that stopped writing is ignored and deleted
+STALE_INTERVALS = 3
+
+# Upper bounds in seconds of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+metrics_api = Blueprint('metrics_api', __name__)
+
+
+class RequestMetrics:
+    """
+    The request counters of this server process, per endpoint and method.
+    """
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, endpoint, method, status, seconds, sql_count, sql_seconds, response_bytes):
+        """
+        Records one finished request.
+
+        Args:
+            endpoint (str): The Flask endpoint that served the request.
+            method (str): The HTTP method.
+            status (int): The response status code.
+            seconds (float): The time from the start of the request to its response.
+            sql_count (int): The SQL statements the request ran.
+            sql_seconds (float): The time spent running them.
+            response_bytes (int): The size of the response body.
+        """
+        with self.lock:
+            series = self.series.get((endpoint, method))
+            if series is None:
+                series = self.series[(endpoint, method)] = {
+                    'count': 0, 'seconds': 0.0, 'buckets': [0] * len(self.buckets), 'status': {},
+                    'sql_count': 0, 'sql_seconds': 0.0, 'bytes': 0
+                }
+            series['count'] += 1
+            series['seconds'] += seconds
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series['buckets'][index] += 1
+                    break
+            series['status'][str(status)] = series['status'].get(str(status), 0) + 1
+            series['sql_count'] += sql_count
+            series['sql_seconds'] += sql_seconds
+            series['bytes'] += response_bytes
+
+    def snapshot(self):
+        """
+        Returns a copy of the counters that can be written as JSON.
+
+        Returns:
+            list: A dictionary per endpoint and method.
+        """
+        with self.lock:
+            return [
+                dict(series, endpoint=endpoint, method=method, buckets=list(series['buckets']), status=dict(series['status']))
+                for (endpoint, method), series in self.series.items()
+            ]
+
+
+request_metrics = RequestMetrics(LATENCY_BUCKETS)
+
+
+def process_stats():
+    """
+    Returns the counters of the caches and queues of this server process.
+
+    Returns:
+        dict: Metric name to (type, help, {label value: number}), the label being the cache or queue name.
+    """
+    from api.gemini import chat_queue
+    from api.weather_service import stats as weather_stats
+    from model.analytics import analytics_buffer
+    from model.frostbyte import user_cache
+    from model.gemini import response_cache
+
+    caches = {'user': user_cache.stats(), **weather_stats()}
+    caches['chatbot'] = {
+        'size': len(response_cache.memory),
+        'hits': response_cache.hits + response_cache.near_hits,
+        'misses': response_cache.misses
+    }
+    buffer = analytics_buffer.stats()
+    return {
+        'frostbyte_cache_hits_total': ('counter', 'Cache lookups answered from the cache.',
+                                       {name: stats['hits'] for name, stats in caches.items()}),
+        'frostbyte_cache_misses_total': ('counter', 'Cache lookups that missed.',
+                                         {name: stats['misses'] for name, stats in caches.items()}),
+        'frostbyte_cache_entries': ('gauge', 'Entries held by the cache.',
+                                    {name: stats['size'] for name, stats in caches.items()}),
+        'frostbyte_queue_waiting': ('gauge', 'Items waiting in a queue or buffer, not yet being processed.',
+                                    {'analytics': buffer['waiting'], 'chatbot': chat_queue.waiting()}),
+        'frostbyte_analytics_events_total': ('counter', 'Analytics events written by the write-behind buffer.',
+                                             {'written': buffer['written'], 'rejected': buffer['rejected'],
+                                              'dropped': buffer['dropped']}),
+    }
+
+
+class MetricsSnapshots:
+    """
+    Shares the metrics of each server worker with the others through a snapshot file per process.
+    """
+    def __init__(self, directory, interval):
+        self.directory = directory
+        self.interval = interval
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def path(self, pid):
+        return os.path.join(self.directory, f'{pid}.json')
+
+    def start(self):
+        """Starts the thread writing this process's snapshot, once per process."""
+        if self.interval <= 0 or self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            os.makedirs(self.directory, exist_ok=True)
+            threading.Thread(target=self._run, name="metrics-snapshot", daemon=True).start()
+
+    def write(self):
+        """Writes the snapshot of this process."""
+        data = {'pid': os.getpid(), 'time': time.time(), 'requests': request_metrics.snapshot()}
+        try:
+            data['stats'] = process_stats()
+        except Exception as e:
+            print(f"Metrics stats failed: {str(e)}")
+        path = self.path(os.getpid())
+        with open(f'{path}.tmp', 'w') as snapshot_file:
+            json.dump(data, snapshot_file)
+        os.replace(f'{path}.tmp', path)
+
+    def read_all(self):
+        """
+        Returns the snapshots of the running server processes, deleting the files of processes that have exited.
+
+        A running worker rewrites its file every interval, so a file not written for STALE_INTERVALS intervals
+        belongs to a process that is gone, even if its PID was since reused by another process, eg after a restart.
+
+        Returns:
+            list: The snapshot of each process.
+        """
+        snapshots = []
+        cutoff = time.time() - STALE_INTERVALS * self.interval
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path) as snapshot_file:
+                    data = json.load(snapshot_file)
+                if data['pid'] != os.getpid():
+                    if data['time'] < cutoff:
+                        raise ProcessLookupError
+                    os.kill(data['pid'], 0)
+            except ProcessLookupError:
+                os.remove(path)
+                continue
+            except (OSError, ValueError, KeyError):
+                continue
+            snapshots.append(data)
+        return snapshots
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.write()
+            except Exception as e:
+                print(f"Metrics snapshot failed: {str(e)}")
+
+
+snapshots = MetricsSnapshots(app.config['METRICS_DIR'], app.config['METRICS_FLUSH_SECONDS'])
+
+
+@metrics_api.before_app_request
+def start_request_timer():
+    """Starts timing the request and counting its SQL statements."""
+    g.metrics_start = time.perf_counter()
+    g.metrics_sql_count = 0
+    g.metrics_sql_seconds = 0.0
+    snapshots.start()
+
+
+@metrics_api.after_app_request
+def record_request(response):
+    """Records the time, SQL statements and response size of the request."""
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        request_metrics.observe(
+            request.endpoint or 'unmatched', request.method, response.status_code,
+            time.perf_counter() - start, g.get('metrics_sql_count', 0), g.get('metrics_sql_seconds', 0.0),
+            response.content_length or 0
+        )
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info['query_start'].pop()
+    if has_request_context() and 'metrics_start' in g:
+        g.metrics_sql_count += 1
+        g.metrics_sql_seconds += seconds
+
+
+with app.app_context():
+    event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def _labels(**labels):
+    pairs = ','.join(f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                     for name, value in labels.items())
+    return '{' + pairs + '}'
+
+
+def prometheus_text(snapshot_list, buckets=LATENCY_BUCKETS):
+    """
+    Adds up the snapshots of the server processes and formats them as Prometheus metrics.
+
+    Args:
+        snapshot_list (list): The snapshots, as written by MetricsSnapshots.write.
+        buckets (tuple): The upper bounds of the latency histogram buckets.
+
+    Returns:
+        str: The metrics in the Prometheus text exposition format.
+    """
+    series = {}
+    stats = {}
+    for snapshot in snapshot_list:
+        for entry in snapshot.get('requests', []):
+            total = series.setdefault((entry['endpoint'], entry['method']), {
+                'count': 0, 'seconds': 0.0, 'buckets': [0] * len(buckets), 'status': {},
+                'sql_count': 0, 'sql_seconds': 0.0, 'bytes': 0
+            })
+            for key in ('count', 'seconds', 'sql_count', 'sql_seconds', 'bytes'):
+                total[key] += entry[key]
+            total['buckets'] = [a + b for a, b in zip(total['buckets'], entry['buckets'])]
+            for status, count in entry['status'].items():
+                total['status'][status] = total['status'].get(status, 0) + count
+        for name, (kind, help_text, values) in snapshot.get('stats', {}).items():
+            metric = stats.setdefault(name, (kind, help_text, {}))
+            for label, value in values.items():
+                metric[2][label] = metric[2].get(label, 0) + value
+
+    lines = [
+        '# HELP frostbyte_workers Server worker processes reporting metrics.',
+        '# TYPE frostbyte_workers gauge',
+        f'frostbyte_workers {len(snapshot_list)}',
+        '# HELP frostbyte_http_requests_total Requests served, by endpoint, method and status.',
+        '# TYPE frostbyte_http_requests_total counter',
+    ]
+    ordered = sorted(series.items())
+    for (endpoint, method), total in ordered:
+        for status, count in sorted(total['status'].items()):
+            lines.append(f'frostbyte_http_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+
+    lines += [
+        '# HELP frostbyte_http_request_duration_seconds Time from the start of a request to its response.',
+        '# TYPE frostbyte_http_request_duration_seconds histogram',
+    ]
+    for (endpoint, method), total in ordered:
+        cumulative = 0
+        for bound, count in zip(buckets, total['buckets']):
+            cumulative += count
+            lines.append(f'frostbyte_http_request_duration_seconds_bucket{_labels(endpoint=endpoint, method=method, le=bound)} {cumulative}')
+        lines.append(f'frostbyte_http_request_duration_seconds_bucket{_labels(endpoint=endpoint, method=method, le="+Inf")} {total["count"]}')
+        lines.append(f'frostbyte_http_request_duration_seconds_sum{_labels(endpoint=endpoint, method=method)} {total["seconds"]:.6f}')
+        lines.append(f'frostbyte_http_request_duration_seconds_count{_labels(endpoint=endpoint, method=method)} {total["count"]}')
+
+    for name, key, kind, help_text, number in (
+        ('frostbyte_sql_statements_total', 'sql_count', 'counter', 'SQL statements run by requests.', '{}'),
+        ('frostbyte_sql_duration_seconds_total', 'sql_seconds', 'counter', 'Time requests spent running SQL statements.', '{:.6f}'),
+        ('frostbyte_http_response_bytes_total', 'bytes', 'counter', 'Response body bytes sent, streamed responses excluded.', '{}'),
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        for (endpoint, method), total in ordered:
+            lines.append(f'{name}{_labels(endpoint=endpoint, method=method)} {number.format(total[key])}')
+
+    for name, (kind, help_text, values) in sorted(stats.items()):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        label = 'event' if name == 'frostbyte_analytics_events_total' else 'name'
+        for value_label, value in sorted(values.items()):
+            lines.append(f'{name}{_labels(**{label: value_label})} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+@metrics_api.route('/metrics')
+@token_required(["Admin"])
+def metrics():
+    """
+    Returns the request, SQL, cache and queue metrics of all server workers in the Prometheus text format.
+    Restricted to Admin users, a scraper sends an Admin JWT cookie.
+    """
+    if snapshots.interval > 0:
+        snapshots.write()
+        snapshot_list = snapshots.read_all()
+    else:
+        snapshot_list = [{'pid': os.getpid(), 'requests': request_metrics.snapshot(), 'stats': process_stats()}]
+    return Response(prometheus_text(snapshot_list), mimetype='text/plain; version=0.0.4')
+
+
+if app.config['METRICS_FLUSH_SECONDS'] > 0:
+    # Write the last numbers when the worker exits, read_all drops the file once the process is gone
+    atexit.register(lambda: snapshots.pid == os.getpid() and snapshots.write())
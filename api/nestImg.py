@@ -2,6 +2,7 @@ from flask import Blueprint, g, request
 from flask_restful import Api, Resource
 from api.jwt_authorize import token_required
 from model.nestPost import NestPost
+from api.images import wants_base64, image_variant, upload_filename, upload_path, send_image
 from model.nestImg import nestImg_base64_decode, nestImg_base64_upload
 
 nestImg_api = Blueprint('nestImg_api', __name__, url_prefix='/api/id')
@@ -9,47 +10,52 @@ api = Api(nestImg_api)
 
 class _NestImage(Resource):
     """
-    Retrieves the current user's profile picture as a base64 encoded string.
+    Retrieves the picture of a nest post as the image file.
 
-    This endpoint allows users to fetch their profile picture. The profile picture is returned as a base64 encoded string,
-    which can be directly used in the src attribute of an img tag on the client side. This method ensures that only the
-    authenticated user can access their profile picture.
+    The post is given with ?imageID= on a GET, or as "imageID" in the JSON body of a POST. The picture is sent as
+    the binary image, with an ETag and Last-Modified so the client can revalidate its copy and get a 304 when it
+    is unchanged, and a smaller copy is sent with ?size=thumb or ?size=medium. With ?format=base64 the picture is instead returned as a base64 encoded string in JSON, which can
+    be directly used in the src attribute of an img tag on the client side.
 
     The process involves:
     1. Verifying the user's authentication and retrieving the current user object.
-    2. Checking if the current user has a profile picture set.
-    3. If a profile picture is set, the image file is read, and its content is base64 encoded.
-    4. The base64 encoded string of the image is returned in the response.
+    2. Looking up the post and checking it has a picture set.
+    3. The image file is sent, or read and base64 encoded when asked for.
 
     Returns:
-    - A JSON object containing the base64 encoded string of the profile picture under the key 'pfp' if the operation is successful.
+    - The image, or a JSON object containing the base64 encoded string of the picture under the key 'postImg'.
     - HTTP status code 200 if the  picture is successfully retrieved.
+    - HTTP status code 304 if the client's copy of the picture is current.
+    - HTTP status code 400 if the size is not thumb, medium or full.
     - HTTP status code 404 if the  picture is not set for the current post.
     - HTTP status code 500 if an error occurs while reading the post picture from the server.
     """
     @token_required()
     def get(self):
-        current_user = g.current_user
-        # Doesn't work since you can't add a body to a GET
-        data = request.get_json()
-        current_nestPost = NestPost.query.filter_by(id=data["imageID"]).first()
-
-        if current_nestPost._image_url:
-            base64_encode = nestImg_base64_decode(current_user.uid, current_nestPost._image_url)
-            if not base64_encode:
-                return {'message': 'An error occurred while reading the picture.'}, 500
-            return {'postImg': base64_encode}, 200
-        else:
-            return {'message': 'There was an error accessing the image.'}, 404
+        return self._send(request.args.get('imageID', type=int))
 
     @token_required()
     def post(self):
+        data = request.get_json(silent=True) or {}
+        return self._send(data.get("imageID"))
+
+    def _send(self, image_id):
+        """
+        Sends the picture of a nest post, as the image file or base64 encoded JSON.
+        """
         current_user = g.current_user
-        data = request.get_json()
-        current_nestPost = NestPost.query.filter_by(id=data["imageID"]).first()
+        variant = image_variant()
+        if not variant:
+            return {'message': 'Size must be thumb, medium or full.'}, 400
+        current_nestPost = NestPost.query.filter_by(id=image_id).first() if image_id is not None else None
 
-        if current_nestPost._image_url:
-            base64_encode = nestImg_base64_decode(current_user.uid, current_nestPost._image_url)
+        if current_nestPost and current_nestPost._image_url:
+            if not wants_base64():
+                path = upload_path(current_user.uid, current_nestPost._image_url, variant)
+                if not path:
+                    return {'message': 'An error occurred while reading the picture.'}, 500
+                return send_image(path)
+            base64_encode = nestImg_base64_decode(current_user.uid, upload_filename(current_user.uid, current_nestPost._image_url, variant) or current_nestPost._image_url)
             if not base64_encode:
                 return {'message': 'An error occurred while reading the picture.'}, 500
             return {'postImg': base64_encode}, 200
@@ -85,8 +91,11 @@ class _NestImage(Resource):
             return {'message': 'Base64 image data required.'}, 400
         base64_image = request.json['nestImg']
        
-        # Make an image file from the base64 data 
-        filename = nestImg_base64_upload(base64_image, current_user.uid)
+        # Make the image files from the base64 data 
+        try:
+            filename = nestImg_base64_upload(base64_image, current_user.uid)
+        except ValueError as e:
+            return {'message': str(e)}, 400
         if not filename:
             return {'message': 'An error occurred while uploading the post picture'}, 500
         
@@ -5,6 +5,7 @@ from datetime import datetime
 from __init__ import app
 from api.jwt_authorize import token_required
 from model.nestPost import NestPost
+from model.serializer import bulk_read
 
 """
 This Blueprint object is used to define APIs for the Post model.
@@ -50,8 +51,8 @@ class NestPostAPI:
             current_user = g.current_user
             # Find all the posts by the current user
             posts = NestPost.query.filter(NestPost._user_id == current_user.id).all()
-            # Prepare a JSON list of all the posts, uses for loop shortcut called list comprehension
-            json_ready = [post.read() for post in posts]
+            # Prepare a JSON list of all the posts, resolving users and groups in bulk
+            json_ready = bulk_read(posts)
             # Return a JSON list, converting Python dictionaries to JSON format
             return jsonify(json_ready)
 
@@ -0,0 +1,142 @@
+import json
+from flask import request, jsonify, Response, stream_with_context
+
+# Page size used when a client sends ?after= without ?limit=
+DEFAULT_LIMIT = 100
+# Largest page a client may request
+MAX_LIMIT = 1000
+# Rows fetched per query while streaming NDJSON
+STREAM_CHUNK_SIZE = 500
+
+def wants_ndjson():
+    """
+    Checks if the client asked for a newline delimited JSON stream,
+    either with ?format=ndjson or an Accept: application/x-ndjson header.
+
+    Returns:
+        bool: True if the response should be streamed as NDJSON.
+    """
+    if request.args.get('format') == 'ndjson':
+        return True
+    return request.accept_mimetypes.best == 'application/x-ndjson'
+
+def keyset_chunks(query, model, after=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Walks a query in id order, one bounded query per chunk.
+
+    Each chunk is fetched with WHERE id > last_id ORDER BY id LIMIT chunk_size, so only one chunk
+    is held in memory and the cost of a chunk does not depend on how far into the table it is.
+
+    Args:
+        query (Query): The query to walk, with any filters already applied.
+        model (db.Model): The model class, which must have an integer id primary key.
+        after (int, optional): Only rows with an id greater than this are returned.
+        chunk_size (int): The number of rows per chunk.
+
+    Yields:
+        list: The rows of each chunk.
+    """
+    while True:
+        chunk_query = query
+        if after is not None:
+            chunk_query = chunk_query.filter(model.id > after)
+        rows = chunk_query.order_by(model.id).limit(chunk_size).all()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        after = rows[-1].id
+
+def ndjson_stream(query, model, read_all, after=None):
+    """
+    Streams every row of a query as newline delimited JSON in constant memory.
+
+    Args:
+        query (Query): The query to stream.
+        model (db.Model): The model class of the query.
+        read_all (function): Serializes a list of rows into a list of dictionaries.
+        after (int, optional): Only rows with an id greater than this are streamed.
+
+    Returns:
+        Response: A chunked application/x-ndjson response.
+    """
+    def generate():
+        for rows in keyset_chunks(query, model, after):
+            yield ''.join(json.dumps(item) + '\n' for item in read_all(rows))
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def keyset_page(query, model, after=None, limit=DEFAULT_LIMIT):
+    """
+    Fetches one page of a query in id order.
+
+    Args:
+        query (Query): The query to page through, with any filters already applied.
+        model (db.Model): The model class, which must have an integer id primary key.
+        after (int, optional): Only rows with an id greater than this are returned.
+        limit (int): The largest number of rows returned, capped at MAX_LIMIT.
+
+    Returns:
+        tuple: The rows of the page, and the id to pass as after for the next page or None on the last page.
+    """
+    limit = min(limit or DEFAULT_LIMIT, MAX_LIMIT)
+    if after is not None:
+        query = query.filter(model.id > after)
+    rows = query.order_by(model.id).limit(limit + 1).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def page_params():
+    """
+    Reads the ?limit= and ?after= query parameters.
+
+    Returns:
+        tuple: limit and after, each None when not given, or None when a value is invalid.
+    """
+    # Invalid values come back as None from request.args.get
+    after = request.args.get('after', type=_non_negative_int)
+    limit = request.args.get('limit', type=_non_negative_int)
+    if ('after' in request.args and after is None) or ('limit' in request.args and not limit):
+        return None
+    return limit, after
+
+def list_response(query, model, read_all):
+    """
+    Builds the response for a list endpoint from its query.
+
+    - ?format=ndjson streams every row, see ndjson_stream.
+    - ?limit=N and/or ?after=ID return one keyset page as {"data": [...], "next_cursor": ID},
+      where next_cursor is passed as ?after= to get the following page and is None on the last page.
+    - Without these parameters the full JSON list is returned, as before.
+
+    Args:
+        query (Query): The query for the endpoint, with any filters already applied.
+        model (db.Model): The model class of the query.
+        read_all (function): Serializes a list of rows into a list of dictionaries.
+
+    Returns:
+        Response or tuple: The response, or an error message and 400 status for bad parameters.
+    """
+    params = page_params()
+    if params is None:
+        return {'message': 'limit must be a positive integer and after a non-negative integer'}, 400
+    limit, after = params
+
+    if wants_ndjson():
+        return ndjson_stream(query, model, read_all, after)
+
+    if limit is None and after is None:
+        return jsonify(read_all(query.all()))
+
+    rows, next_cursor = keyset_page(query, model, after, limit)
+    return jsonify({
+        "data": read_all(rows),
+        "next_cursor": next_cursor
+    })
+
+def _non_negative_int(value):
+    """Converts a query string value to an int, rejecting values below 0."""
+    number = int(value)
+    if number < 0:
+        raise ValueError(value)
+    return number
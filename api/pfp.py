@@ -2,6 +2,7 @@ from flask import Blueprint, g, request
 from flask_restful import Api, Resource
 from api.jwt_authorize import token_required
 from model.frostbyte import Frostbyte
+from api.images import wants_base64, image_variant, upload_filename, upload_path, send_image
 from model.pfp import pfp_base64_decode, pfp_base64_upload, pfp_file_delete
 
 pfp_api = Blueprint('pfp_api', __name__, url_prefix='/api/id')
@@ -9,21 +10,24 @@ api = Api(pfp_api)
 
 class _PFP(Resource):
     """
-    Retrieves the current user's profile picture as a base64 encoded string.
+    Retrieves the current user's profile picture as the image file.
 
-    This endpoint allows users to fetch their profile picture. The profile picture is returned as a base64 encoded string,
-    which can be directly used in the src attribute of an img tag on the client side. This method ensures that only the
+    This endpoint allows users to fetch their profile picture. The profile picture is sent as the binary image,
+    with an ETag and Last-Modified so the client can revalidate its copy and get a 304 when it is unchanged.
+    A smaller copy is sent with ?size=thumb or ?size=medium. With ?format=base64 the picture is instead returned as a base64 encoded string in JSON, which can be directly
+    used in the src attribute of an img tag on the client side. This method ensures that only the
     authenticated user can access their profile picture.
 
     The process involves:
     1. Verifying the user's authentication and retrieving the current user object.
     2. Checking if the current user has a profile picture set.
-    3. If a profile picture is set, the image file is read, and its content is base64 encoded.
-    4. The base64 encoded string of the image is returned in the response.
+    3. If a profile picture is set, the image file is sent, or read and base64 encoded when asked for.
 
     Returns:
-    - A JSON object containing the base64 encoded string of the profile picture under the key 'pfp' if the operation is successful.
+    - The image, or a JSON object containing the base64 encoded string of the profile picture under the key 'pfp'.
     - HTTP status code 200 if the profile picture is successfully retrieved.
+    - HTTP status code 304 if the client's copy of the profile picture is current.
+    - HTTP status code 400 if the size is not thumb, medium or full.
     - HTTP status code 404 if the profile picture is not set for the current user.
     - HTTP status code 500 if an error occurs while reading the profile picture from the server.
     """
@@ -31,8 +35,17 @@ class _PFP(Resource):
     def get(self):
         current_user = g.current_user
 
+        variant = image_variant()
+        if not variant:
+            return {'message': 'Size must be thumb, medium or full.'}, 400
+
         if current_user.pfp:
-            base64_encode = pfp_base64_decode(current_user.uid, current_user.pfp)
+            if not wants_base64():
+                path = upload_path(current_user.uid, current_user.pfp, variant)
+                if not path:
+                    return {'message': 'An error occurred while reading the profile picture.'}, 500
+                return send_image(path)
+            base64_encode = pfp_base64_decode(current_user.uid, upload_filename(current_user.uid, current_user.pfp, variant) or current_user.pfp)
             if not base64_encode:
                 return {'message': 'An error occurred while reading the profile picture.'}, 500
             return {'pfp': base64_encode}, 200
@@ -95,8 +108,8 @@ class _PFP(Resource):
         Updates the user's profile picture with a new image provided as base64 encoded data.
 
         This endpoint allows users to update their profile picture by sending a PUT request with base64 encoded image data.
-        The image is decoded and saved to a secure location on the server, and the user's profile information is updated
-        to reference the new image file.
+        The image is decoded, checked and saved in thumb, medium and full sizes on the server, and the user's profile
+        information is updated to reference the new image file.
 
         The function requires a valid authentication token and expects the base64 image data to be included in the request's JSON body
         under the key 'pfp'. If the image data is not provided, or if any error occurs during the upload process or while updating
@@ -105,7 +118,7 @@ class _PFP(Resource):
         Returns:
         - A JSON object with a message indicating the success or failure of the operation.
         - HTTP status code 200 if the profile picture was updated successfully.
-        - HTTP status code 400 if the base64 image data is missing from the request.
+        - HTTP status code 400 if the base64 image data is missing from the request or is not a PNG, JPEG, GIF or WebP image.
         - HTTP status code 500 if an error occurs during the upload process or while updating the database.
         """
         current_user = g.current_user
@@ -115,15 +128,21 @@ class _PFP(Resource):
             return {'message': 'Base64 image data required.'}, 400
         base64_image = request.json['pfp']
        
-        # Make an image file from the base64 data 
-        filename = pfp_base64_upload(base64_image, current_user.uid)
+        # Make the image files from the base64 data 
+        try:
+            filename = pfp_base64_upload(base64_image, current_user.uid)
+        except ValueError as e:
+            return {'message': str(e)}, 400
         if not filename:
             return {'message': 'An error occurred while uploading the profile picture'}, 500
         
         # Update the user's profile picture to the uploaded file
         try:
             # write the filename reference to the database
+            previous = current_user.pfp
             current_user.update({"pfp": filename})
+            if previous and previous != filename:
+                pfp_file_delete(current_user.uid, previous)
             return {'message': 'Profile picture updated successfully'}, 200
         except Exception as e:
             return {'message': f'A database error occurred while assigning profile picture: {str(e)}'}, 500
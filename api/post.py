@@ -4,8 +4,11 @@ from flask_restful import Api, Resource  # used for REST API building
 from datetime import datetime
 from __init__ import app
 from api.jwt_authorize import token_required
+from api.pagination import list_response
+from model.bulk import BulkInsertError
 from model.post import Post
 from model.channel import Channel
+from model.serializer import bulk_read
 
 """
 This Blueprint object is used to define APIs for the Post model.
@@ -129,52 +132,38 @@ class PostAPI:
             """
             # Obtain the current user
             current_user = g.current_user
-            # Find all the posts by the current user
-            posts = Post.query.filter(Post._user_id == current_user.id).all()
-            # Prepare a JSON list of all the posts, using list comprehension
-            json_ready = [post.read() for post in posts]
+            # Find all the posts by the current user and prepare a JSON list of them
+            json_ready = Post.read_all(Post.query.filter(Post._user_id == current_user.id))
             # Return a JSON list, converting Python dictionaries to JSON format
             return jsonify(json_ready)
 
     class _BULK_CRUD(Resource):
+        @token_required()
         def post(self):
             """
-            Handle bulk post creation by sending POST requests to the single post endpoint.
+            Handle bulk post creation, validating the whole batch and inserting it in chunked transactions.
+            Posts are created by the current user; an Admin may set user_id on each post for imports.
             """
+            current_user = g.current_user
             posts = request.get_json()
 
             if not isinstance(posts, list):
                 return {'message': 'Expected a list of post data'}, 400
 
-            results = {'errors': [], 'success_count': 0, 'error_count': 0}
-
-            with current_app.test_client() as client:
-                for post in posts:
-                    # Simulate a POST request to the single post creation endpoint
-                    response = client.post('/api/post', json=post)
-
-                    if response.status_code == 200:
-                        results['success_count'] += 1
-                    else:
-                        results['errors'].append(response.get_json())
-                        results['error_count'] += 1
-
+            try:
+                results = Post.bulk_create(posts, current_user.id, allow_user_id=current_user.role == 'Admin')
+            except BulkInsertError as e:
+                # The chunks before the failure are committed, pending lists the indexes of the posts to send again
+                return e.results, 503
             # Return the results of the bulk creation process
             return jsonify(results)
         
         def get(self):
             """
-            Retrieve all posts.
+            Retrieve all posts, optionally one keyset page at a time (?limit=&after=) or as an NDJSON stream (?format=ndjson).
             """
-            # Find all the posts
-            posts = Post.query.all()
-            # Prepare a JSON list of all the posts, using list comprehension
-            json_ready = []
-            for post in posts:
-                post_data = post.read()
-                json_ready.append(post_data)
-            # Return a JSON list, converting Python dictionaries to JSON format
-            return jsonify(json_ready)
+            # Serialize the posts with their users and channels resolved in bulk
+            return list_response(Post.query, Post, bulk_read)
 
     class _FILTER(Resource):
         @token_required()
@@ -189,10 +178,8 @@ class PostAPI:
             if 'channel_id' not in data:
                 return {'message': 'Channel ID not found'}, 400
             
-            # Find all posts by channel ID and user ID
-            posts = Post.query.filter_by(_channel_id=data['channel_id']).all()
-            # Prepare a JSON list of all the posts, using list comprehension
-            json_ready = [post.read() for post in posts]
+            # Find all posts by channel ID and prepare a JSON list of them
+            json_ready = Post.read_all(Post.query.filter_by(_channel_id=data['channel_id']))
             # Return a JSON list, converting Python dictionaries to JSON format
             return jsonify(json_ready)
 
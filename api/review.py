@@ -4,56 +4,8 @@ from flask_restful import Api, Resource  # used for REST API building
 from datetime import datetime
 from __init__ import app
 from api.jwt_authorize import token_required
-#from model import review
-#from model import channel
-
-
-from __init__ import db
-from datetime import datetime
-
-class Review(db.Model):
-    __tablename__ = 'reviews'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(255), nullable=False)
-    comment = db.Column(db.String(500), nullable=False)
-    content = db.Column(db.JSON, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    park_id = db.Column(db.Integer, db.ForeignKey('parks.id'), nullable=False)
-    channel_id = db.Column(db.Integer, db.ForeignKey('channels.id'), nullable=False)
-
-    park = db.relationship('park', backref=db.backref('reviews', lazy=True))
-    channel = db.relationship('Channel', backref=db.backref('reviews', lazy=True))
-
-    def __init__(self, title, comment, park_id, channel_id, content=None):
-        self.title = title
-        self.comment = comment
-        self.park_id = park_id
-        self.channel_id = channel_id
-        self.content = content or {}
-
-    def create(self):
-        db.session.add(self)
-        db.session.commit()
-
-    def update(self):
-        db.session.commit()
-
-    def delete(self):
-        db.session.delete(self)
-        db.session.commit()
-
-    def read(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'comment': self.comment,
-            'content': self.content,
-            'created_at': self.created_at.isoformat(),
-            'park_id': self.park_id,
-            'channel_id': self.channel_id
-        }
+from model.review import review as Review
+from model.serializer import bulk_read
 
 """
 This Blueprint object is used to define APIs for the review model.
@@ -74,14 +26,14 @@ class reviewAPI:
     """
     Define the API CRUD endpoints for the review model.
     There are four operations that correspond to common HTTP methods:
-    - review: create a new review
+    - post: create a new review
     - get: read reviews
     - put: update a review
     - delete: delete a review
     """
     class _CRUD(Resource):
         @token_required()
-        def review(self):
+        def post(self):
             """
             Create a new review.
             """
@@ -103,7 +55,7 @@ class reviewAPI:
                 data['content'] = {}
 
             # Create a new review object using the data from the request
-            review = review(data['title'], data['comment'], current_user.id, data['channel_id'], data['content'])
+            review = Review(data['title'], data['comment'], current_user.id, data['channel_id'], data['content'])
             # Save the review object using the Object Relational Mapper (ORM) method defined in the model
             review.create()
             # Return response to the client in JSON format, converting Python dictionaries to JSON format
@@ -121,7 +73,7 @@ class reviewAPI:
             if 'id' not in data:
                 return {'message': 'review ID not found'}, 400
             # Find the review to read
-            review = review.query.get(data['id'])
+            review = Review.query.get(data['id'])
             if review is None:
                 return {'message': 'review not found'}, 404
             # Convert Python object to JSON format 
@@ -139,7 +91,7 @@ class reviewAPI:
             # Obtain the request data
             data = request.get_json()
             # Find the current review from the database table(s)
-            review = review.query.get(data['id'])
+            review = Review.query.get(data['id'])
             if review is None:
                 return {'message': 'review not found'}, 404
             # Update the review
@@ -161,7 +113,7 @@ class reviewAPI:
             # Obtain the request data
             data = request.get_json()
             # Find the current review from the database table(s)
-            review = review.query.get(data['id'])
+            review = Review.query.get(data['id'])
             if review is None:
                 return {'message': 'review not found'}, 404
             # Delete the review using the ORM method defined in the model
@@ -178,14 +130,14 @@ class reviewAPI:
             # Obtain the current user
             current_user = g.current_user
             # Find all the reviews by the current user
-            reviews = review.query.filter(review._user_id == current_user.id).all()
-            # Prepare a JSON list of all the reviews, using list comprehension
-            json_ready = [review.read() for review in reviews]
+            reviews = Review.query.filter(Review._user_id == current_user.id).all()
+            # Prepare a JSON list of all the reviews, resolving users and channels in bulk
+            json_ready = bulk_read(reviews)
             # Return a JSON list, converting Python dictionaries to JSON format
             return jsonify(json_ready)
 
     class _BULK_CRUD(Resource):
-        def review(self):
+        def post(self):
             """
             Handle bulk review creation by sending POST requests to the single review endpoint.
             """
@@ -197,9 +149,12 @@ class reviewAPI:
             results = {'errors': [], 'success_count': 0, 'error_count': 0}
 
             with current_app.test_client() as client:
+                # Create the reviews as the user of this request
+                token_name = current_app.config["JWT_TOKEN_NAME"]
+                client.set_cookie(token_name, request.cookies.get(token_name, ''))
                 for review in reviews:
                     # Simulate a review request to the single review creation endpoint
-                    response = client.review('/api/review', json=review)
+                    response = client.post('/api/review', json=review)
 
                     if response.status_code == 200:
                         results['success_count'] += 1
@@ -215,18 +170,15 @@ class reviewAPI:
             Retrieve all reviews.
             """
             # Find all the reviews
-            reviews = review.query.all()
-            # Prepare a JSON list of all the reviews, using list comprehension
-            json_ready = []
-            for review in reviews:
-                review_data = review.read()
-                json_ready.append(review_data)
+            reviews = Review.query.all()
+            # Prepare a JSON list of all the reviews, resolving users and channels in bulk
+            json_ready = bulk_read(reviews)
             # Return a JSON list, converting Python dictionaries to JSON format
             return jsonify(json_ready)
 
     class _FILTER(Resource):
         @token_required()
-        def review(self):
+        def post(self):
             """
             Retrieve all reviews by channel ID and user ID.
             """
@@ -238,9 +190,9 @@ class reviewAPI:
                 return {'message': 'Channel ID not found'}, 400
             
             # Find all reviews by channel ID and user ID
-            reviews = review.query.filter_by(_channel_id=data['channel_id']).all()
-            # Prepare a JSON list of all the reviews, using list comprehension
-            json_ready = [review.read() for review in reviews]
+            reviews = Review.query.filter_by(_channel_id=data['channel_id']).all()
+            # Prepare a JSON list of all the reviews, resolving users and channels in bulk
+            json_ready = bulk_read(reviews)
             # Return a JSON list, converting Python dictionaries to JSON format
             return jsonify(json_ready)
 
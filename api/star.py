@@ -4,7 +4,9 @@ from flask_restful import Api, Resource  # used for REST API building
 from datetime import datetime
 from __init__ import app, db
 from api.jwt_authorize import token_required
+from api.pagination import keyset_page, page_params
 from model.rating import Rating  
+from model.rating_stats import ChannelRatingStats
 #from model.post import Post 
 from model.channel import Channel
 from model.frostbyte import Frostbyte
@@ -67,14 +69,7 @@ class StarAPI:
                     return {'message': 'Channel not found'}, 404
 
                 # Create or update the rating
-                rating = Rating.query.filter_by(user_id=current_user.id, channel_id=channel.id).first()
-                if rating:
-                    rating.stars = stars  # Update the stars if the rating already exists
-                else:
-                    rating = Rating(stars=stars, user_id=current_user.id, channel_id=channel.id)
-                    db.session.add(rating)
-
-                db.session.commit()
+                rating = Rating.rate(current_user.id, channel.id, stars)
                 return {'message': 'Rating submitted successfully', 'rating': rating.read()}, 201
 
             # If 'stars' is NOT in the request body, assume it's a fetch request
@@ -112,19 +107,33 @@ class StarAPI:
 
         @token_required()
         def get(self):
-            """Retrieve all ratings for a post."""
-            data = request.get_json()
-
-            if not data or 'channel_id' not in data:
+            """
+            Retrieve the average, count and star histogram of the ratings of a channel from its stored totals.
+            The rating rows are only read with ?ratings=true, one keyset page at a time (?limit=&after=).
+            """
+            data = request.get_json(silent=True) or {}
+            channel_id = data.get('channel_id', request.args.get('channel_id'))
+            if channel_id is None:
                 return {'message': 'Channel ID is required'}, 400
+            try:
+                channel_id = int(channel_id)
+            except (TypeError, ValueError):
+                return {'message': 'channel_id must be an integer'}, 400
 
-            ratings = Rating.query.filter_by(channel_id=data['channel_id']).all()
-            if not ratings:
+            stats = ChannelRatingStats.find('ratings', channel_id)
+            if not stats or not stats.count:
                 return {'message': 'No ratings found for this channel'}, 404
+            result = stats.read()
 
-            return jsonify({
-                "ratings": [rating.read() for rating in ratings]
-            })
+            if request.args.get('ratings') == 'true':
+                params = page_params()
+                if params is None:
+                    return {'message': 'limit must be a positive integer and after a non-negative integer'}, 400
+                limit, after = params
+                ratings, next_cursor = keyset_page(Rating.query.filter_by(channel_id=channel_id), Rating, after, limit)
+                result.update(ratings=[rating.read() for rating in ratings], next_cursor=next_cursor)
+
+            return jsonify(result)
         
         @token_required()
         def delete(self):
@@ -141,9 +150,12 @@ class StarAPI:
             if not user:
                 return {'message': f'User "{user_id}" not found'}, 404
 
-            # Delete all ratings by the user
-            deleted_count = Rating.query.filter_by(user_id=user.id).delete()
+            # Delete all ratings by the user, one by one so the channel totals are updated
+            ratings = Rating.query.filter_by(user_id=user.id).all()
+            for rating in ratings:
+                db.session.delete(rating)
             db.session.commit()
+            deleted_count = len(ratings)
 
             if deleted_count == 0:
                 return {'message': 'No ratings found for the specified user'}, 404
@@ -171,7 +183,27 @@ class StarAPI:
             db.session.commit()
             print("Sample data initialized in the ratings table.")
 
+    class _STATS(Resource):
+        @token_required()
+        def get(self):
+            """
+            Retrieve the average, count and star histogram of the ratings of a channel,
+            or of every rated channel when no channel_id is given.
+            """
+            channel_id = request.args.get('channel_id')
+            if channel_id is None:
+                return jsonify([stats.read() for stats in ChannelRatingStats.summary('ratings')])
+
+            try:
+                stats = ChannelRatingStats.find('ratings', int(channel_id))
+            except ValueError:
+                return {'message': 'channel_id must be an integer'}, 400
+            if not stats or not stats.count:
+                return {'message': 'No ratings found for this channel'}, 404
+            return jsonify(stats.read())
+
     # Map resources to endpoints
     api.add_resource(_CRUD, '/post')  # Handles post creation and retrieval
     api.add_resource(_RATING, '/rating')  # Handles ratings
+    api.add_resource(_STATS, '/rating/stats')  # Per channel rating totals
 
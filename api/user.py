@@ -4,7 +4,9 @@ from flask_restful import Api, Resource  # used for REST API building
 from datetime import datetime
 from __init__ import app
 from api.jwt_authorize import token_required
-from model.frostbyte import Frostbyte
+from api.pagination import list_response
+from model.bulk import BulkInsertError
+from model.frostbyte import Frostbyte, user_cache
 
 # Create a Blueprint for the user API
 user_api = Blueprint('user_api', __name__, url_prefix='/api')
@@ -24,50 +26,45 @@ class UserAPI:
 
         def post(self):
             """
-            Handle bulk user creation by sending POST requests to the single user endpoint.
+            Handle bulk user creation, validating the whole batch and inserting it in chunked transactions.
             """
             users = request.get_json()
 
             if not isinstance(users, list):
                 return {'message': 'Expected a list of user data'}, 400
 
-            results = {'errors': [], 'success_count': 0, 'error_count': 0}
-
-            with current_app.test_client() as client:
-                for user in users:
+            for user in users:
+                if isinstance(user, dict):
                     # Set a default password as we don't have it for bulk creation
                     user["password"] = app.config['DEFAULT_PASSWORD']
 
-                    # Simulate a POST request to the single user creation endpoint
-                    response = client.post('/api/user', json=user)
-
-                    if response.status_code == 200:
-                        results['success_count'] += 1
-                    else:
-                        results['errors'].append(response.get_json())
-                        results['error_count'] += 1
-
+            try:
+                results = Frostbyte.bulk_create(users)
+            except BulkInsertError as e:
+                # The chunks before the failure are committed, pending lists the uids to send again
+                return e.results, 503
             return jsonify(results)
         
         @token_required()
         def get(self):
             """
-            Retrieve all users.
+            Retrieve all users, optionally one keyset page at a time (?limit=&after=) or as an NDJSON stream (?format=ndjson).
             """
             current_user = g.current_user
-            users = Frostbyte.query.all()  # extract all users from the database
 
-            # Prepare a JSON list of user dictionaries
-            json_ready = []
-            for user in users:
-                user_data = user.read()
-                if current_user.role == 'Admin' or current_user.id == user.id:
-                    user_data['access'] = ['rw']  # read-write access control
-                else:
-                    user_data['access'] = ['ro']  # read-only access control
-                json_ready.append(user_data)
+            def read_all(users):
+                # Prepare a JSON list of user dictionaries
+                json_ready = []
+                for user in users:
+                    user_data = user.read()
+                    if current_user.role == 'Admin' or current_user.id == user.id:
+                        user_data['access'] = ['rw']  # read-write access control
+                    else:
+                        user_data['access'] = ['ro']  # read-only access control
+                    json_ready.append(user_data)
+                return json_ready
 
-            return jsonify(json_ready)
+            return list_response(Frostbyte.query, Frostbyte, read_all)
 
     class _CRUD(Resource):
         """
@@ -242,8 +239,15 @@ class UserAPI:
             ''' Return the current user as a json object '''
             return jsonify(current_user.read())
 
+    class _CACHE(Resource):  # Authenticated user cache counters
+        @token_required("Admin")
+        def get(self):
+            ''' Return the hit and miss counters of this worker's authenticated user cache '''
+            return jsonify(user_cache.stats())
+
 # Register the API resources with the Blueprint
 api.add_resource(UserAPI._ID, '/id')
 api.add_resource(UserAPI._BULK_CRUD, '/users')
 api.add_resource(UserAPI._CRUD, '/user')
-api.add_resource(UserAPI._Security, '/authenticate')
\ No newline at end of file
+api.add_resource(UserAPI._Security, '/authenticate')
+api.add_resource(UserAPI._CACHE, '/users/cache')
\ No newline at end of file
@@ -3,9 +3,10 @@ from flask import Blueprint, request, jsonify, g
 from flask_restful import Api, Resource  # used for REST API building
 from datetime import datetime
 from __init__ import app
-from api.jwt_authorize import token_required
+from api.jwt_authorize import token_required, current_user_or_none
 from model.post import Post
 from model.vote import Vote
+from api.pagination import keyset_page, page_params, MAX_LIMIT
 
 # Define the Blueprint for the Vote API
 vote_api = Blueprint('vote_api', __name__, url_prefix='/api')
@@ -38,18 +39,8 @@ class VoteAPI:
             if 'vote_type' not in data or data['vote_type'] not in ['upvote', 'downvote']:
                 return {'message': 'Vote type must be "upvote" or "downvote"'}, 400
 
-            # Check if the vote already exists for the user on the post
-            existing_vote = Vote.query.filter_by(_post_id=data['post_id'], _user_id=current_user.id).first()
-            if existing_vote:
-                # Update the existing vote type
-                existing_vote._vote_type = data['vote_type']
-                existing_vote.create()  # This will commit the update
-                return jsonify(existing_vote.read())
-
-            # Create a new vote object
-            vote = Vote(data['vote_type'], current_user.id, data['post_id'])
-            # Save the vote using the ORM method
-            vote.create()
+            # Create the vote, or flip the user's existing vote on the post
+            vote = Vote.cast(data['vote_type'], current_user.id, data['post_id'])
             # Return the saved vote in JSON format
             return jsonify(vote.read())
 
@@ -79,7 +70,10 @@ class VoteAPI:
     class _POST_VOTES(Resource):
         def get(self):
             """
-            Retrieve all votes for a specific post, including counts of upvotes and downvotes.
+            Retrieve the counts of upvotes and downvotes for a specific post.
+
+            With ?voters=true the votes themselves are included too, one page at a time: ?limit=N sets the page size
+            and the returned next_cursor is passed as ?after= to get the following page.
             """
             # Attempt to get post_id from query parameters first
             post_id = request.args.get('post_id')
@@ -95,24 +89,88 @@ class VoteAPI:
             if not post_id:
                 return {'message': 'Post ID is required'}, 400
 
-            # Get all votes for the post
-            votes = Vote.query.filter_by(_post_id=post_id).all()
-            upvotes = [vote.read() for vote in votes if vote._vote_type == 'upvote']
-            downvotes = [vote.read() for vote in votes if vote._vote_type == 'downvote']
+            # The counts are kept on the post, so no vote rows are read unless the voters are asked for
+            post = Post.query.get(post_id)
+            if post is None:
+                return {'message': 'Post not found'}, 404
 
             result = {
-                "post_id": post_id,
-                "upvote_count": len(upvotes),
-                "downvote_count": len(downvotes),
-                "upvotes": upvotes,
-                "downvotes": downvotes
+                "post_id": post.id,
+                "upvote_count": post._upvotes,
+                "downvote_count": post._downvotes
             }
+            if request.args.get('voters', '').lower() in ('1', 'true', 'yes'):
+                params = page_params()
+                if params is None:
+                    return {'message': 'limit must be a positive integer and after a non-negative integer'}, 400
+                limit, after = params
+                votes, next_cursor = keyset_page(Vote.query.filter_by(_post_id=post.id), Vote, after, limit)
+                result["upvotes"] = [vote.read() for vote in votes if vote._vote_type == 'upvote']
+                result["downvotes"] = [vote.read() for vote in votes if vote._vote_type == 'downvote']
+                result["next_cursor"] = next_cursor
             return jsonify(result)
 
+    class _BATCH_VOTES(Resource):
+        def get(self):
+            """
+            Retrieve the vote counts of many posts at once, given as ?post_ids=1,2,3.
+            """
+            try:
+                post_ids = [int(id) for id in request.args.get('post_ids', '').split(',') if id.strip()]
+            except ValueError:
+                return {'message': 'post_ids must be a comma separated list of integers'}, 400
+            return self.counts(post_ids)
+
+        def post(self):
+            """
+            Retrieve the vote counts of many posts at once, given as {"post_ids": [1, 2, 3]} for long lists.
+            """
+            data = request.get_json(silent=True)
+            post_ids = data.get('post_ids') if isinstance(data, dict) else None
+            if not isinstance(post_ids, list) or not all(isinstance(id, int) for id in post_ids):
+                return {'message': 'post_ids must be a list of integers'}, 400
+            return self.counts(post_ids)
+
+        def counts(self, post_ids):
+            """
+            Builds the counts of the posts, in the order asked for, with one query for the counters of all posts
+            and one for the signed in user's votes on them. Unknown post IDs are left out.
+
+            Returns:
+                list: The post_id, upvote_count, downvote_count and user_vote ("upvote", "downvote" or None) per post.
+            """
+            if not post_ids:
+                return {'message': 'post_ids is required'}, 400
+            if len(post_ids) > MAX_LIMIT:
+                return {'message': f'At most {MAX_LIMIT} post_ids per request'}, 400
+
+            counters = {
+                id: (upvotes, downvotes)
+                for id, upvotes, downvotes in Post.query.with_entities(Post.id, Post._upvotes, Post._downvotes)
+                    .filter(Post.id.in_(set(post_ids)))
+            }
+            user = current_user_or_none()
+            user_votes = dict(
+                Vote.query.with_entities(Vote._post_id, Vote._vote_type)
+                    .filter(Vote._user_id == user.id, Vote._post_id.in_(list(counters)))
+            ) if user and counters else {}
+
+            return jsonify([
+                {
+                    "post_id": id,
+                    "upvote_count": counters[id][0],
+                    "downvote_count": counters[id][1],
+                    "user_vote": user_votes.get(id)
+                }
+                for id in dict.fromkeys(post_ids) if id in counters
+            ])
+
     """
     Map the _CRUD and _POST_VOTES classes to the API endpoints for /vote and /vote/post.
     - The _CRUD class defines the HTTP methods for voting (post and delete).
     - The _POST_VOTES class defines the endpoint for retrieving all votes for a specific post.
+    - The _BATCH_VOTES class defines the endpoint for retrieving the vote counts of many posts in one call.
     """
     api.add_resource(_CRUD, '/vote')
-    api.add_resource(_POST_VOTES, '/vote/post')
\ No newline at end of file
+    api.add_resource(_POST_VOTES, '/vote/post')
+    api.add_resource(_BATCH_VOTES, '/vote/posts')
\ No newline at end of file
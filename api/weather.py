@@ -1,8 +1,9 @@
 import requests
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request
 from flask_restful import Api, Resource
 from api.jwt_authorize import token_required
-from model.weather import Weather  # Correct import for Weather and Park models
+from model.weather import Weather, park_channels
+from api.weather_service import current_by_city, normalize_city, weather_refresher
 
 # This Blueprint object is used to define APIs for the weather service.
 weather_api = Blueprint('weather_api', __name__, url_prefix='/api/weather')
@@ -10,71 +11,49 @@ weather_api = Blueprint('weather_api', __name__, url_prefix='/api/weather')
 # The Api object is connected to the Blueprint object to define the API endpoints.
 api = Api(weather_api)
 
-# Weather API setup
-API_KEY = '9bb9d39671474da4b83164647252402'
-BASE_URL = 'http://api.weatherapi.com/v1/current.json'
-
-def fetch_coordinates(city):
-    """Fetch latitude and longitude of the city using the weatherapi.com geocoding feature"""
-    response = requests.get(BASE_URL, params={
-        'key': API_KEY,
-        'q': city,
-        'aqi': 'no'
-    })
-    
-    if response.status_code == 200:
-        data = response.json()
-        lat = data['location']['lat']
-        lon = data['location']['lon']
-        return lat, lon
-    return None
-
-def fetch_weather(lat, lon):
-    """Fetch weather information from the weatherapi.com"""
-    response = requests.get(BASE_URL, params={
-        'key': API_KEY,
-        'q': f'{lat},{lon}',
-        'aqi': 'no'
-    })
-
-    if response.status_code == 200:
-        data = response.json()
-        return {
-            'temperature': data['current']['temp_c'],
-            'description': data['current']['condition']['text'],
-            'humidity': data['current']['humidity'],
-            'pressure': data['current']['pressure_mb'],
-            'wind_speed': data['current']['wind_kph']
-        }
-    return None
+@weather_api.before_app_request
+def start_weather_refresher():
+    """Starts the park weather refresher of this server process on its first request, one process refreshes."""
+    weather_refresher.start()
 
 class WeatherAPI(Resource):
     """Weather API resource class"""
     @token_required()
     def get(self, city):
         """Fetch weather for a specific city."""
-        city = city.strip().lower()
+        city = normalize_city(city)
+
+        # Known parks are served from the newest observation stored by the background refresher
+        park = next((channel for channel in park_channels() if normalize_city(channel._name) == city), None)
+        observation = Weather.latest(park.id) if park else None
+        if observation:
+            return {
+                "location": park._name,
+                "temperature": observation.temperature,
+                "description": observation.description,
+                "humidity": observation.humidity,
+                "pressure": observation.pressure,
+                "wind_speed": observation.wind_speed,
+                "updated_at": observation.created_at.isoformat()
+            }, 200
+
+        # One upstream call at most, repeated and concurrent lookups are answered from the weather service caches
+        try:
+            weather_data = current_by_city(city)
+        except requests.RequestException as e:
+            return {"error": "Unable to fetch weather data.", "message": str(e)}, 500
+
+        if not weather_data:
+            return {"error": "Location not found."}, 404
 
-        # Fetch coordinates using the city name
-        coordinates = fetch_coordinates(city)
-        
-        if not coordinates:
-            return jsonify({"error": "Location not found."}), 404
-        
-        lat, lon = coordinates
-        weather_data = fetch_weather(lat, lon)
-
-        if weather_data:
-            return jsonify({
-                "location": city.replace("-", " ").title(),
-                "temperature": weather_data["temperature"],
-                "description": weather_data["description"],
-                "humidity": weather_data["humidity"],
-                "pressure": weather_data["pressure"],
-                "wind_speed": weather_data["wind_speed"]
-            })
-
-        return jsonify({"error": "Unable to fetch weather data."}), 500
+        return {
+            "location": city.title(),
+            "temperature": weather_data["temperature"],
+            "description": weather_data["description"],
+            "humidity": weather_data["humidity"],
+            "pressure": weather_data["pressure"],
+            "wind_speed": weather_data["wind_speed"]
+        }, 200
 
 # Add the WeatherAPI resource to the API with the dynamic city parameter.
 api.add_resource(WeatherAPI, '/<string:city>')
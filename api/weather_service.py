@@ -0,0 +1,324 @@
+import os
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from __init__ import app, db
+from model.cache import TTLCache
+try:
+    import fcntl
+except ImportError:  # Windows, every process refreshes
+    fcntl = None
+from model.weather import Weather, park_channels, park_coordinates
+
+"""
+Weather service
+
+Wraps the weatherapi.com current conditions endpoint, which returns the resolved location and its current
+conditions in one response, so a lookup costs at most one upstream call.
+
+- City names are normalized and their coordinates kept in a geocode cache for WEATHER_GEOCODE_TTL seconds.
+- Conditions are kept for WEATHER_TTL seconds, keyed by the coordinates rounded to 2 decimals (about 1 km),
+  so a city name and a nearby lat/lon share one entry.
+- Concurrent lookups of the same key wait for the one call in flight instead of each calling upstream.
+- Calls reuse the keep-alive connections of one pooled requests.Session.
+
+A background refresher stores the conditions of every park channel as Weather rows every
+WEATHER_REFRESH_INTERVAL seconds, so park pages are served from the database without waiting on the API.
+Only the server worker holding the WEATHER_LOCK_FILE lock refreshes.
+"""
+
+# Decimals that coordinates are rounded to for the conditions cache
+COORDINATE_DECIMALS = 2
+
+geocode_cache = TTLCache(4096, app.config['WEATHER_GEOCODE_TTL'])  # normalized city -> (lat, lon)
+conditions_cache = TTLCache(4096, app.config['WEATHER_TTL'])  # rounded (lat, lon) -> conditions
+
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=app.config['WEATHER_POOL_SIZE'], pool_maxsize=app.config['WEATHER_POOL_SIZE'])
+_session.mount('http://', _adapter)
+_session.mount('https://', _adapter)
+
+
+class _InFlight:
+    """A lookup that is being fetched, shared by the requests waiting for it."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_inflight = {}  # lookup key -> _InFlight
+_inflight_lock = threading.Lock()
+
+
+def _coalesce(key, fetch):
+    """
+    Runs fetch once for concurrent lookups of the same key and gives every caller its result.
+
+    Args:
+        key: Identifies the lookup.
+        fetch (function): Called without arguments by the first caller.
+
+    Returns:
+        The result of fetch, an exception raised by fetch is raised in every caller.
+    """
+    with _inflight_lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _InFlight()
+    if not leader:
+        call.done.wait()
+    else:
+        try:
+            call.result = fetch()
+        except Exception as e:
+            call.error = e
+        finally:
+            with _inflight_lock:
+                del _inflight[key]
+            call.done.set()
+    if call.error is not None:
+        raise call.error
+    return call.result
+
+
+def normalize_city(city):
+    """Returns a city name in lower case with dashes as spaces and single spaces, eg 'San-Diego ' -> 'san diego'."""
+    return " ".join(city.replace("-", " ").lower().split())
+
+
+def _round(lat, lon):
+    return round(float(lat), COORDINATE_DECIMALS), round(float(lon), COORDINATE_DECIMALS)
+
+
+def _fetch(query):
+    """
+    Calls the current conditions endpoint once and caches the location and conditions of the response.
+
+    Args:
+        query (str): A city name or "lat,lon".
+
+    Returns:
+        dict: The conditions, or None if the location is not found.
+
+    Raises:
+        requests.RequestException: The upstream call failed.
+    """
+    response = _session.get(app.config['WEATHER_API_URL'], params={
+        'key': app.config['WEATHER_API_KEY'],
+        'q': query,
+        'aqi': 'no'
+    }, timeout=app.config['WEATHER_TIMEOUT'])
+    if response.status_code == 400:
+        return None  # weatherapi.com answers 400 when no location matches the query
+    response.raise_for_status()
+
+    data = response.json()
+    location, current = data['location'], data['current']
+    conditions = {
+        'lat': location['lat'],
+        'lon': location['lon'],
+        'temperature': current['temp_c'],
+        'description': current['condition']['text'],
+        'humidity': current['humidity'],
+        'pressure': current['pressure_mb'],
+        'wind_speed': current['wind_kph']
+    }
+    conditions_cache.set(_round(location['lat'], location['lon']), conditions)
+    return conditions
+
+
+def current_by_coordinates(lat, lon):
+    """
+    Returns the current conditions at a location, from the cache when they are recent enough.
+
+    Args:
+        lat (float): The latitude.
+        lon (float): The longitude.
+
+    Returns:
+        dict: The temperature, description, humidity, pressure, wind_speed and lat/lon of the conditions,
+            or None if the location is not found.
+
+    Raises:
+        requests.RequestException: The upstream call failed.
+    """
+    key = _round(lat, lon)
+    conditions = conditions_cache.get(key)
+    if conditions is None:
+        conditions = _coalesce(key, lambda: conditions_cache.get(key) or _fetch(f"{key[0]},{key[1]}"))
+    return conditions
+
+
+def current_by_city(city):
+    """
+    Returns the current conditions in a city, with at most one upstream call.
+
+    A city seen before is resolved from the geocode cache and answered from the conditions cache when possible,
+    otherwise the city name itself is sent upstream and both caches are filled from the one response.
+
+    Args:
+        city (str): The city name.
+
+    Returns:
+        dict: The conditions, see current_by_coordinates, or None if the city is not found.
+
+    Raises:
+        requests.RequestException: The upstream call failed.
+    """
+    name = normalize_city(city)
+    location = geocode_cache.get(name)
+    if location is not None:
+        return current_by_coordinates(location[0], location[1])
+
+    def fetch():
+        location = geocode_cache.get(name)
+        if location is not None:
+            return current_by_coordinates(location[0], location[1])
+        conditions = _fetch(name)
+        if conditions is not None:
+            geocode_cache.set(name, (conditions['lat'], conditions['lon']))
+        return conditions
+
+    return _coalesce(("city", name), fetch)
+
+
+def stats():
+    """
+    Returns the counters of the geocode and conditions caches.
+
+    Returns:
+        dict: The TTLCache stats of both caches.
+    """
+    return {"geocode": geocode_cache.stats(), "conditions": conditions_cache.stats()}
+
+
+def refresh_parks():
+    """
+    Fetches the current conditions of every park channel in parallel and stores them as Weather rows,
+    then deletes observations older than WEATHER_HISTORY_DAYS.
+
+    A park is located by the lat/lon in its channel attributes, or by its name when it has none.
+    A park whose lookup fails keeps its previous observation.
+
+    Returns:
+        int: The number of parks refreshed.
+    """
+    with app.app_context():
+        parks = [(channel.id, channel._name, park_coordinates(channel)) for channel in park_channels()]
+    if not parks:
+        return 0
+
+    def fetch(park):
+        channel_id, name, coordinates = park
+        try:
+            if coordinates:
+                return channel_id, current_by_coordinates(*coordinates)
+            return channel_id, current_by_city(name)
+        except requests.RequestException as e:
+            print(f"Weather refresh failed for {name}: {str(e)}")
+            return channel_id, None
+
+    with ThreadPoolExecutor(max_workers=min(len(parks), app.config['WEATHER_POOL_SIZE'])) as executor:
+        results = list(executor.map(fetch, parks))
+
+    observations = [
+        Weather(conditions['temperature'], conditions['description'], conditions['humidity'],
+                conditions['pressure'], channel_id, wind_speed=conditions['wind_speed'])
+        for channel_id, conditions in results if conditions
+    ]
+    with app.app_context():
+        db.session.add_all(observations)
+        db.session.commit()
+        Weather.prune(app.config['WEATHER_HISTORY_DAYS'])
+    return len(observations)
+
+
+class WeatherRefresher:
+    """
+    Runs refresh_parks on a daemon thread every WEATHER_REFRESH_INTERVAL seconds.
+
+    The thread is started on the first request of each server process, but only the process holding an
+    exclusive lock on WEATHER_LOCK_FILE refreshes, so N workers do not make N times the upstream calls and
+    store N copies of each observation. The others check the lock every interval and take over when its
+    holder exits, which releases the lock. A refresh only runs once the newest stored observation is an
+    interval old, so a restarted worker does not refresh at once.
+    """
+    def __init__(self, interval, lock_path):
+        self.interval = interval
+        self.lock_path = lock_path
+        self.lock_file = None
+        self.thread = None
+        self.pid = None
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Starts the refresher thread of this process unless it is running or disabled."""
+        if self.interval <= 0 or self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.lock_file = None  # a lock file inherited through fork belongs to the parent
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._run, name="weather-refresher", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Stops the refresher thread after its current refresh and releases the lock."""
+        self.stop_event.set()
+        self.pid = None
+        if self.lock_file:
+            self.lock_file.close()
+            self.lock_file = None
+
+    def acquire(self):
+        """
+        Takes the refresher lock without waiting.
+
+        Returns:
+            bool: True if this process holds the lock.
+        """
+        if self.lock_file or fcntl is None:
+            return True
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        return True
+
+    def refresh_if_due(self):
+        """
+        Refreshes the parks if the newest observation is at least an interval old.
+
+        Returns:
+            float: The seconds until the next refresh is due.
+        """
+        with app.app_context():
+            last = Weather.last_refresh()
+        age = (datetime.utcnow() - last).total_seconds() if last else None
+        if age is not None and age < self.interval:
+            return self.interval - age
+        refresh_parks()
+        return self.interval
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            wait = self.interval
+            try:
+                if self.acquire():
+                    wait = self.refresh_if_due()
+            except Exception as e:
+                print(f"Weather refresh failed: {str(e)}")
+            self.stop_event.wait(wait)
+
+
+weather_refresher = WeatherRefresher(app.config['WEATHER_REFRESH_INTERVAL'], app.config['WEATHER_LOCK_FILE'])
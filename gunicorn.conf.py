@@ -0,0 +1,66 @@
+# gunicorn.conf.py
+import glob
+import multiprocessing
+import os
+import sys
+
+"""
+Production server settings, read by gunicorn from the working directory: gunicorn main:app
+
+The app is served by several worker processes, each running several requests at once, so a slow Gemini or
+weather call holds one thread instead of the whole site. Every setting can be changed with an environment variable.
+
+Worker classes:
+- gthread (default): GUNICORN_THREADS threads per worker. Each worker keeps its own database connection pool,
+  sized to its thread count (DB_POOL_SIZE in __init__.py).
+- gevent: greenlets patched for cooperative I/O, up to GUNICORN_CONNECTIONS requests per worker, needs
+  pip install gevent. The app is then loaded after the fork, since gevent has to patch the standard library
+  before the app imports it.
+
+With preloading the app is imported once in the master process and the workers share its memory copy-on-write.
+The database engine created at import is disposed in each worker after the fork, so no two processes ever share
+a connection, and each worker opens its own pool on first use.
+"""
+
+bind = os.environ.get('GUNICORN_BIND') or '0.0.0.0:8102'
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS') or 'gthread'
+workers = int(os.environ.get('GUNICORN_WORKERS') or multiprocessing.cpu_count() * 2 + 1)
+# Shared with the app, which sizes its per worker process pools by it (PASSWORD_HASH_WORKERS in __init__.py)
+os.environ['GUNICORN_WORKERS'] = str(workers)
+threads = int(os.environ.get('GUNICORN_THREADS') or 4)
+worker_connections = int(os.environ.get('GUNICORN_CONNECTIONS') or 100)
+preload_app = (os.environ.get('GUNICORN_PRELOAD') or ('false' if worker_class == 'gevent' else 'true')).lower() == 'true'
+# Seconds a request may run before its worker is restarted, longer than the slowest chatbot reply
+timeout = int(os.environ.get('GUNICORN_TIMEOUT') or 120)
+graceful_timeout = 30
+keepalive = 5
+# Restart workers after a number of requests, with jitter so they do not all restart together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS') or 0)
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+
+def on_starting(server):
+    """
+    Deletes the metrics snapshots of the previous server run, whose worker PIDs may be reused by the new workers
+    after a restart, eg of a container with instance/ on a volume.
+    """
+    module = sys.modules.get('__init__')
+    if module is not None:
+        metrics_dir = module.app.config['METRICS_DIR']
+    else:
+        root = os.path.dirname(os.path.abspath(__file__))
+        metrics_dir = os.environ.get('METRICS_DIR') or os.path.join(root, 'instance', 'metrics')
+    for path in glob.glob(os.path.join(metrics_dir, '*.json')):
+        os.remove(path)
+
+def post_fork(server, worker):
+    """
+    Drops the database connections inherited from the master process, without closing them, so the worker
+    starts with an empty pool of its own. Without preloading the app is not imported yet and there is nothing to drop.
+    """
+    module = sys.modules.get('__init__')
+    if module is None:
+        return
+    with module.app.app_context():
+        module.db.engine.dispose(close=False)
@@ -19,6 +19,7 @@ CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True)
 
 # import "objects" from "this" project
 from __init__ import app, db, login_manager  # Key Flask objects 
+from sqlalchemy import text
 # API endpoints
 from api.user import user_api 
 from api.pfp import pfp_api
@@ -36,6 +37,12 @@ from api.camping import camping_api
 from api.quiz_api import quiz_api
 from api.location import location_api  
 from api.checklist import checklist_api 
+from api.weather import weather_api
+from api.review import review_api
+from api.nestPost import nestPost_api
+from api.feedback import feedback_api
+from api.images import upload_filename
+from api.metrics import metrics_api
 
 # database Initialization functions
 #from model.user import User, initUsers
@@ -47,12 +54,16 @@ from model.vote import Vote, initVotes
 from model.about import AboutModel
 from model.rating import Rating, initRatings
 from model.analytics import Analytics, initAnalytics
+from model.rating_stats import ChannelRatingStats
 from model.frostbyte import Frostbyte, initFrostbyte, find_by_uid
 from model.gemini import AIMessage, initAIMessage
 from model.camping_post import camping, initCampingPosts
 from model.quiz_result import QuizResult, initQuizResults
 from model.locationmodel import Location, initLocations
 from model.checklist import ChecklistItem, initChecklist
+from model.images import IMAGE_VARIANTS
+from model.index_advisor import advise
+from model.query_log import query_log
 
 
 
@@ -73,6 +84,11 @@ app.register_blueprint(location_api)
 app.register_blueprint(camping_api) 
 app.register_blueprint(quiz_api)
 app.register_blueprint(checklist_api)
+app.register_blueprint(weather_api)
+app.register_blueprint(review_api)
+app.register_blueprint(nestPost_api)
+app.register_blueprint(feedback_api)
+app.register_blueprint(metrics_api)
 
 
 
@@ -164,6 +180,27 @@ def analytics():
     return render_template("analytics.html", analytics_data=analytics_data)
 
 
+@app.route('/analytics/queries')
+@login_required
+def query_analytics():
+    # Slow-query log of this worker, the queries with the most total time first
+    if current_user.role != 'Admin':
+        abort(403)
+    return render_template(
+        "query_log.html", query_data=query_log.top(), slow_data=list(query_log.slow),
+        slow_ms=app.config['QUERY_LOG_SLOW_MS'], n_plus_one=query_log.n_plus_one, pid=os.getpid()
+    )
+
+
+@app.route('/analytics/queries/reset', methods=['POST'])
+@login_required
+def reset_query_analytics():
+    if current_user.role != 'Admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    query_log.reset()
+    return jsonify({'message': 'Query log cleared'}), 200
+
+
 @app.route('/ratings')
 @login_required
 def ratings():
@@ -192,9 +229,15 @@ def chatbot_messages():
     return render_template("chatbot_messages.html", messages_data=formatted_messages)
 
 
-# Helper function to extract uploads for a user (ie PFP image)
+# Helper function to extract uploads for a user (ie PFP image), ?size=thumb or medium sends a smaller copy
 @app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
+    variant = request.args.get('size')
+    if variant in IMAGE_VARIANTS:
+        user_uid, _, name = filename.rpartition('/')
+        name = upload_filename(user_uid, name, variant)
+        if name:
+            filename = f"{user_uid}/{name}"
     return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
  
 @app.route('/users/delete/<int:user_id>', methods=['DELETE'])
@@ -271,6 +314,9 @@ def backup_database(db_uri, backup_uri):
     if backup_uri:
         db_path = db_uri.replace('sqlite:///', 'instance/')
         backup_path = backup_uri.replace('sqlite:///', 'instance/')
+        # Move the committed pages from the write-ahead log into the database file before copying it
+        with app.app_context():
+            db.session.execute(text('PRAGMA wal_checkpoint(TRUNCATE)'))
         shutil.copyfile(db_path, backup_path)
         print(f"Database backed up to {backup_path}")
     else:
@@ -284,7 +330,7 @@ def extract_data():
         data['sections'] = [section.read() for section in Section.query.all()]
         data['groups'] = [group.read() for group in Group.query.all()]
         data['channels'] = [channel.read() for channel in Channel.query.all()]
-        data['posts'] = [post.read() for post in Post.query.all()]
+        data['posts'] = Post.read_all()
     return data
 
 # Save extracted data to JSON files
@@ -373,6 +419,41 @@ def restore_data_command():
     data = load_data_from_json()
     restore_data(data)
 
+# Define a command to set the grid cell of locations stored before the spatial index existed
+@custom_cli.command('index_locations')
+def index_locations():
+    locations = Location.reindex()
+    print(f"Grid cells set for {locations} location(s).")
+
+# Define a command to recompute the vote counters of the posts from the votes table
+@custom_cli.command('recount_votes')
+def recount_votes():
+    posts = Vote.recount()
+    print(f"Vote counters recounted for {posts} voted post(s).")
+
+# Define a command to recompute the per channel rating totals from the ratings and analytics tables
+@custom_cli.command('rebuild_rating_stats')
+def rebuild_rating_stats():
+    ratings = ChannelRatingStats.rebuild('ratings', Rating)
+    analytics = ChannelRatingStats.rebuild('analytics', Analytics)
+    print(f"Rating totals rebuilt for {ratings} rated and {analytics} reviewed channel(s).")
+
+# Define a command to run the hot queries through the query planner and flag full table scans
+@custom_cli.command('index_advisor')
+def index_advisor():
+    report = advise()
+    for entry in report:
+        if 'error' in entry:
+            print(f"SKIPPED    {entry['query']}: {entry['error']}")
+            continue
+        print(f"{'FULL SCAN' if entry['full_scan'] else 'OK':<10} {entry['query']}")
+        if entry['full_scan']:
+            print(f"           {entry['sql']}")
+            for row in entry['plan']:
+                print(f"           {row.get('detail') or row}")
+    scans = sum(1 for entry in report if entry.get('full_scan'))
+    print(f"{scans} of {len(report)} hot queries scan a whole table.")
+
 # Register the custom command group with the Flask application
 app.cli.add_command(custom_cli)
         
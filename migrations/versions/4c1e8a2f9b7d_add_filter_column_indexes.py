@@ -0,0 +1,50 @@
+"""Add indexes on the foreign key and filter columns the APIs query by
+
+Revision ID: 4c1e8a2f9b7d
+Revises:
+Create Date: 2026-10-18 16:30:00.000000
+
+Databases created with db.create_all already have these indexes from the models, so each one is only
+created when missing, and tables the database does not have are skipped. Columns that lead a unique
+constraint (ratings.user_id, votes._user_id and locations.user_id) are already served by its index
+and get none of their own.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c1e8a2f9b7d'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_posts__channel_id', 'posts', ['_channel_id']),
+    ('ix_posts__user_id', 'posts', ['_user_id']),
+    ('ix_votes__post_id', 'votes', ['_post_id']),
+    ('ix_ratings_channel_id', 'ratings', ['channel_id']),
+    ('ix_analytics_channel_id', 'analytics', ['channel_id']),
+    ('ix_locations_channel_id', 'locations', ['channel_id']),
+    ('ix_quiz_results_user_id', 'quiz_results', ['user_id']),
+    ('ix_checklist_items_user_id', 'checklist_items', ['user_id']),
+    ('ix_camping_posts__channel_id', 'camping_posts', ['_channel_id']),
+    ('ix_reviews__channel_id', 'reviews', ['_channel_id']),
+    ('ix_channels__group_id', 'channels', ['_group_id']),
+    ('ix_channels__name', 'channels', ['_name']),
+    ('ix_groups__section_id', 'groups', ['_section_id']),
+]
+
+
+def upgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    for name, table, columns in INDEXES:
+        if table in tables:
+            op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    for name, table, columns in reversed(INDEXES):
+        if table in tables:
+            op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,176 @@
+"""Add the columns and tables of the caching, counter and weather changes
+
+Revision ID: 9a6d2c4e8f13
+Revises: 4c1e8a2f9b7d
+Create Date: 2026-10-18 18:10:00.000000
+
+Brings a database made by db_init before these changes to the current models:
+
+- posts._upvotes and posts._downvotes, counted from the votes table
+- the unique vote per user and post, after deleting duplicate votes
+- ai_messages._user_id, the user of a chatbot conversation
+- locations.grid_cell, computed from each location's coordinates
+- the ai_cached_responses and channel_rating_stats tables, the rating totals computed from ratings and analytics
+- the weather table keyed by park channel, which replaces the unused table keyed by the missing parks table
+
+Every step checks the database first, so databases created with db.create_all, which already have the
+current schema, are left as they are. Columns are added in batch mode, which rebuilds the table on SQLite.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a6d2c4e8f13'
+down_revision = '4c1e8a2f9b7d'
+branch_labels = None
+depends_on = None
+
+# Grid cell size of model/geo.py when this revision was written
+GRID_DEGREES = 0.5
+
+
+def _columns(inspector, table):
+    return {column['name'] for column in inspector.get_columns(table)}
+
+
+def _add_columns(inspector, tables, table, columns, indexes=()):
+    """Adds the missing columns of a table and their indexes, returns the names of the added columns."""
+    if table not in tables:
+        return set()
+    missing = [column for column in columns if column.name not in _columns(inspector, table)]
+    if missing:
+        with op.batch_alter_table(table) as batch_op:
+            for column in missing:
+                batch_op.add_column(column)
+    added = {column.name for column in missing}
+    for name, column_names in indexes:
+        if added & set(column_names):
+            op.create_index(name, table, column_names, unique=False, if_not_exists=True)
+    return added
+
+
+def _grid_cell(latitude, longitude):
+    rows, columns = int(180 / GRID_DEGREES), int(360 / GRID_DEGREES)
+    row = min(int((latitude + 90) // GRID_DEGREES), rows - 1)
+    column = int(((longitude + 180) % 360) // GRID_DEGREES)
+    return row * columns + column
+
+
+def _rating_totals(source, table):
+    histogram = ', '.join(f'SUM(CASE WHEN stars = {value} THEN 1 ELSE 0 END)' for value in range(1, 6))
+    op.execute(
+        f"INSERT INTO channel_rating_stats "
+        f"(source, channel_id, stars_sum, count, stars_1, stars_2, stars_3, stars_4, stars_5) "
+        f"SELECT '{source}', COALESCE(channel_id, 0), COALESCE(SUM(stars), 0), COUNT(id), {histogram} "
+        f"FROM {table} GROUP BY COALESCE(channel_id, 0)"
+    )
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = inspector.get_table_names()
+
+    if _add_columns(inspector, tables, 'posts', [
+        sa.Column('_upvotes', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('_downvotes', sa.Integer(), nullable=False, server_default='0'),
+    ]) and 'votes' in tables:
+        op.execute(
+            "DELETE FROM votes WHERE id NOT IN "
+            "(SELECT id FROM (SELECT MIN(id) AS id FROM votes GROUP BY _user_id, _post_id) AS keep)"
+        )
+        for column, vote_type in (('_upvotes', 'upvote'), ('_downvotes', 'downvote')):
+            op.execute(
+                f"UPDATE posts SET {column} = (SELECT COUNT(*) FROM votes "
+                f"WHERE votes._post_id = posts.id AND votes._vote_type = '{vote_type}')"
+            )
+
+    if 'votes' in tables:
+        unique_names = {constraint['name'] for constraint in inspector.get_unique_constraints('votes')}
+        unique_names |= {index['name'] for index in inspector.get_indexes('votes') if index['unique']}
+        if 'unique_user_post_vote' not in unique_names:
+            op.create_index('unique_user_post_vote', 'votes', ['_user_id', '_post_id'], unique=True)
+
+    _add_columns(inspector, tables, 'ai_messages', [
+        sa.Column('_user_id', sa.Integer(),
+                  sa.ForeignKey('frostbytes.id', name='fk_ai_messages__user_id', ondelete='SET NULL'), nullable=True),
+    ], indexes=[('ix_ai_messages__user_id', ['_user_id'])])
+
+    if _add_columns(inspector, tables, 'locations', [
+        sa.Column('grid_cell', sa.Integer(), nullable=True),
+    ], indexes=[('ix_locations_grid_cell', ['grid_cell'])]):
+        locations = sa.table('locations', sa.column('id'), sa.column('grid_cell'))
+        for id, latitude, longitude in bind.execute(sa.text('SELECT id, latitude, longitude FROM locations')):
+            bind.execute(
+                locations.update().where(locations.c.id == id).values(grid_cell=_grid_cell(latitude, longitude))
+            )
+
+    if 'ai_cached_responses' not in tables:
+        op.create_table(
+            'ai_cached_responses',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('prompt_key', sa.String(64), nullable=False, unique=True),
+            sa.Column('prompt', sa.Text(), nullable=False),
+            sa.Column('response', sa.Text(), nullable=False),
+            sa.Column('hits', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('last_used', sa.DateTime(), nullable=False),
+        )
+        op.create_index('ix_ai_cached_responses_last_used', 'ai_cached_responses', ['last_used'])
+
+    if 'channel_rating_stats' not in tables:
+        op.create_table(
+            'channel_rating_stats',
+            sa.Column('source', sa.String(16), primary_key=True),
+            sa.Column('channel_id', sa.Integer(), primary_key=True, autoincrement=False),
+            sa.Column('stars_sum', sa.Integer(), nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            *[sa.Column(f'stars_{value}', sa.Integer(), nullable=False) for value in range(1, 6)],
+        )
+        for source in ('ratings', 'analytics'):
+            if source in tables:
+                _rating_totals(source, source)
+
+    # Observations are refetched every refresh interval, so the old table is replaced rather than converted
+    if 'weather' in tables and '_channel_id' not in _columns(inspector, 'weather'):
+        op.drop_table('weather')
+        tables.remove('weather')
+    if 'weather' not in tables:
+        op.create_table(
+            'weather',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('temperature', sa.Float(), nullable=False),
+            sa.Column('description', sa.String(255), nullable=False),
+            sa.Column('humidity', sa.Integer(), nullable=False),
+            sa.Column('pressure', sa.Float(), nullable=False),
+            sa.Column('wind_speed', sa.Float(), nullable=True),
+            sa.Column('_channel_id', sa.Integer(), sa.ForeignKey('channels.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=False),
+        )
+        op.create_index('ix_weather_channel_created', 'weather', ['_channel_id', 'created_at'])
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+    for table in ('weather', 'channel_rating_stats', 'ai_cached_responses'):
+        if table in tables:
+            op.drop_table(table)
+    if 'votes' in tables and 'unique_user_post_vote' in {index['name'] for index in inspector.get_indexes('votes')}:
+        op.drop_index('unique_user_post_vote', table_name='votes')
+    for table, columns, indexes in (
+        ('locations', ['grid_cell'], ['ix_locations_grid_cell']),
+        ('ai_messages', ['_user_id'], ['ix_ai_messages__user_id']),
+        ('posts', ['_upvotes', '_downvotes'], []),
+    ):
+        if table not in tables:
+            continue
+        for index in indexes:
+            op.drop_index(index, table_name=table, if_exists=True)
+        present = _columns(inspector, table)
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                if column in present:
+                    batch_op.drop_column(column)
@@ -0,0 +1,60 @@
+"""Add the reviews, nestPosts and feedbacks tables
+
+Revision ID: b7e3f1a9c2d5
+Revises: 9a6d2c4e8f13
+Create Date: 2026-10-18 21:40:00.000000
+
+The review, nest post and feedback APIs are registered in main.py, so their tables are created in databases made
+before. Databases that already have a table are left as they are.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e3f1a9c2d5'
+down_revision = '9a6d2c4e8f13'
+branch_labels = None
+depends_on = None
+
+TABLES = ('reviews', 'nestPosts', 'feedbacks')
+
+
+def upgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'reviews' not in tables:
+        op.create_table(
+            'reviews',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('_title', sa.String(255), nullable=False),
+            sa.Column('_comment', sa.String(255), nullable=False),
+            sa.Column('_content', sa.JSON(), nullable=False),
+            sa.Column('_user_id', sa.Integer(), sa.ForeignKey('frostbytes.id'), nullable=False),
+            sa.Column('_channel_id', sa.Integer(), sa.ForeignKey('channels.id'), nullable=False),
+        )
+        op.create_index('ix_reviews__channel_id', 'reviews', ['_channel_id'])
+    if 'nestPosts' not in tables:
+        op.create_table(
+            'nestPosts',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('_title', sa.String(255), nullable=False),
+            sa.Column('_content', sa.Text(), nullable=False),
+            sa.Column('_user_id', sa.Integer(), sa.ForeignKey('frostbytes.id'), nullable=False),
+            sa.Column('_group_id', sa.Integer(), sa.ForeignKey('groups.id'), nullable=False),
+            sa.Column('_image_url', sa.String(255), nullable=False),
+        )
+    if 'feedbacks' not in tables:
+        op.create_table(
+            'feedbacks',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('_content', sa.Text(), nullable=False),
+            sa.Column('_user_id', sa.Integer(), sa.ForeignKey('frostbytes.id'), nullable=False),
+            sa.Column('_post_id', sa.Integer(), sa.ForeignKey('posts.id'), nullable=False),
+        )
+
+
+def downgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    for table in reversed(TABLES):
+        if table in tables:
+            op.drop_table(table)
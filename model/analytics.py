@@ -1,15 +1,23 @@
+import atexit
+import os
+import threading
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from sqlalchemy.orm import relationship
 #from model.post import Post
-from __init__ import db
+from __init__ import app, db
 from api.jwt_authorize import token_required
+from model.bulk import BulkInsertError, bulk_insert, is_id
+from model.channel import Channel
+from model.frostbyte import Frostbyte
+from model.rating_stats import ChannelRatingStats, track_ratings
+from model.retry import retry_on_lock
 
 class Analytics(db.Model):
     __tablename__ = 'analytics'
 
     id = db.Column(db.Integer, primary_key=True)
-    channel_id = db.Column(db.Integer, db.ForeignKey('channels.id'), nullable=True)
+    channel_id = db.Column(db.Integer, db.ForeignKey('channels.id'), nullable=True, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('frostbytes.id'), nullable=False)    
     stars = db.Column(db.Integer, nullable=False)
 
@@ -23,6 +31,7 @@ class Analytics(db.Model):
         self.stars = stars
 
 
+    @retry_on_lock
     def create(self):
         db.session.add(self)
         db.session.commit()
@@ -44,7 +53,203 @@ class Analytics(db.Model):
        
         db.session.delete(self)
         db.session.commit()
-        
+
+    @staticmethod
+    def bulk_create(items):
+        """
+        Creates many analytics entries at once.
+
+        The whole batch is validated first, with one lookup for all referenced users and one for all channels,
+        then the valid entries are inserted with executemany in chunked transactions that also update the
+        channel rating totals.
+
+        Args:
+            items (list): A list of dictionaries with channel_id, user_id and stars.
+
+        Returns:
+            dict: The number of entries created as success, and the data and error message of each rejected entry.
+
+        Raises:
+            BulkInsertError: The database failed partway, its pending keys are the indexes of the items not written.
+                Its results hold the entries created and every rejected or unwritten entry, and the pending indexes.
+        """
+        results = {'success': 0, 'errors': []}
+
+        def reject(data, message):
+            results['errors'].append({'data': data, 'error': message})
+
+        def ids(model, field):
+            wanted = {item.get(field) for item in items if isinstance(item, dict) and is_id(item.get(field))}
+            return {id for (id,) in db.session.query(model.id).filter(model.id.in_(wanted))} if wanted else set()
+        users, channels = ids(Frostbyte, 'user_id'), ids(Channel, 'channel_id')
+
+        rows = []
+        for index, data in enumerate(items):
+            if not isinstance(data, dict) or not all(field in data for field in ('channel_id', 'user_id', 'stars')):
+                reject(data, 'Missing required fields')
+            elif type(data['stars']) is not int or not 1 <= data['stars'] <= 5:
+                reject(data, 'Stars must be an integer between 1 and 5')
+            elif not is_id(data['user_id']) or not (data['channel_id'] is None or is_id(data['channel_id'])):
+                reject(data, 'User ID and channel ID must be integers')
+            elif data['user_id'] not in users:
+                reject(data, f"User {data['user_id']} not found")
+            elif data['channel_id'] is not None and data['channel_id'] not in channels:
+                reject(data, f"Channel {data['channel_id']} not found")
+            else:
+                rows.append((index, {'channel_id': data['channel_id'], 'user_id': data['user_id'], 'stars': data['stars']}))
+
+        def update_totals(mappings):
+            ratings = [(mapping['channel_id'], mapping['stars']) for mapping in mappings]
+            ChannelRatingStats.apply_many(db.session.connection(), 'analytics', ratings)
+
+        try:
+            inserted, failures = bulk_insert(Analytics, rows, before_commit=update_totals)
+        except BulkInsertError as e:
+            results['success'] = e.inserted
+            for index, error in e.failures:
+                reject(items[index], error)
+            for index in e.pending:
+                reject(items[index], f'Not written, the database failed: {e}')
+            results['pending'] = e.pending
+            e.results = results
+            raise
+        results['success'] = inserted
+        for index, error in failures:
+            reject(items[index], error)
+        return results
+
+
+# Keep the per channel totals in channel_rating_stats up to date
+track_ratings(Analytics, 'analytics')
+
+
+class AnalyticsBuffer:
+    """
+    Write-behind buffer for single analytics events.
+
+    Events are kept in memory and written together with Analytics.bulk_create by a background thread,
+    every ANALYTICS_BUFFER_MS milliseconds or as soon as ANALYTICS_BUFFER_ROWS events are waiting, so a burst of
+    star clicks costs one transaction instead of one per click. Buffered events are lost if the process is
+    killed, and events rejected by validation are only logged, so the buffer is off unless ANALYTICS_BUFFER_MS
+    is set. The thread is started on first use in each process, and remaining events are written at exit.
+
+    At most max_waiting events are held, so a database outage cannot grow the buffer without limit, and the
+    oldest events are dropped beyond that. A failed write puts back only the events that were not committed.
+    """
+    def __init__(self, interval_ms, max_rows, max_waiting):
+        self.interval = interval_ms / 1000
+        self.max_rows = max_rows
+        self.max_waiting = max_waiting
+        self.events = []
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pid = None
+        self.written = 0
+        self.rejected = 0
+        self.dropped = 0
+
+    @property
+    def enabled(self):
+        return self.interval > 0
+
+    def add(self, data):
+        """
+        Queues one event to be written.
+
+        Args:
+            data (dict): The channel_id, user_id and stars of the event.
+        """
+        self._start()
+        with self.lock:
+            self.events.append(data)
+            self._trim()
+            full = len(self.events) >= self.max_rows
+        if full:
+            self.wake.set()
+
+    def flush(self):
+        """
+        Writes the waiting events.
+
+        Returns:
+            int: The number of events taken from the buffer.
+        """
+        with self.lock:
+            events, self.events = self.events, []
+        if not events:
+            return 0
+        try:
+            with app.app_context():
+                results = Analytics.bulk_create(events)
+        except BulkInsertError as e:
+            # Chunks before the error are committed, keep only the rest for the next flush
+            with self.lock:
+                self.written += e.inserted
+                self.rejected += len(e.failures)
+                self.events[:0] = [events[index] for index in e.pending]
+                self._trim()
+            raise
+        except Exception:
+            with self.lock:
+                self.events[:0] = events  # nothing was written, keep them for the next flush
+                self._trim()
+            raise
+        with self.lock:
+            self.written += results['success']
+            self.rejected += len(results['errors'])
+        for error in results['errors']:
+            print(f"Analytics event rejected: {error['error']} {error['data']}")
+        return len(events)
+
+    def stats(self):
+        """
+        Returns the buffer counters.
+
+        Returns:
+            dict: The waiting, written, rejected and dropped event counts and the buffer settings.
+        """
+        with self.lock:
+            return {
+                'waiting': len(self.events),
+                'written': self.written,
+                'rejected': self.rejected,
+                'dropped': self.dropped,
+                'interval_ms': int(self.interval * 1000),
+                'max_rows': self.max_rows,
+                'max_waiting': self.max_waiting
+            }
+
+    def _trim(self):
+        """Drops the oldest events beyond max_waiting, called with the lock held."""
+        excess = len(self.events) - self.max_waiting
+        if excess > 0:
+            del self.events[:excess]
+            self.dropped += excess
+
+    def _start(self):
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            threading.Thread(target=self._run, name="analytics-buffer", daemon=True).start()
+
+    def _run(self):
+        while True:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Analytics buffer flush failed: {str(e)}")
+
+
+analytics_buffer = AnalyticsBuffer(
+    app.config['ANALYTICS_BUFFER_MS'], app.config['ANALYTICS_BUFFER_ROWS'], app.config['ANALYTICS_BUFFER_MAX']
+)
+atexit.register(analytics_buffer.flush)
+
 
 def initAnalytics():
         from model.analytics import Analytics
@@ -0,0 +1,136 @@
+# bulk.py
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.exc import DBAPIError, OperationalError
+from __init__ import db
+from model.retry import retry_on_lock
+
+# Rows inserted per transaction
+CHUNK_SIZE = 500
+
+def is_id(value):
+    """
+    Checks that a value from a JSON payload is a row ID, an int but not a bool.
+
+    Args:
+        value: The value to check.
+
+    Returns:
+        bool: True for an int, False for anything else, including True and False.
+    """
+    return type(value) is int
+
+class BulkInsertError(Exception):
+    """
+    Raised by bulk_insert when the database fails for a reason other than the rows themselves, eg a lost
+    connection or a lock that outlasted the retries, after the chunks before the failing one were committed.
+
+    Attributes:
+        inserted (int): The number of rows inserted before the error.
+        failures (list): The (key, error message) of the rows rejected before the error.
+        pending (list): The keys of the rows that were neither inserted nor rejected, in order.
+        results (dict): The response of the bulk endpoint for the partial insert, set by the model's bulk_create.
+    """
+    def __init__(self, error, inserted, failures, pending):
+        super().__init__(str(error))
+        self.inserted = inserted
+        self.failures = failures
+        self.pending = pending
+        self.results = None
+
+def bulk_insert(model, rows, chunk_size=CHUNK_SIZE, before_commit=None):
+    """
+    Inserts many rows of one model with executemany, committing one transaction per chunk.
+
+    If a chunk fails on a constraint or on a value the database rejects, it is rolled back and retried
+    row by row, so only the failing rows are rejected and the rest of the chunk is still inserted.
+    A chunk that fails on a lock is run again as a whole. Operational errors, which are not caused by the
+    rows, stop the insert with a BulkInsertError that tells which rows were not written.
+
+    Args:
+        model (db.Model): The model class to insert into.
+        rows (list): A list of (key, mapping) tuples, where mapping holds the column attribute values
+            of one row and key identifies that row in the returned failures.
+        chunk_size (int): The number of rows per transaction. Defaults to CHUNK_SIZE.
+        before_commit (function, optional): Called with the list of mappings inserted by a transaction just before
+            it commits, to keep derived tables in step since bulk inserts do not fire mapper events.
+
+    Returns:
+        tuple: The number of rows inserted and a list of (key, error message) for the rejected rows.
+
+    Raises:
+        BulkInsertError: The database failed with an operational error, the rows before it are committed.
+    """
+    inserted = 0
+    failures = []
+    done = 0  # rows inserted or rejected so far
+    try:
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            try:
+                _insert_chunk(model, [mapping for _, mapping in chunk], before_commit)
+                inserted += len(chunk)
+                done += len(chunk)
+            except OperationalError:
+                raise
+            except DBAPIError:
+                db.session.rollback()
+                for key, mapping in chunk:
+                    try:
+                        _insert_chunk(model, [mapping], before_commit)
+                        inserted += 1
+                    except OperationalError:
+                        raise
+                    except DBAPIError as e:
+                        db.session.rollback()
+                        failures.append((key, str(e.orig)))
+                    done += 1
+    except OperationalError as e:
+        db.session.rollback()
+        raise BulkInsertError(e.orig, inserted, failures, [key for key, _ in rows[done:]]) from e
+    return inserted, failures
+
+@retry_on_lock
+def _insert_chunk(model, mappings, before_commit):
+    """
+    Inserts one chunk of rows in its own transaction, run again if the transaction fails on a lock.
+    """
+    db.session.bulk_insert_mappings(model, mappings)
+    if before_commit:
+        before_commit(mappings)
+    db.session.commit()
+
+def upsert_statement(dialect_name, table, rows, increment=(), keys=None):
+    """
+    Builds one INSERT statement that updates the existing row instead when a row with the same primary
+    or unique key exists, with ON CONFLICT DO UPDATE on SQLite and ON DUPLICATE KEY UPDATE on MySQL.
+
+    Args:
+        dialect_name (str): The name of the database dialect, 'sqlite' or 'mysql'.
+        table (Table): The table to insert into.
+        rows (list): The column values of each row, as dictionaries.
+        increment (iterable): Columns that are added to the existing value on a conflict.
+            Other given columns are overwritten.
+        keys (list, optional): The names of the columns of the unique key that decides a conflict.
+            Defaults to the primary key.
+
+    Returns:
+        Insert: The statement, to be run with connection.execute or db.session.execute.
+    """
+    columns = rows[0].keys()
+    key_columns = keys or [column.name for column in table.primary_key]
+    if dialect_name == 'mysql':
+        statement = mysql.insert(table).values(rows)
+        new = statement.inserted
+    elif dialect_name == 'sqlite':
+        statement = sqlite.insert(table).values(rows)
+        new = statement.excluded
+    else:
+        raise NotImplementedError(f"Upsert is not supported for {dialect_name}")
+
+    updates = {
+        column: table.c[column] + new[column] if column in increment else new[column]
+        for column in columns if column not in key_columns and column not in table.primary_key.columns
+    }
+    if dialect_name == 'mysql':
+        return statement.on_duplicate_key_update(**updates)
+    return statement.on_conflict_do_update(index_elements=[table.c[column] for column in key_columns], set_=updates)
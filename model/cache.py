@@ -0,0 +1,111 @@
+# cache.py
+import threading
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """
+    TTLCache
+
+    A small thread-safe in-process cache with least-recently-used eviction and a time-to-live per entry.
+    It is shared by the request threads of one worker process, so every worker keeps its own copy.
+
+    Attributes:
+        maxsize (int): The largest number of entries kept, 0 disables the cache.
+        ttl (float): The number of seconds an entry stays valid after it is set.
+        hits (int): The number of get calls answered from the cache.
+        misses (int): The number of get calls that found no valid entry.
+    """
+    def __init__(self, maxsize=1024, ttl=60):
+        """
+        Constructor, 1st step in object creation.
+
+        Args:
+            maxsize (int): The largest number of entries kept. Defaults to 1024.
+            ttl (float): The number of seconds an entry stays valid. Defaults to 60.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored for key, or default when it is missing or expired.
+
+        Args:
+            key: The cache key.
+            default: The value returned on a miss. Defaults to None.
+
+        Returns:
+            The cached value or default.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """
+        Stores value for key, evicting the least recently used entries when the cache is full.
+
+        Args:
+            key: The cache key.
+            value: The value to store.
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        """
+        Removes the entry for key if there is one.
+
+        Args:
+            key: The cache key.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Removes every entry and resets the hit and miss counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: The size, maxsize, ttl, hits, misses and hit_ratio of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
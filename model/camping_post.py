@@ -16,7 +16,7 @@ class camping(db.Model):
     _title = db.Column(db.String(255), nullable=False)
     _comment = db.Column(db.String(255), nullable=False)
     _user_id = db.Column(db.Integer, db.ForeignKey('frostbytes.id', ondelete='SET NULL'), nullable=True)
-    _channel_id = db.Column(db.Integer, db.ForeignKey('channels.id'), nullable=False, default=1)  # Replace 1 with a valid default ID
+    _channel_id = db.Column(db.Integer, db.ForeignKey('channels.id'), nullable=False, default=1, index=True)  # Replace 1 with a valid default ID
     
     def __init__(self, title, comment, user_id=None, channel_id=None, user_name=None, channel_name=None):
         
@@ -45,6 +45,10 @@ class camping(db.Model):
         
         user = Frostbyte.query.get(self._user_id)
         channel = Channel.query.get(self._channel_id)
+        return self._read(user, channel)
+
+    def _read(self, user, channel):
+        
         data = {
             "id": self.id,
             "title": self._title,
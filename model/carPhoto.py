@@ -1,10 +1,16 @@
 import base64
 import os
-from werkzeug.utils import secure_filename
 from __init__ import app
+from model.images import decode_base64, store_image, delete_image
+
+def default_car_path():
+    """
+    Returns the path of the picture shown when a user has no car picture.
+    """
+    return os.path.join(app.config['UPLOAD_FOLDER'], 'no_car.jpg')
 
 def default_car_decode():
-        img_path = f"{app.config['UPLOAD_FOLDER']}/no_car.jpg"
+        img_path = default_car_path()
         with open(img_path, 'rb') as img_file:
             base64_encoded = base64.b64encode(img_file.read()).decode('utf-8')
         return base64_encoded
@@ -36,9 +42,8 @@ def car_base64_upload(base64_image, user_uid):
     """
     Uploads a base64 encoded image as a car picture for a user.
 
-    This function decodes a base64 encoded image and saves it to a secure location on the server.
-    It organizes images by storing each user's image in a separate directory within the UPLOAD_FOLDER.
-    This approach helps to avoid filename conflicts and ensures better organization of files.
+    This function decodes a base64 encoded image, checks it is a real image, and saves its thumb, medium and full
+    size variants in the user's directory within the UPLOAD_FOLDER, named after its kind and content (see model/images.py).
 
     Parameters:
     - base64_image (str): The base64 encoded image to be uploaded.
@@ -46,17 +51,15 @@ def car_base64_upload(base64_image, user_uid):
 
     Returns:
     - str: The filename of the saved image if the upload is successful; otherwise, None.
+
+    Raises:
+    - ValueError: If the data is not a valid base64 encoded image.
     """
+    image_data = decode_base64(base64_image)
     try:
-        image_data = base64.b64decode(base64_image)
-        filename = secure_filename(f'{user_uid}_car.png')
-        user_dir = os.path.join(app.config['UPLOAD_FOLDER'], user_uid)
-        if not os.path.exists(user_dir):
-            os.makedirs(user_dir)
-        file_path = os.path.join(user_dir, filename)
-        with open(file_path, 'wb') as img_file:
-            img_file.write(image_data)
-        return filename 
+        return store_image(image_data, user_uid, 'car')
+    except ValueError:
+        raise
     except Exception as e:
         print (f'An error occurred while updating the car picture: {str(e)}')
         return None
@@ -65,7 +68,7 @@ def car_file_delete(user_uid, filename):
     """
     Deletes the car picture file from the server.
 
-    This function removes a file from the server's filesystem. It is typically used to delete car pictures
+    This function removes a file and its size variants from the server's filesystem. It is typically used to delete car pictures
     when a user updates their image or removes it entirely.
 
     Parameters:
@@ -76,9 +79,7 @@ def car_file_delete(user_uid, filename):
     - bool: True if the file was deleted successfully; otherwise, False.
     """
     try:
-        img_path = os.path.join(app.config['UPLOAD_FOLDER'], user_uid, filename)
-        if os.path.exists(img_path):
-            os.remove(img_path)
+        delete_image(user_uid, filename)
         # Success is when the file does not exist after calling this function
         return True 
     except Exception as e:
@@ -19,9 +19,9 @@ class Channel(db.Model):
     __tablename__ = 'channels'
 
     id = db.Column(db.Integer, primary_key=True)
-    _name = db.Column(db.String(255), nullable=False)
+    _name = db.Column(db.String(255), nullable=False, index=True)
     _attributes = db.Column(JSON, nullable=True)
-    _group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=False)
+    _group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=False, index=True)
 
     posts = db.relationship('Post', backref='channel', lazy=True)
 
@@ -169,10 +169,10 @@ def initChannels():
             Channel(name='Aquatic', group_id=camping.id),
             Channel(name='Desert', group_id=camping.id),
             Channel(name='Chosen Park', group_id=national_parks.id),
-            Channel(name='Denali', group_id=national_parks.id),
-            Channel(name='Buck Reef', group_id=national_parks.id),
-            Channel(name='Redwood', group_id=national_parks.id),
-            Channel(name='Grand Canyon', group_id=national_parks.id),
+            Channel(name='Denali', group_id=national_parks.id, attributes={'lat': 63.1148, 'lon': -151.1926}),
+            Channel(name='Buck Reef', group_id=national_parks.id, attributes={'lat': 17.7872, 'lon': -64.6194}),
+            Channel(name='Redwood', group_id=national_parks.id, attributes={'lat': 41.2132, 'lon': -124.0046}),
+            Channel(name='Grand Canyon', group_id=national_parks.id, attributes={'lat': 36.1069, 'lon': -112.1129}),
         ]
 
         channels = channels
@@ -11,7 +11,7 @@ class ChecklistItem(db.Model):
     __tablename__ = 'checklist_items'
    
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, nullable=False)  
+    user_id = db.Column(db.Integer, nullable=False, index=True)  
     item_name = db.Column(db.String(100), nullable=False)
     is_checked = db.Column(db.Boolean, default=False, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -76,11 +76,24 @@ class Feedback(db.Model):
         """
         user = Frostbyte.query.get(self._user_id)
         post = Post.query.get(self._post_id)
+        return self._read(user, post)
+
+    def _read(self, user, post):
+        """
+        Builds the feedback dictionary from already resolved user and post objects.
+        
+        Args:
+            user (Frostbyte): The user who created the feedback, or None.
+            post (Post): The post to which the feedback belongs, or None.
+        
+        Returns:
+            dict: A dictionary containing the feedback data, including user name and post title.
+        """
         data = {
             "id": self.id,
             "content": self._content,
             "user_name": user.name if user else None,
-            "post_title": post.title if post else None,
+            "post_title": post._title if post else None,
         }
         return data
     
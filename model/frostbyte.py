@@ -2,12 +2,17 @@
 from flask import current_app
 from flask_login import UserMixin
 from datetime import date
+from sqlalchemy import event, inspect
 from sqlalchemy.exc import IntegrityError
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
 import os
 import json
+import time
 
 from __init__ import app, db
+from model.cache import TTLCache
+from model.bulk import BulkInsertError, bulk_insert
+from model.hashing import hash_password, hash_passwords, check_password
 
 """ Helper Functions """
 
@@ -62,7 +67,7 @@ class Frostbyte(db.Model, UserMixin):
    
     posts = db.relationship('Post', backref='frostbyte', lazy=True)                                 
     
-    def __init__(self, name, uid, password="", role="User", pfp='', car='', email='?'):
+    def __init__(self, name, uid, password="", role="User", pfp='', car='', email='?', password_hash=None):
         """
         Constructor, 1st step in object creation.
         
@@ -72,11 +77,16 @@ class Frostbyte(db.Model, UserMixin):
             password (str): The password for the user.
             role (str): The role of the user within the application. Defaults to "User".
             pfp (str): The path to the user's profile picture. Defaults to an empty string.
+            password_hash (str, optional): An already hashed password, used instead of hashing password,
+                so callers creating many users can hash all the passwords in parallel with hash_passwords.
         """
         self._name = name
         self._uid = uid
         self._email = email
-        self.set_password(password)
+        if password_hash:
+            self._password = password_hash
+        else:
+            self.set_password(password)
         self._role = role
         self._pfp = pfp
         self._car = car
@@ -222,9 +232,7 @@ class Frostbyte(db.Model, UserMixin):
         Args:
             password (str): The new password for the user.
         """
-        if not password or password == "":
-            password=app.config["DEFAULT_PASSWORD"]
-        self._password = generate_password_hash(password, "pbkdf2:sha256", salt_length=10)
+        self._password = hash_password(password)
 
     def is_password(self, password):
         """
@@ -236,7 +244,7 @@ class Frostbyte(db.Model, UserMixin):
         Returns:
             bool: True if the password matches, False otherwise.
         """
-        return check_password_hash(self._password, password)
+        return check_password(self._password, password)
 
     def __str__(self):
         """
@@ -469,9 +477,91 @@ class Frostbyte(db.Model, UserMixin):
             if os.path.exists(old_path):
                 os.rename(old_path, new_path)
                 
+    @staticmethod
+    def bulk_create(users):
+        """
+        Creates many users at once, with the same rules as creating them one at a time.
+        
+        The whole batch is validated first, including uid duplicates against the table and within the batch,
+        then the passwords of the valid rows are hashed in parallel and the rows are inserted in chunked transactions.
+        
+        Args:
+            users (list): A list of user dictionaries with name, uid and optionally password and pfp.
+        
+        Returns:
+            dict: The results with success_count, error_count and a list of errors, one message per rejected user.
+
+        Raises:
+            BulkInsertError: The database failed partway. Its results also list the unwritten users, with their
+                uids as pending.
+        """
+        results = {'errors': [], 'success_count': 0, 'error_count': 0}
+        
+        def reject(message):
+            results['errors'].append({'message': message})
+            results['error_count'] += 1
+
+        uids = [user.get('uid') for user in users if isinstance(user, dict) and isinstance(user.get('uid'), str)]
+        existing = {uid for (uid,) in db.session.query(Frostbyte._uid).filter(Frostbyte._uid.in_(uids)).all()} if uids else set()
+
+        valid = []
+        for user in users:
+            if not isinstance(user, dict):
+                reject('Expected user data to be an object')
+                continue
+            name = user.get('name')
+            uid = user.get('uid')
+            if not isinstance(name, str) or len(name) < 2:
+                reject('Name is missing, or is less than 2 characters')
+                continue
+            if not isinstance(uid, str) or len(uid) < 2:
+                reject('User ID is missing, or is less than 2 characters')
+                continue
+            if not isinstance(user.get('password'), (str, type(None))):
+                reject(f'Password of {uid} must be a string')
+                continue
+            if not isinstance(user.get('pfp'), (str, type(None))):
+                reject(f'Profile picture of {uid} must be a string')
+                continue
+            if uid in existing:
+                reject(f'Processed {name}, either a format error or User ID {uid} is duplicate')
+                continue
+            existing.add(uid)
+            valid.append(user)
+
+        passwords = hash_passwords([user.get('password') for user in valid])
+        rows = [
+            (user['uid'], {
+                '_name': user['name'],
+                '_uid': user['uid'],
+                '_email': '?',
+                '_password': password,
+                '_role': 'User',
+                '_pfp': user.get('pfp') or '',
+                '_car': '',
+            })
+            for user, password in zip(valid, passwords)
+        ]
+        try:
+            inserted, failures = bulk_insert(Frostbyte, rows)
+        except BulkInsertError as e:
+            results['success_count'] = e.inserted
+            for uid, error in e.failures:
+                reject(f'Processed {uid}, either a format error or User ID {uid} is duplicate')
+            for uid in e.pending:
+                reject(f'User {uid} not written, the database failed: {e}')
+            results['pending'] = e.pending
+            e.results = results
+            raise
+        results['success_count'] = inserted
+        for uid, error in failures:
+            reject(f'Processed {uid}, either a format error or User ID {uid} is duplicate')
+        return results
+
     @staticmethod
     def restore(data):
         users = {}
+        new_users = []
         for user_data in data:
             _ = user_data.pop('id', None)  # Remove 'id' from user_data and store it in user_id
             uid = user_data.get("uid", None)
@@ -479,8 +569,12 @@ class Frostbyte(db.Model, UserMixin):
             if user:
                 user.update(user_data)
             else:
-                user = Frostbyte(**user_data)
-                user.create()
+                new_users.append(user_data)
+        # Hash the passwords of all new users in parallel before creating them
+        password_hashes = hash_passwords([user_data.pop('password', None) for user_data in new_users])
+        for user_data, password_hash in zip(new_users, password_hashes):
+            user = Frostbyte(**user_data, password_hash=password_hash)
+            user.create()
         return users
 
 
@@ -504,21 +598,23 @@ def initFrostbyte():
         db.create_all()
         """Tester data for table"""
         
-        u1 = Frostbyte(name='Thomas Edison', uid=app.config['ADMIN_USER'], password=app.config['ADMIN_PASSWORD'], pfp='toby.png', car='toby_car.png', role="Admin")
-        u2 = Frostbyte(name='Grace Hopper', uid=app.config['DEFAULT_USER'], password=app.config['DEFAULT_PASSWORD'], pfp='hop.png')
-        u3 = Frostbyte(name='Nicholas Tesla', uid='niko', password='123niko', pfp='niko.png' )
-        u4 = Frostbyte(name='Albert Einstein', uid='alby', password='123alby', pfp='alby.png' )
-        u5 = Frostbyte(name='Isaac Newton', uid='newt', password='123newt', pfp='newt.png' )
-        u6 = Frostbyte(name='Marie Curie', uid='cures', password='123cures', pfp='curie.png' )
-        u7 = Frostbyte(name='Risha Guha', uid='risha', password='123Risha!', pfp='risha.png' )
-        u8 = Frostbyte(name='Aranya Bhattacharya', uid='aranya', password='123Aranya!', pfp='aranya.png' )
-        u9 = Frostbyte(name='Abby Manalo', uid='abby', password='123Abby!', pfp='abby.png' )
-        u10 = Frostbyte(name='Elliot Yang', uid='elliot', password='123Elliot!', pfp='elliot.png' )
-        u11 = Frostbyte(name='Shriya Paladugu', uid='shriya', password='123Shriya!', pfp='shriya.png' )
-        u12 = Frostbyte(name='Ava Shalon', uid='ava', password='123Elliot!', pfp='ava.png' )
-
-
-        users = [u1, u2, u3, u4, u5, u6, u7, u8, u9, u10, u11, u12]
+        u1 = dict(name='Thomas Edison', uid=app.config['ADMIN_USER'], password=app.config['ADMIN_PASSWORD'], pfp='toby.png', car='toby_car.png', role="Admin")
+        u2 = dict(name='Grace Hopper', uid=app.config['DEFAULT_USER'], password=app.config['DEFAULT_PASSWORD'], pfp='hop.png')
+        u3 = dict(name='Nicholas Tesla', uid='niko', password='123niko', pfp='niko.png' )
+        u4 = dict(name='Albert Einstein', uid='alby', password='123alby', pfp='alby.png' )
+        u5 = dict(name='Isaac Newton', uid='newt', password='123newt', pfp='newt.png' )
+        u6 = dict(name='Marie Curie', uid='cures', password='123cures', pfp='curie.png' )
+        u7 = dict(name='Risha Guha', uid='risha', password='123Risha!', pfp='risha.png' )
+        u8 = dict(name='Aranya Bhattacharya', uid='aranya', password='123Aranya!', pfp='aranya.png' )
+        u9 = dict(name='Abby Manalo', uid='abby', password='123Abby!', pfp='abby.png' )
+        u10 = dict(name='Elliot Yang', uid='elliot', password='123Elliot!', pfp='elliot.png' )
+        u11 = dict(name='Shriya Paladugu', uid='shriya', password='123Shriya!', pfp='shriya.png' )
+        u12 = dict(name='Ava Shalon', uid='ava', password='123Elliot!', pfp='ava.png' )
+
+        user_data = [u1, u2, u3, u4, u5, u6, u7, u8, u9, u10, u11, u12]
+        # Hash all the tester passwords in parallel, then build the User objects
+        password_hashes = hash_passwords([data.pop('password') for data in user_data])
+        users = [Frostbyte(**data, password_hash=password_hash) for data, password_hash in zip(user_data, password_hashes)]
 
         for user in users:
             try:
@@ -527,6 +623,104 @@ def initFrostbyte():
                 '''fails with bad or duplicate data'''
                 db.session.remove()
 
+""" Authenticated User Cache """
+
+# Column values of recently authenticated users, keyed by uid, with the stamp time they were loaded at. Every
+# server worker keeps its own copy, so every committed change to a user moves the modification time of
+# USER_CACHE_STAMP forward, and entries loaded before it are dropped by every worker on their next use. The stamp
+# is a local file, so servers on other hosts, and changes made outside the app, are picked up after USER_CACHE_TTL.
+user_cache = TTLCache(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
+
+def _stamp_time():
+    """Returns the modification time of the user cache stamp in nanoseconds, 0 before the first user change."""
+    try:
+        return os.stat(app.config['USER_CACHE_STAMP']).st_mtime_ns
+    except OSError:
+        return 0
+
+def _touch_stamp():
+    """
+    Moves the modification time of the user cache stamp forward, by at least a nanosecond, so a change within the
+    same clock tick as the previous one is still seen.
+    """
+    path = app.config['USER_CACHE_STAMP']
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        stamp = max(time.time_ns(), _stamp_time() + 1)
+        with open(path, 'a'):
+            pass
+        os.utime(path, ns=(stamp, stamp))
+    except OSError as e:
+        print(f"Error updating the user cache stamp: {e}")
+
+def invalidate_user(uid):
+    """
+    Drops the cached copy of a user in this process, called whenever the user row changes or is deleted.
+    Other processes drop theirs once the change is committed and the stamp is moved forward.
+
+    Args:
+        uid (str): The unique identifier of the user.
+    """
+    user_cache.pop(uid)
+
+def find_cached_by_uid(uid):
+    """
+    Finds a user by uid, answering from the authenticated user cache when possible.
+
+    A cached user is only used if it was loaded after the last committed change to any user, which costs a stat
+    of the stamp file instead of a database query, so a role change or delete made by any server worker takes
+    effect on the next request. A cache hit rebuilds the user from the stored column values and merges it into
+    the current session without loading the row, so the returned object can be updated and committed like a queried one.
+
+    Args:
+        uid (str): The unique identifier of the user.
+
+    Returns:
+        Frostbyte: The user object, or None if no user has this uid.
+    """
+    stamp = _stamp_time()
+    entry = user_cache.get(uid)
+    if entry is not None and entry[0] < stamp:
+        user_cache.pop(uid)
+        entry = None
+    if entry is None:
+        user = Frostbyte.query.filter_by(_uid=uid).first()
+        if user is not None:
+            # The stamp read before the query, so a change committed while loading drops this entry
+            user_cache.set(uid, (stamp, {attr.key: getattr(user, attr.key) for attr in inspect(Frostbyte).column_attrs}))
+        return user
+    user = Frostbyte.__mapper__.class_manager.new_instance()
+    for key, value in entry[1].items():
+        setattr(user, key, value)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+@event.listens_for(Frostbyte, 'after_update')
+@event.listens_for(Frostbyte, 'after_delete')
+def _invalidate_cached_user(mapper, connection, target):
+    """
+    Invalidates the cache of this process for every flushed change to a user, and for delete, and marks the
+    session so the stamp is moved forward when the change is committed. A uid change invalidates both the old
+    and the new uid.
+    """
+    uid_history = inspect(target).attrs._uid.history
+    for uid in set(uid_history.deleted or ()) | {target._uid}:
+        invalidate_user(uid)
+    session = object_session(target)
+    if session is not None:
+        session.info['users_changed'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _stamp_committed_user_changes(session):
+    """Moves the user cache stamp forward after a commit that changed a user."""
+    if session.info.pop('users_changed', False):
+        _touch_stamp()
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back_user_changes(session):
+    """Forgets the user changes of a rolled back transaction, they never reached the database."""
+    session.info.pop('users_changed', None)
+
 def find_by_uid(uid):
     with app.app_context():
         user = Frostbyte.query.filter_by(_uid=uid).first()
@@ -1,8 +1,14 @@
+import hashlib
+import re
+import threading
+import unicodedata
 from sqlalchemy.exc import IntegrityError
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from datetime import datetime, timedelta
 from flask import Flask, request, jsonify
 from __init__ import db, app  # Ensure these imports are correct
+from model.cache import TTLCache
+from model.retry import retry_on_lock
 
 # Helper Functions
 def current_timestamp():
@@ -31,8 +37,9 @@ class AIMessage(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)  # Timestamp of the message creation
     author = db.Column(db.String(50), nullable=False, default="AI")  # Author of the message
     category = db.Column(db.String(50), nullable=False, default="response")  # Category of the message
+    _user_id = db.Column(db.Integer, db.ForeignKey('frostbytes.id', ondelete='SET NULL'), nullable=True, index=True)  # User of the conversation
 
-    def __init__(self, message, author="AI", category="response"):
+    def __init__(self, message, author="AI", category="response", user_id=None):
         """
         Initialize the AIMessage object with provided message, author, and category.
 
@@ -40,10 +47,12 @@ class AIMessage(db.Model):
             message (str): The content of the message.
             author (str): The author of the message (default is "AI").
             category (str): The category of the message (default is "response").
+            user_id (int): The ID of the user whose conversation the message belongs to (default is None).
         """
         self.message = message
         self.author = author
         self.category = category
+        self._user_id = user_id
 
     def get_id(self):
         """
@@ -54,11 +63,24 @@ class AIMessage(db.Model):
         """
         return str(self.id)
 
+    @retry_on_lock
     def create(self):
         """Save the AI message to the database."""
         db.session.add(self)
         db.session.commit()
 
+    @staticmethod
+    @retry_on_lock
+    def create_all(messages):
+        """
+        Saves several AI messages to the database in one commit, eg a user's message and the reply to it.
+
+        Args:
+            messages (list): The AIMessage objects.
+        """
+        db.session.add_all(messages)
+        db.session.commit()
+
     def read(self):
         """
         Convert the AI message object to a dictionary for JSON serialization.
@@ -72,6 +94,7 @@ class AIMessage(db.Model):
             "timestamp": self.timestamp.isoformat(),
             "author": self.author,
             "category": self.category,
+            "user_id": self._user_id,
         }
 
     def update(self, updates):
@@ -105,6 +128,321 @@ class AIMessage(db.Model):
         db.session.commit()
 
 
+class CachedResponse(db.Model):
+    """
+    CachedResponse Model
+    This class represents the CachedResponse model, which stores chatbot responses in the 'ai_cached_responses' table,
+    keyed by the normalized prompt that produced them, so repeated prompts are answered without calling the model.
+    """
+
+    __tablename__ = 'ai_cached_responses'
+
+    id = db.Column(db.Integer, primary_key=True)
+    prompt_key = db.Column(db.String(64), unique=True, nullable=False)  # sha256 of the normalized prompt
+    prompt = db.Column(db.Text, nullable=False)  # Normalized prompt, used for near-duplicate matching
+    response = db.Column(db.Text, nullable=False)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_used = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __init__(self, prompt_key, prompt, response):
+        """
+        Initialize the CachedResponse object.
+
+        Args:
+            prompt_key (str): The sha256 hex digest of the normalized prompt.
+            prompt (str): The normalized prompt.
+            response (str): The model response for the prompt.
+        """
+        self.prompt_key = prompt_key
+        self.prompt = prompt
+        self.response = response
+
+    def read(self):
+        """
+        Convert the cached response to a dictionary for JSON serialization.
+
+        Returns:
+            dict: A dictionary with the prompt, response, hit count and timestamps.
+        """
+        return {
+            "id": self.id,
+            "prompt": self.prompt,
+            "response": self.response,
+            "hits": self.hits,
+            "created_at": self.created_at.isoformat(),
+            "last_used": self.last_used.isoformat(),
+        }
+
+
+class ResponseCache:
+    """
+    Response cache in front of the chatbot model.
+
+    Prompts are normalized (case, accents, punctuation and whitespace) and looked up first in an in-process
+    LRU/TTL cache, then in the ai_cached_responses table which is shared by every server worker. When
+    CHATBOT_CACHE_SIMILARITY is above 0, a prompt with no exact match is also compared against the cached prompts
+    by the Jaccard similarity of their character shingles, so "best tent brands?" can reuse "best tent brand".
+
+    The table keeps at most CHATBOT_CACHE_SIZE rows, evicting the least recently used first, and rows older than
+    CHATBOT_CACHE_TTL seconds are regenerated. last_used is only written on a table hit, so the LRU order of the
+    table is approximate while a response is served from the in-process cache.
+
+    The key is the prompt alone, so a response is only shared when it does not depend on earlier messages: the
+    prompt starts a conversation, or it is standalone (see standalone). Lookups are counted per path, eg chat or
+    stream, so the hit ratio of each endpoint can be compared.
+    """
+    SHINGLE_SIZE = 3
+    # Words that refer back to earlier messages, eg "is it waterproof", "what about the desert", "tell me more"
+    CONTEXT_WORDS = frozenset((
+        "it", "its", "this", "that", "these", "those", "they", "them", "their", "theirs", "he", "him", "his",
+        "she", "her", "hers", "one", "ones", "same", "else", "other", "another", "more", "again", "instead",
+        "also", "too", "above", "previous", "earlier", "last", "said", "mentioned", "suggested", "recommended"
+    ))
+    # Words that continue the previous message when a prompt starts with them, eg "and in winter"
+    CONTINUATION_WORDS = frozenset(("and", "but", "or", "so", "then", "what about", "how about", "why", "why not"))
+    MIN_STANDALONE_WORDS = 3
+
+    def __init__(self, maxsize, ttl, similarity):
+        """
+        Args:
+            maxsize (int): The largest number of responses kept, 0 disables the cache.
+            ttl (int): The number of seconds a response stays valid.
+            similarity (float): The smallest shingle similarity for a near-duplicate match, 0 disables it.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.similarity = similarity
+        self.memory = TTLCache(maxsize, ttl)  # prompt key -> response
+        self.shingles = {}  # prompt key -> shingle set of the prompt, for near-duplicate matching
+        self.shingles_loaded = False
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.paths = {}  # path -> counters of its lookups and of its prompts that could not be cached
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def normalize(prompt):
+        """Returns the prompt in lower case without accents or punctuation and with single spaces."""
+        prompt = unicodedata.normalize("NFKD", prompt)
+        prompt = "".join(c for c in prompt if not unicodedata.combining(c)).lower()
+        return " ".join(re.sub(r"[^\w\s]", " ", prompt).split())
+
+    @classmethod
+    def standalone(cls, prompt):
+        """
+        Returns whether a prompt can be answered without the earlier messages of its conversation.
+
+        Short prompts, prompts that start like a continuation and prompts with a word referring back to an earlier
+        message are taken to depend on it. The check errs on that side, since a wrong match only costs a model call.
+
+        Args:
+            prompt (str): The prompt as sent by the user.
+
+        Returns:
+            bool: True when the response can be shared with every other user sending the same prompt.
+        """
+        words = cls.normalize(prompt).split()
+        if len(words) < cls.MIN_STANDALONE_WORDS:
+            return False
+        if words[0] in cls.CONTINUATION_WORDS or " ".join(words[:2]) in cls.CONTINUATION_WORDS:
+            return False
+        return cls.CONTEXT_WORDS.isdisjoint(words)
+
+    @staticmethod
+    def key(normalized):
+        """Returns the key of a normalized prompt."""
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def shingle(cls, normalized):
+        """Returns the set of character shingles of a normalized prompt."""
+        text = f" {normalized} "
+        return frozenset(text[i:i + cls.SHINGLE_SIZE] for i in range(max(1, len(text) - cls.SHINGLE_SIZE + 1)))
+
+    def _count(self, counter, path):
+        with self.lock:
+            if counter != "uncacheable":
+                setattr(self, counter, getattr(self, counter) + 1)
+            counters = self.paths.setdefault(path, dict.fromkeys(("hits", "near_hits", "misses", "uncacheable"), 0))
+            counters[counter] += 1
+
+    def uncacheable(self, path):
+        """Counts a prompt of a path that depended on its conversation and was not looked up."""
+        if self.maxsize > 0:
+            self._count("uncacheable", path)
+
+    def _expiry(self):
+        return datetime.utcnow() - timedelta(seconds=self.ttl)
+
+    def _load_shingles(self):
+        """Builds the near-duplicate index from the table the first time it is needed in this process."""
+        if self.shingles_loaded:
+            return
+        rows = db.session.query(CachedResponse.prompt_key, CachedResponse.prompt) \
+            .filter(CachedResponse.created_at > self._expiry()).all()
+        with self.lock:
+            for prompt_key, prompt in rows:
+                self.shingles.setdefault(prompt_key, self.shingle(prompt))
+            self.shingles_loaded = True
+
+    def _nearest(self, normalized):
+        """Returns the key of the most similar cached prompt at or above the similarity threshold, or None."""
+        self._load_shingles()
+        wanted = self.shingle(normalized)
+        best_key, best_score = None, self.similarity
+        with self.lock:
+            candidates = list(self.shingles.items())
+        for prompt_key, shingles in candidates:
+            # Jaccard similarity can not reach the threshold when the sizes differ too much
+            if min(len(wanted), len(shingles)) < best_score * max(len(wanted), len(shingles)):
+                continue
+            score = len(wanted & shingles) / len(wanted | shingles)
+            if score >= best_score:
+                best_key, best_score = prompt_key, score
+        return best_key
+
+    def _read_row(self, prompt_key):
+        """Returns the response stored for a key and marks it as used, or None when it is missing or expired."""
+        row = CachedResponse.query.filter_by(prompt_key=prompt_key).first()
+        if row is None or row.created_at <= self._expiry():
+            return None
+        row.hits += 1
+        row.last_used = datetime.utcnow()
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+        self.memory.set(prompt_key, row.response)
+        return row.response
+
+    def get(self, prompt, path="chat"):
+        """
+        Returns the cached response for a prompt, or None on a miss.
+
+        Args:
+            prompt (str): The prompt as sent by the user.
+            path (str): The path the prompt came from, for the per path counters. Defaults to chat.
+
+        Returns:
+            str: The cached response, or None.
+        """
+        if self.maxsize <= 0:
+            return None
+        normalized = self.normalize(prompt)
+        prompt_key = self.key(normalized)
+        response = self.memory.get(prompt_key)
+        if response is None:
+            response = self._read_row(prompt_key)
+        if response is not None:
+            self._count("hits", path)
+            return response
+
+        if self.similarity > 0:
+            near_key = self._nearest(normalized)
+            if near_key is not None:
+                response = self.memory.get(near_key) or self._read_row(near_key)
+                if response is not None:
+                    self._count("near_hits", path)
+                    return response
+                with self.lock:
+                    self.shingles.pop(near_key, None)  # expired or evicted by another worker
+        self._count("misses", path)
+        return None
+
+    def set(self, prompt, response):
+        """
+        Stores the response for a prompt and evicts the least recently used rows beyond the cache size.
+
+        Args:
+            prompt (str): The prompt as sent by the user.
+            response (str): The model response.
+        """
+        if self.maxsize <= 0:
+            return
+        normalized = self.normalize(prompt)
+        prompt_key = self.key(normalized)
+        row = CachedResponse.query.filter_by(prompt_key=prompt_key).first()
+        if row is None:
+            db.session.add(CachedResponse(prompt_key, normalized, response))
+        else:
+            row.response = response
+            row.created_at = row.last_used = datetime.utcnow()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()  # stored at the same time by another worker
+            return
+        self.memory.set(prompt_key, response)
+        with self.lock:
+            self.shingles[prompt_key] = self.shingle(normalized)
+        self._evict()
+
+    def _evict(self):
+        """Deletes expired rows and the least recently used rows beyond the cache size."""
+        expired = CachedResponse.query.filter(CachedResponse.created_at <= self._expiry())
+        stale = [prompt_key for (prompt_key,) in expired.with_entities(CachedResponse.prompt_key)]
+        cutoff = CachedResponse.query.order_by(CachedResponse.last_used.desc()).offset(self.maxsize) \
+            .with_entities(CachedResponse.prompt_key).all()
+        stale += [prompt_key for (prompt_key,) in cutoff]
+        if not stale:
+            return
+        CachedResponse.query.filter(CachedResponse.prompt_key.in_(stale)).delete(synchronize_session=False)
+        db.session.commit()
+        with self.lock:
+            for prompt_key in stale:
+                self.shingles.pop(prompt_key, None)
+        for prompt_key in stale:
+            self.memory.pop(prompt_key)
+
+    def clear(self):
+        """Deletes every cached response and resets the counters."""
+        CachedResponse.query.delete()
+        db.session.commit()
+        self.memory.clear()
+        with self.lock:
+            self.shingles.clear()
+            self.hits = self.near_hits = self.misses = 0
+            self.paths = {}
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: The stored and in-process sizes, settings, hits, near-duplicate hits, misses and hit_ratio, and
+                the same counters per path with the prompts that were not cacheable.
+        """
+        with self.lock:
+            hits, near_hits, misses = self.hits, self.near_hits, self.misses
+            paths = {path: dict(counters) for path, counters in self.paths.items()}
+        lookups = hits + near_hits + misses
+        for counters in paths.values():
+            path_hits = counters["hits"] + counters["near_hits"]
+            path_lookups = path_hits + counters["misses"]
+            counters["hit_ratio"] = round(path_hits / path_lookups, 4) if path_lookups else 0.0
+        return {
+            "size": CachedResponse.query.count(),
+            "memory_size": len(self.memory),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "similarity": self.similarity,
+            "hits": hits,
+            "near_hits": near_hits,
+            "misses": misses,
+            "hit_ratio": round((hits + near_hits) / lookups, 4) if lookups else 0.0,
+            "paths": paths
+        }
+
+
+response_cache = ResponseCache(
+    app.config['CHATBOT_CACHE_SIZE'],
+    app.config['CHATBOT_CACHE_TTL'],
+    app.config['CHATBOT_CACHE_SIMILARITY']
+)
+
+
 # Database Initialization
 def initAIMessage():
     """
@@ -0,0 +1,94 @@
+# geo.py
+import math
+import numpy as np
+
+"""
+Grid index for points on the globe
+
+The globe is cut into cells of GRID_DEGREES latitude by GRID_DEGREES longitude, numbered row by row from the
+south pole and the antimeridian. A model stores the cell of each point in an indexed integer column, so the points
+near a location are found by reading the few cells around it with one range condition per cell row, and the exact
+distances of those candidates are then computed together with NumPy.
+"""
+
+EARTH_RADIUS_KM = 6371.0088
+# Size of a grid cell, about 55 km north to south
+GRID_DEGREES = 0.5
+GRID_ROWS = int(180 / GRID_DEGREES)
+GRID_COLUMNS = int(360 / GRID_DEGREES)
+# Largest distance between two points on the globe
+MAX_DISTANCE_KM = math.pi * EARTH_RADIUS_KM
+
+def grid_cell(latitude, longitude):
+    """
+    Returns the grid cell of a point.
+
+    Args:
+        latitude (float): The latitude in degrees, -90 to 90.
+        longitude (float): The longitude in degrees, -180 to 180.
+
+    Returns:
+        int: The cell number.
+    """
+    row = min(int((latitude + 90) // GRID_DEGREES), GRID_ROWS - 1)
+    column = int(((longitude + 180) % 360) // GRID_DEGREES)
+    return row * GRID_COLUMNS + column
+
+def cell_ranges(latitude, longitude, radius_km):
+    """
+    Returns the cells that cover every point within a distance of a location, as ranges of cell numbers.
+
+    Each cell row in reach contributes one range, or two when the covered longitudes cross the antimeridian,
+    and a whole row when the radius reaches around a pole.
+
+    Args:
+        latitude (float): The latitude of the location in degrees.
+        longitude (float): The longitude of the location in degrees.
+        radius_km (float): The distance in km.
+
+    Returns:
+        list: (first cell, last cell) tuples, both included.
+    """
+    degrees = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = max(latitude - degrees, -90.0), min(latitude + degrees, 90.0)
+    first_row = min(int((south + 90) // GRID_DEGREES), GRID_ROWS - 1)
+    last_row = min(int((north + 90) // GRID_DEGREES), GRID_ROWS - 1)
+
+    # Longitude span at the latitude nearest to a pole, where the same distance covers the most degrees
+    widest = max(abs(south), abs(north))
+    cos_lat = math.cos(math.radians(widest))
+    if north >= 90 or south <= -90 or cos_lat <= 0 or degrees / cos_lat >= 180:
+        columns = [(0, GRID_COLUMNS - 1)]
+    else:
+        span = degrees / cos_lat
+        first_column = int(((longitude - span + 180) % 360) // GRID_DEGREES)
+        last_column = int(((longitude + span + 180) % 360) // GRID_DEGREES)
+        if first_column <= last_column:
+            columns = [(first_column, last_column)]
+        else:
+            columns = [(first_column, GRID_COLUMNS - 1), (0, last_column)]
+
+    return [
+        (row * GRID_COLUMNS + first, row * GRID_COLUMNS + last)
+        for row in range(first_row, last_row + 1)
+        for first, last in columns
+    ]
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """
+    Returns the great circle distances from one location to many points.
+
+    Args:
+        latitude (float): The latitude of the location in degrees.
+        longitude (float): The longitude of the location in degrees.
+        latitudes (array-like): The latitudes of the points in degrees.
+        longitudes (array-like): The longitudes of the points in degrees.
+
+    Returns:
+        numpy.ndarray: The distances in km, in the order of the points.
+    """
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    lat2 = np.radians(np.asarray(latitudes, dtype=float))
+    lon2 = np.radians(np.asarray(longitudes, dtype=float))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
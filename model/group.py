@@ -26,7 +26,7 @@ class Group(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     _name = db.Column(db.String(255), unique=True, nullable=False)
-    _section_id = db.Column(db.Integer, db.ForeignKey('sections.id'), nullable=False)
+    _section_id = db.Column(db.Integer, db.ForeignKey('sections.id'), nullable=False, index=True)
 
     channels = db.relationship('Channel', backref='group', lazy=True)
     moderators = db.relationship('Frostbyte', secondary=group_moderators, lazy='subquery',
@@ -0,0 +1,124 @@
+# hashing.py
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+from __init__ import app
+
+"""
+Password hashing service
+
+pbkdf2 hashing is deliberately slow, so it is run in a pool of worker processes instead of on the
+request thread. Concurrent logins and bulk user creation then use every CPU instead of queueing
+behind one another in a single worker. The pool is created on first use in each process, so a
+forked server worker never shares its parent's pool. Its default size divides the CPUs between the
+gunicorn workers, so all the pools together have one hashing process per CPU.
+
+The hashing processes are started with spawn rather than fork. The pool is created from a request
+thread of a gthread worker, and forking a process that has other threads running copies locks they
+may be holding, eg of the logging module or the database pool, into a child that would wait on them forever.
+"""
+
+# Start method of the hashing processes, a fresh interpreter that does not inherit the server's threads
+_context = multiprocessing.get_context('spawn')
+
+# Hash method for new passwords, existing hashes keep the iteration count they were stored with
+PASSWORD_HASH_METHOD = f"pbkdf2:sha256:{app.config['PASSWORD_HASH_ITERATIONS']}"
+PASSWORD_SALT_LENGTH = 10
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    """
+    Returns the process pool of the current process, or None when PASSWORD_HASH_WORKERS is 0.
+    """
+    global _pool, _pool_pid
+    workers = app.config['PASSWORD_HASH_WORKERS']
+    if workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=_context)
+            _pool_pid = os.getpid()
+        return _pool
+
+def _reset_pool():
+    """
+    Drops a broken pool so the next call starts a new one.
+    """
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+def _run(func, *args):
+    """
+    Runs func in the hashing pool and waits for the result, falling back to the current thread
+    when the pool is disabled or a worker process has died.
+    """
+    pool = _get_pool()
+    if pool is not None:
+        try:
+            return pool.submit(func, *args).result()
+        except BrokenProcessPool:
+            _reset_pool()
+    return func(*args)
+
+def _default(password):
+    """
+    Returns the default password from the app config when password is empty.
+    """
+    if not password or password == "":
+        return app.config["DEFAULT_PASSWORD"]
+    return password
+
+def hash_password(password):
+    """
+    Hashes a password for storage, using the default password when none is given.
+
+    Args:
+        password (str): The plain text password.
+
+    Returns:
+        str: The salted pbkdf2:sha256 hash of the password.
+    """
+    return _run(generate_password_hash, _default(password), PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH)
+
+def hash_passwords(passwords):
+    """
+    Hashes a list of passwords across the hashing pool, keeping their order.
+
+    Args:
+        passwords (list): The plain text passwords, empty ones are replaced by the default password.
+
+    Returns:
+        list: The hashes, in the same order as the passwords.
+    """
+    passwords = [_default(password) for password in passwords]
+    count = len(passwords)
+    pool = _get_pool()
+    if pool is not None and count > 1:
+        try:
+            chunksize = max(1, count // (app.config['PASSWORD_HASH_WORKERS'] * 4))
+            return list(pool.map(generate_password_hash, passwords,
+                                 [PASSWORD_HASH_METHOD] * count, [PASSWORD_SALT_LENGTH] * count,
+                                 chunksize=chunksize))
+        except BrokenProcessPool:
+            _reset_pool()
+    return [generate_password_hash(password, PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH) for password in passwords]
+
+def check_password(pwhash, password):
+    """
+    Checks a plain text password against a stored hash.
+
+    Args:
+        pwhash (str): The stored hash.
+        password (str): The plain text password to check.
+
+    Returns:
+        bool: True if the password matches, False otherwise.
+    """
+    return _run(check_password_hash, pwhash, password)
@@ -0,0 +1,187 @@
+# images.py
+import base64
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from PIL import Image, ImageOps, UnidentifiedImageError
+from __init__ import app
+
+"""
+Image upload pipeline
+
+An uploaded image is decoded once with Pillow, which checks that the bytes really are an image of an allowed
+type whatever the client called them. It is then re-encoded into size variants, JPEG for opaque images and PNG
+for images with transparency, with the variants resized in parallel in a thread pool since Pillow releases the
+GIL while resampling. The files are named after the kind of image and the SHA-256 of the uploaded bytes, so
+uploading the same image again reuses the stored files, a new picture never overwrites the one a client may
+still have cached, and a profile and car picture never share a file that deleting one would remove.
+
+The stored filename, kept in the user or post record, is the full variant, eg pfp_3f2a...e1.jpg, and the other
+variants sit beside it as pfp_3f2a...e1_thumb.jpg and pfp_3f2a...e1_medium.jpg.
+"""
+
+# Longest edge in pixels of each variant, images smaller than a variant are not enlarged
+IMAGE_VARIANTS = {'thumb': 96, 'medium': 320, 'full': 1280}
+DEFAULT_VARIANT = 'full'
+# Image types accepted, as named by Pillow
+IMAGE_FORMATS = {'PNG', 'JPEG', 'GIF', 'WEBP'}
+JPEG_QUALITY = 85
+# Pillow only warns from its default of about 89M pixels and refuses twice that, far more memory than a request should
+# take. The limit is checked on the header before any pixel is decoded, and Pillow's own check is set to match.
+Image.MAX_IMAGE_PIXELS = app.config['IMAGE_MAX_PIXELS']
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    """
+    Returns the resizing thread pool of the current process, or None when IMAGE_WORKERS is 0.
+    """
+    global _pool, _pool_pid
+    workers = app.config['IMAGE_WORKERS']
+    if workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image')
+            _pool_pid = os.getpid()
+        return _pool
+
+def decode_base64(base64_image):
+    """
+    Decodes a base64 encoded upload, with or without a data: URL prefix.
+
+    Args:
+        base64_image (str): The base64 encoded file.
+
+    Returns:
+        bytes: The file.
+
+    Raises:
+        ValueError: If the data is not valid base64.
+    """
+    if isinstance(base64_image, str) and base64_image.startswith('data:'):
+        base64_image = base64_image.partition(',')[2]
+    try:
+        return base64.b64decode(base64_image, validate=True)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid base64 image data')
+
+def decode_image(image_data):
+    """
+    Decodes uploaded bytes into an image, checking its real type.
+
+    Args:
+        image_data (bytes): The uploaded file.
+
+    Returns:
+        Image: The decoded image, turned upright from its EXIF orientation and converted to RGB, or RGBA when
+            it has transparency.
+
+    Raises:
+        ValueError: If the bytes are not an image of an allowed type, or are too large to decode safely.
+    """
+    try:
+        with Image.open(BytesIO(image_data)) as image:
+            if image.format not in IMAGE_FORMATS:
+                raise ValueError(f'Unsupported image type {image.format}, expected one of {", ".join(sorted(IMAGE_FORMATS))}')
+            # Pillow only warns between its limit and twice it, so the size from the header is checked before load
+            width, height = image.size
+            if width * height > app.config['IMAGE_MAX_PIXELS']:
+                raise ValueError(f'Image too large: {width}x{height} pixels, at most {app.config["IMAGE_MAX_PIXELS"]} allowed')
+            image.load()
+            image = ImageOps.exif_transpose(image)
+    except UnidentifiedImageError:
+        raise ValueError(f'Invalid image, expected one of {", ".join(sorted(IMAGE_FORMATS))}')
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f'Invalid image: {str(e)}')
+
+    transparent = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+    return image.convert('RGBA' if transparent else 'RGB')
+
+def _encode(image, size):
+    """
+    Resizes an image to fit a square of size pixels and encodes it, as PNG when it has transparency and JPEG otherwise.
+    """
+    image = image.copy()
+    image.thumbnail((size, size), Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    if image.mode == 'RGBA':
+        image.save(buffer, 'PNG', optimize=True)
+    else:
+        image.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+def variant_filename(filename, variant):
+    """
+    Returns the filename of a size variant of a stored image.
+
+    Args:
+        filename (str): The stored filename, which is the full variant.
+        variant (str): One of IMAGE_VARIANTS.
+
+    Returns:
+        str: The filename of the variant.
+    """
+    if variant == DEFAULT_VARIANT:
+        return filename
+    root, ext = os.path.splitext(filename)
+    return f'{root}_{variant}{ext}'
+
+def store_image(image_data, user_uid, kind):
+    """
+    Validates an uploaded image and stores its size variants in the user's upload directory.
+
+    Files are named after the kind of image and its content, eg pfp_<hash>.jpg, so the same picture used as
+    profile and car picture is stored once per kind and replacing one never deletes the file of the other.
+
+    Args:
+        image_data (bytes): The uploaded file.
+        user_uid (str): The unique identifier for the user.
+        kind (str): What the image is used for, 'pfp', 'car' or 'nest'.
+
+    Returns:
+        str: The filename of the stored image, to be kept in the user or post record.
+
+    Raises:
+        ValueError: If the upload is not a valid image.
+    """
+    name = f'{kind}_{hashlib.sha256(image_data).hexdigest()[:32]}'
+    user_dir = os.path.join(app.config['UPLOAD_FOLDER'], user_uid)
+    for ext in ('.jpg', '.png'):
+        if os.path.exists(os.path.join(user_dir, f'{name}{ext}')):
+            return f'{name}{ext}'
+
+    image = decode_image(image_data)
+    filename = f"{name}{'.png' if image.mode == 'RGBA' else '.jpg'}"
+    pool = _get_pool()
+    if pool is not None:
+        encoded = dict(zip(IMAGE_VARIANTS, pool.map(_encode, [image] * len(IMAGE_VARIANTS), IMAGE_VARIANTS.values())))
+    else:
+        encoded = {variant: _encode(image, size) for variant, size in IMAGE_VARIANTS.items()}
+
+    os.makedirs(user_dir, exist_ok=True)
+    # The full variant is written last, so a stored filename always has its other variants beside it
+    for variant in sorted(encoded, key=lambda variant: variant == DEFAULT_VARIANT):
+        path = os.path.join(user_dir, variant_filename(filename, variant))
+        with open(f'{path}.tmp', 'wb') as img_file:
+            img_file.write(encoded[variant])
+        os.replace(f'{path}.tmp', path)
+    return filename
+
+def delete_image(user_uid, filename):
+    """
+    Deletes a stored image and its size variants from the user's upload directory.
+
+    Args:
+        user_uid (str): The unique identifier for the user.
+        filename (str): The stored filename.
+    """
+    user_dir = os.path.join(app.config['UPLOAD_FOLDER'], user_uid)
+    for variant in IMAGE_VARIANTS:
+        img_path = os.path.join(user_dir, variant_filename(filename, variant))
+        if os.path.exists(img_path):
+            os.remove(img_path)
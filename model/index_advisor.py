@@ -0,0 +1,120 @@
+# index_advisor.py
+from sqlalchemy import text
+from __init__ import db
+
+"""
+Index advisor
+
+Runs the queries the APIs send most often through the database's query planner, EXPLAIN QUERY PLAN on SQLite
+and EXPLAIN on MySQL, and reports the ones that read a whole table instead of looking rows up in an index.
+The queries are built from the models with sample values, so the plans match what the ORM sends.
+"""
+
+def hot_queries():
+    """
+    Returns the queries the APIs send most often.
+
+    Returns:
+        list: (description, Select) tuples.
+    """
+    from model.analytics import Analytics
+    from model.camping_post import camping
+    from model.channel import Channel
+    from model.checklist import ChecklistItem
+    from model.frostbyte import Frostbyte
+    from model.gemini import AIMessage, CachedResponse
+    from model.group import Group
+    from model.locationmodel import Location
+    from model.post import Post
+    from model.quiz_result import QuizResult
+    from model.rating import Rating
+    from model.rating_stats import ChannelRatingStats
+    from model.vote import Vote
+    from model.weather import Weather
+
+    return [
+        ('user by uid', Frostbyte.query.filter_by(_uid='admin')),
+        ('group by name', Group.query.filter_by(_name='National Parks')),
+        ('groups of a section', Group.query.filter_by(_section_id=1)),
+        ('channel by name', Channel.query.filter_by(_name='Denali')),
+        ('channels of a group', Channel.query.filter_by(_group_id=1)),
+        ('posts of a channel', Post.query.filter_by(_channel_id=1).order_by(Post.id)),
+        ('posts of a user', Post.query.filter_by(_user_id=1)),
+        ('votes of a post', Vote.query.filter_by(_post_id=1)),
+        ('votes of a user', Vote.query.filter_by(_user_id=1)),
+        ('rating of a user for a channel', Rating.query.filter_by(user_id=1, channel_id=1)),
+        ('ratings of a channel', Rating.query.filter_by(channel_id=1)),
+        ('analytics of a channel', Analytics.query.filter_by(channel_id=1)),
+        ('rating totals of a channel', ChannelRatingStats.query.filter_by(source='ratings', channel_id=1)),
+        ('locations of a user', Location.query.filter_by(user_id=1)),
+        ('locations of a channel', Location.query.filter_by(channel_id=1)),
+        ('locations in a grid cell range', Location.query.filter(Location.grid_cell.between(100, 110))),
+        ('quiz results of a user', QuizResult.query.filter_by(user_id=1)),
+        ('checklist of a user', ChecklistItem.query.filter_by(user_id=1)),
+        ('camping posts of a channel', camping.query.filter_by(_channel_id=1)),
+        ('chat history of a user', AIMessage.query.filter_by(_user_id=1).order_by(AIMessage.id.desc()).limit(50)),
+        ('cached chatbot response', CachedResponse.query.filter_by(prompt_key='0' * 64)),
+        ('latest weather of a park', Weather.query.filter_by(_channel_id=1).order_by(Weather.created_at.desc()).limit(1)),
+    ]
+
+def _is_full_scan(dialect_name, plan):
+    """
+    Checks a query plan for a step that reads a whole table.
+
+    On SQLite that is a SCAN step, on MySQL a row with access type ALL.
+    """
+    if dialect_name == 'sqlite':
+        return any(row['detail'].startswith('SCAN ') for row in plan)
+    return any(row.get('type') == 'ALL' for row in plan)
+
+def explain(query):
+    """
+    Returns the query plan of a query.
+
+    Args:
+        query (Query): The ORM query.
+
+    Returns:
+        tuple: The SQL of the query with its sample values and the plan, as a list of dictionaries of the
+            planner's output columns.
+
+    Raises:
+        NotImplementedError: If the database is neither SQLite nor MySQL.
+    """
+    dialect = db.engine.dialect
+    sql = str(query.statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    if dialect.name == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif dialect.name == 'mysql':
+        prefix = 'EXPLAIN '
+    else:
+        raise NotImplementedError(f"The index advisor does not support {dialect.name}")
+    result = db.session.execute(text(prefix + sql))
+    return sql, [dict(row._mapping) for row in result]
+
+def advise():
+    """
+    Explains every hot query and flags the ones that scan a whole table.
+
+    Returns:
+        list: A dictionary per query with its description, SQL, plan, full_scan flag, or error when the
+            query could not be explained, eg because its table does not exist yet.
+    """
+    dialect_name = db.engine.dialect.name
+    report = []
+    for description, query in hot_queries():
+        try:
+            sql, plan = explain(query)
+        except NotImplementedError:
+            raise
+        except Exception as e:
+            db.session.rollback()
+            report.append({'query': description, 'error': str(getattr(e, 'orig', e))})
+            continue
+        report.append({
+            'query': description,
+            'sql': ' '.join(sql.split()),
+            'plan': plan,
+            'full_scan': _is_full_scan(dialect_name, plan)
+        })
+    return report
@@ -1,16 +1,21 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+import numpy as np
+from sqlalchemy import event, or_
 from sqlalchemy.orm import relationship
 from __init__ import db
+from model.bulk import CHUNK_SIZE, upsert_statement
+from model.geo import MAX_DISTANCE_KM, GRID_DEGREES, EARTH_RADIUS_KM, grid_cell, cell_ranges, haversine_km
 
 class Location(db.Model):
     __tablename__ = 'locations'
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('frostbytes.id'), nullable=False)    
-    channel_id = db.Column(db.Integer, db.ForeignKey('channels.id'), nullable=False)  
+    channel_id = db.Column(db.Integer, db.ForeignKey('channels.id'), nullable=False, index=True)  
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
+    grid_cell = db.Column(db.Integer, nullable=True, index=True)  # cell of the point in the model/geo.py grid, set on every write
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     user = relationship('Frostbyte')
@@ -51,6 +56,162 @@ class Location(db.Model):
         db.session.delete(self)
         db.session.commit()
 
+    @staticmethod
+    def _row(user_id, channel_id, latitude, longitude):
+        """Returns the column values of a location, with its grid cell, for an upsert."""
+        return {
+            'user_id': user_id,
+            'channel_id': channel_id,
+            'latitude': latitude,
+            'longitude': longitude,
+            'grid_cell': grid_cell(latitude, longitude),
+            'timestamp': datetime.utcnow()
+        }
+
+    @staticmethod
+    def upsert(user_id, channel_id, latitude, longitude):
+        """
+        Stores the location of a user in a channel with one INSERT ... ON CONFLICT (SQLite) or
+        ON DUPLICATE KEY UPDATE (MySQL) statement, replacing the user's previous location in that channel.
+
+        Args:
+            user_id (int): The user.
+            channel_id (int): The channel.
+            latitude (float): The latitude in degrees.
+            longitude (float): The longitude in degrees.
+
+        Returns:
+            dict: The stored location, as returned by read.
+        """
+        row = Location._row(user_id, channel_id, latitude, longitude)
+        connection = db.session.connection()
+        statement = upsert_statement(connection.dialect.name, Location.__table__, [row], keys=['user_id', 'channel_id'])
+        if connection.dialect.insert_returning:
+            location_id = db.session.execute(statement.returning(Location.__table__.c.id)).scalar()
+        else:
+            db.session.execute(statement)
+            location_id = db.session.query(Location.id).filter_by(user_id=user_id, channel_id=channel_id).scalar()
+        db.session.commit()
+        return {
+            "id": location_id,
+            "user_id": user_id,
+            "channel_id": channel_id,
+            "latitude": latitude,
+            "longitude": longitude,
+            "timestamp": row['timestamp'].isoformat()
+        }
+
+    @staticmethod
+    def upsert_many(user_id, points, chunk_size=CHUNK_SIZE):
+        """
+        Stores many locations of a user, eg a track recorded offline, with one upsert statement per chunk.
+        When several points are for the same channel, the last one is kept.
+
+        Args:
+            user_id (int): The user.
+            points (list): (channel_id, latitude, longitude) tuples, oldest first.
+            chunk_size (int): The number of locations per statement.
+
+        Returns:
+            int: The number of locations stored, one per channel.
+        """
+        latest = {channel_id: (latitude, longitude) for channel_id, latitude, longitude in points}
+        rows = [Location._row(user_id, channel_id, lat, lon) for channel_id, (lat, lon) in latest.items()]
+        dialect_name = db.session.connection().dialect.name
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            db.session.execute(upsert_statement(dialect_name, Location.__table__, chunk, keys=['user_id', 'channel_id']))
+        db.session.commit()
+        return len(rows)
+
+    @staticmethod
+    def _candidates(latitude, longitude, radius_km, query):
+        """Returns the locations in the grid cells that cover a radius, with their distances as a NumPy array."""
+        ranges = cell_ranges(latitude, longitude, radius_km)
+        query = query.filter(or_(*[Location.grid_cell.between(first, last) for first, last in ranges]))
+        locations = query.all()
+        if not locations:
+            return [], np.empty(0)
+        distances = haversine_km(latitude, longitude,
+                                 [location.latitude for location in locations],
+                                 [location.longitude for location in locations])
+        return locations, distances
+
+    @staticmethod
+    def within(latitude, longitude, radius_km, query=None):
+        """
+        Finds the locations within a distance of a point, nearest first.
+
+        Only the grid cells around the point are read, so the cost grows with the number of locations nearby
+        rather than with the table.
+
+        Args:
+            latitude (float): The latitude of the point in degrees.
+            longitude (float): The longitude of the point in degrees.
+            radius_km (float): The distance in km.
+            query (Query, optional): A Location query with extra filters, eg by channel_id.
+
+        Returns:
+            list: (Location, distance in km) tuples.
+        """
+        locations, distances = Location._candidates(latitude, longitude, radius_km, query or Location.query)
+        order = np.argsort(distances, kind='stable')
+        return [(locations[i], float(distances[i])) for i in order if distances[i] <= radius_km]
+
+    @staticmethod
+    def nearest(latitude, longitude, k, query=None, distinct_channels=False):
+        """
+        Finds the k locations nearest to a point.
+
+        The search starts with the cells next to the point and doubles its radius until k locations are found
+        within it, so a dense neighbourhood is answered from a few cells.
+
+        Args:
+            latitude (float): The latitude of the point in degrees.
+            longitude (float): The longitude of the point in degrees.
+            k (int): The number of locations to return.
+            query (Query, optional): A Location query with extra filters.
+            distinct_channels (bool): If True, only the nearest location of each channel counts. Channels are
+                ranked by the locations stored in them, see weather.nearest_parks to rank parks by their own
+                coordinates.
+
+        Returns:
+            list: Up to k (Location, distance in km) tuples, nearest first.
+        """
+        radius = GRID_DEGREES * EARTH_RADIUS_KM * np.pi / 180
+        while True:
+            found = Location.within(latitude, longitude, radius, query)
+            if distinct_channels:
+                nearest_per_channel = {}
+                for location, distance in found:
+                    nearest_per_channel.setdefault(location.channel_id, (location, distance))
+                found = list(nearest_per_channel.values())  # dicts keep insertion order, so still nearest first
+            if len(found) >= k or radius >= MAX_DISTANCE_KM:
+                return found[:k]
+            radius = min(radius * 2, MAX_DISTANCE_KM)
+
+    @staticmethod
+    def reindex():
+        """
+        Sets the grid cell of every location, for rows written before the cell column existed.
+
+        Returns:
+            int: The number of locations updated.
+        """
+        locations = Location.query.all()
+        for location in locations:
+            location.grid_cell = grid_cell(location.latitude, location.longitude)
+        db.session.commit()
+        return len(locations)
+
+
+@event.listens_for(Location, 'before_insert')
+@event.listens_for(Location, 'before_update')
+def _set_grid_cell(mapper, connection, target):
+    """Keeps the grid cell of a location in step with its coordinates."""
+    if target.latitude is not None and target.longitude is not None:
+        target.grid_cell = grid_cell(float(target.latitude), float(target.longitude))
+
 def initLocations():
     """Initialize the locations with sample data."""
     sample_locations = [
@@ -84,6 +84,19 @@ class NestPost(db.Model):
         """
         user = Frostbyte.query.get(self._user_id)
         group = Group.query.get(self._group_id)
+        return self._read(user, group)
+
+    def _read(self, user, group):
+        """
+        Builds the post dictionary from already resolved user and group objects.
+        
+        Args:
+            user (Frostbyte): The user who created the post, or None.
+            group (Group): The group to which the post belongs, or None.
+        
+        Returns:
+            dict: A dictionary containing the post data, including user and group names.
+        """
         data = {
             "id": self.id,
             "title": self._title,
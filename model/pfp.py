@@ -1,7 +1,7 @@
 import base64
 import os
-from werkzeug.utils import secure_filename
 from __init__ import app
+from model.images import decode_base64, store_image, delete_image
 
 def pfp_base64_decode(user_id, user_pfp):
     """
@@ -30,9 +30,8 @@ def pfp_base64_upload(base64_image, user_uid):
     """
     Uploads a base64 encoded image as a profile picture for a user.
 
-    This function decodes a base64 encoded image and saves it to a secure location on the server.
-    It organizes images by storing each user's image in a separate directory within the UPLOAD_FOLDER.
-    This approach helps to avoid filename conflicts and ensures better organization of files.
+    This function decodes a base64 encoded image, checks it is a real image, and saves its thumb, medium and full
+    size variants in the user's directory within the UPLOAD_FOLDER, named after its kind and content (see model/images.py).
 
     Parameters:
     - base64_image (str): The base64 encoded image to be uploaded.
@@ -40,17 +39,15 @@ def pfp_base64_upload(base64_image, user_uid):
 
     Returns:
     - str: The filename of the saved image if the upload is successful; otherwise, None.
+
+    Raises:
+    - ValueError: If the data is not a valid base64 encoded image.
     """
+    image_data = decode_base64(base64_image)
     try:
-        image_data = base64.b64decode(base64_image)
-        filename = secure_filename(f'{user_uid}.png')
-        user_dir = os.path.join(app.config['UPLOAD_FOLDER'], user_uid)
-        if not os.path.exists(user_dir):
-            os.makedirs(user_dir)
-        file_path = os.path.join(user_dir, filename)
-        with open(file_path, 'wb') as img_file:
-            img_file.write(image_data)
-        return filename 
+        return store_image(image_data, user_uid, 'pfp')
+    except ValueError:
+        raise
     except Exception as e:
         print (f'An error occurred while updating the profile picture: {str(e)}')
         return None
@@ -59,7 +56,7 @@ def pfp_file_delete(user_uid, filename):
     """
     Deletes the profile picture file from the server.
 
-    This function removes a file from the server's filesystem. It is typically used to delete profile pictures
+    This function removes a file and its size variants from the server's filesystem. It is typically used to delete profile pictures
     when a user updates their image or removes it entirely.
 
     Parameters:
@@ -70,9 +67,7 @@ def pfp_file_delete(user_uid, filename):
     - bool: True if the file was deleted successfully; otherwise, False.
     """
     try:
-        img_path = os.path.join(app.config['UPLOAD_FOLDER'], user_uid, filename)
-        if os.path.exists(img_path):
-            os.remove(img_path)
+        delete_image(user_uid, filename)
         # Success is when the file does not exist after calling this function
         return True 
     except Exception as e:
@@ -6,7 +6,8 @@ from sqlalchemy.exc import IntegrityError
 from __init__ import app, db
 from model.frostbyte import Frostbyte
 from model.channel import Channel
-from sqlalchemy.orm import relationship
+from model.bulk import BulkInsertError, bulk_insert, is_id
+from sqlalchemy.orm import relationship, selectinload
 
 class Post(db.Model):
     """
@@ -21,6 +22,8 @@ class Post(db.Model):
         _content (db.Column): A JSON blob representing the content of the post.
         _user_id (db.Column): An integer representing the user who created the post.
         _channel_id (db.Column): An integer representing the channel to which the post belongs.
+        _upvotes (db.Column): The number of upvotes on the post, maintained by the Vote model.
+        _downvotes (db.Column): The number of downvotes on the post, maintained by the Vote model.
     """
     __tablename__ = 'posts'
 
@@ -28,8 +31,10 @@ class Post(db.Model):
     _title = db.Column(db.String(255), nullable=False)
     _comment = db.Column(db.String(255), nullable=False)
     _content = db.Column(JSON, nullable=False)
-    _user_id = db.Column(db.Integer, db.ForeignKey('frostbytes.id', ondelete='SET NULL'), nullable=True)
-    _channel_id = db.Column(db.Integer, db.ForeignKey('channels.id'), nullable=False, default=1)  # Replace 1 with a valid default ID
+    _user_id = db.Column(db.Integer, db.ForeignKey('frostbytes.id', ondelete='SET NULL'), nullable=True, index=True)
+    _channel_id = db.Column(db.Integer, db.ForeignKey('channels.id'), nullable=False, default=1, index=True)  # Replace 1 with a valid default ID
+    _upvotes = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    _downvotes = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     def __init__(self, title, comment, user_id=None, channel_id=None, content={}, user_name=None, channel_name=None):
         """
@@ -86,15 +91,50 @@ class Post(db.Model):
         """
         user = Frostbyte.query.get(self._user_id)
         channel = Channel.query.get(self._channel_id)
+        return self._read(user, channel)
+
+    def _read(self, user, channel):
+        """
+        Builds the post dictionary from already resolved user and channel objects.
+        
+        Args:
+            user (Frostbyte): The user who created the post, or None.
+            channel (Channel): The channel to which the post belongs, or None.
+        
+        Returns:
+            dict: A dictionary containing the post data, including user and channel names.
+        """
         data = {
             "id": self.id,
             "title": self._title,
             "comment": self._comment,
             "content": self._content,
             "user_name": user.name if user else None,
-            "channel_name": channel.name if channel else None
+            "channel_name": channel.name if channel else None,
+            "upvote_count": self._upvotes or 0,
+            "downvote_count": self._downvotes or 0
         }
         return data
+
+    @staticmethod
+    def read_all(query=None):
+        """
+        The read_all method serializes a list of posts with a fixed number of queries.
+        
+        Uses:
+            selectinload on the frostbyte and channel relationships, so the users and channels for every
+            post are fetched with one IN query each instead of one lookup per post.
+        
+        Args:
+            query (Query, optional): A Post query with any filters already applied. Defaults to all posts.
+        
+        Returns:
+            list: A list of dictionaries in the same format as read().
+        """
+        if query is None:
+            query = Post.query
+        posts = query.options(selectinload(Post.frostbyte), selectinload(Post.channel)).all()
+        return [post._read(post.frostbyte, post.channel) for post in posts]
     
 
     '''def update(self):
@@ -193,6 +233,90 @@ class Post(db.Model):
             db.session.rollback()
             raise e
         
+    @staticmethod
+    def bulk_create(posts, user_id, allow_user_id=False):
+        """
+        Creates many posts at once, with the same checks as creating them one at a time.
+        
+        The whole batch is validated first, including one lookup for all referenced channels,
+        then the valid posts are inserted in chunked transactions.
+        
+        Args:
+            posts (list): A list of post dictionaries with title, comment, channel_id and optionally content.
+            user_id (int): The user the posts are created by.
+            allow_user_id (bool): If True, a post dictionary may set its own user_id, used for admin imports.
+        
+        Returns:
+            dict: The results with success_count, error_count and a list of errors, one message per rejected post.
+
+        Raises:
+            BulkInsertError: The database failed partway. Its results also list the unwritten posts, with their
+                indexes as pending.
+        """
+        results = {'errors': [], 'success_count': 0, 'error_count': 0}
+
+        def reject(message):
+            results['errors'].append({'message': message})
+            results['error_count'] += 1
+
+        channel_ids = {post.get('channel_id') for post in posts if isinstance(post, dict) and is_id(post.get('channel_id'))}
+        channels = {id for (id,) in db.session.query(Channel.id).filter(Channel.id.in_(channel_ids)).all()} if channel_ids else set()
+        user_ids = {post.get('user_id') for post in posts if allow_user_id and isinstance(post, dict) and is_id(post.get('user_id'))}
+        users = {id for (id,) in db.session.query(Frostbyte.id).filter(Frostbyte.id.in_(user_ids)).all()} if user_ids else set()
+
+        rows = []
+        for index, post in enumerate(posts):
+            if not isinstance(post, dict) or not post:
+                reject('No input data provided')
+                continue
+            if not isinstance(post.get('title'), str):
+                reject('Post title is required and must be a string')
+                continue
+            if not isinstance(post.get('comment'), str):
+                reject('Post comment is required and must be a string')
+                continue
+            if not isinstance(post.get('content', {}), dict):
+                reject('Post content must be an object')
+                continue
+            if not is_id(post.get('channel_id')):
+                reject('Channel ID is required and must be an integer')
+                continue
+            if post['channel_id'] not in channels:
+                reject(f"Channel {post['channel_id']} not found")
+                continue
+            post_user_id = user_id
+            if allow_user_id and post.get('user_id') is not None:
+                post_user_id = post['user_id']
+                if not is_id(post_user_id):
+                    reject('User ID must be an integer')
+                    continue
+                if post_user_id not in users:
+                    reject(f"User {post_user_id} not found")
+                    continue
+            rows.append((index, {
+                '_title': post['title'],
+                '_comment': post['comment'],
+                '_content': post.get('content', {}),
+                '_user_id': post_user_id,
+                '_channel_id': post['channel_id'],
+            }))
+
+        try:
+            inserted, failures = bulk_insert(Post, rows)
+        except BulkInsertError as e:
+            results['success_count'] = e.inserted
+            for index, error in e.failures:
+                reject(f"Could not create post {index}: {error}")
+            for index in e.pending:
+                reject(f"Post {index} not written, the database failed: {e}")
+            results['pending'] = e.pending
+            e.results = results
+            raise
+        results['success_count'] = inserted
+        for index, error in failures:
+            reject(f"Could not create post {index}: {error}")
+        return results
+
     ''' @staticmethod
     def restore(data):
         for post_data in data:
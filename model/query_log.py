@@ -0,0 +1,223 @@
+# query_log.py
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from __init__ import app, db
+
+"""
+Slow-query log
+
+Every SQL statement the application runs is timed with SQLAlchemy cursor events and reduced to a fingerprint,
+the statement with its literals, placeholders and IN lists replaced by ?, so the same query with different
+values counts as one. The calls, time and rows are added up per fingerprint, Flask endpoint and the project
+function that issued the query, eg model/post.py:Post.read, and the top entries by total time are shown on the
+/analytics/queries admin page.
+
+A query that runs many times in one request, like Frostbyte.query.get in Post.read for each post of a list,
+is an N+1 pattern. Its highest count in a single request is kept, so it shows up after one request.
+
+The numbers are kept per server worker and over a rolling window of one to two QUERY_LOG_WINDOW periods.
+"""
+
+# The directory of the project, queries are attributed to the first function in it up the call stack
+PROJECT_DIR = app.root_path + os.sep
+
+_COMMENTS = re.compile(r'/\*.*?\*/|--[^\n]*', re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDERS = re.compile(r'%\(\w+\)s|%s')
+_VALUES_ROWS = re.compile(r'(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+')
+_IN_LISTS = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.I)
+_SPACES = re.compile(r'\s+')
+
+def fingerprint(statement):
+    """
+    Reduces a SQL statement to the shape of the query.
+
+    Args:
+        statement (str): The SQL sent to the database.
+
+    Returns:
+        str: The statement with comments removed, literals and placeholders replaced by ?, IN lists and
+            multi-row VALUES collapsed, and whitespace collapsed.
+    """
+    sql = _COMMENTS.sub(' ', statement)
+    sql = _STRINGS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    sql = _PLACEHOLDERS.sub('?', sql)
+    sql = _VALUES_ROWS.sub(r'\1, ...', sql)
+    sql = _IN_LISTS.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class QueryLog:
+    """
+    QueryLog
+
+    Rolling per worker statistics of the SQL statements run by the application.
+
+    Attributes:
+        size (int): The most fingerprint, endpoint and origin entries kept per window, 0 disables the log.
+        slow_seconds (float): Statements taking longer are also kept individually in the slow list.
+        window (float): The seconds after which the current window becomes the previous one.
+        n_plus_one (int): Runs of one fingerprint in a single request that flag an N+1 pattern.
+        slow (deque): The most recent slow statements.
+    """
+    def __init__(self, size, slow_ms, window, n_plus_one):
+        self.size = size
+        self.slow_seconds = slow_ms / 1000
+        self.window = window
+        self.n_plus_one = n_plus_one
+        self.current = {}  # (fingerprint, endpoint, origin) -> stats
+        self.previous = {}
+        self.window_start = time.time()
+        self.slow = deque(maxlen=50)
+        self.lock = threading.Lock()
+        self._fingerprints = {}  # statement -> fingerprint
+        self._origins = {}  # code object -> origin label or None
+
+    def origin(self, frame):
+        """
+        Finds the project function that issued a query.
+
+        Args:
+            frame (frame): The frame to start walking up the call stack from.
+
+        Returns:
+            str: The file and qualified name of the innermost project function, eg model/post.py:Post.read,
+                or None when the query came from outside the project.
+        """
+        while frame is not None:
+            code = frame.f_code
+            label = self._origins.get(code, False)
+            if label is False:
+                filename = code.co_filename
+                label = None
+                if filename.startswith(PROJECT_DIR) and filename != __file__ and 'site-packages' not in filename:
+                    label = f"{filename[len(PROJECT_DIR):]}:{getattr(code, 'co_qualname', code.co_name)}"
+                self._origins[code] = label
+            if label:
+                return label
+            frame = frame.f_back
+        return None
+
+    def record(self, statement, seconds, rows, endpoint, origin, request_counts=None):
+        """
+        Adds one executed statement to the log.
+
+        Args:
+            statement (str): The SQL sent to the database.
+            seconds (float): The time the statement took.
+            rows (int): The rows the driver reported for it, -1 when unknown.
+            endpoint (str): The Flask endpoint, or the thread, that ran it.
+            origin (str): The project function that issued it.
+            request_counts (dict): The runs per fingerprint in the current request, None outside of a request.
+        """
+        sql = self._fingerprints.get(statement)
+        if sql is None:
+            if len(self._fingerprints) >= 4096:
+                self._fingerprints.clear()
+            sql = self._fingerprints[statement] = fingerprint(statement)
+        key = (sql, endpoint, origin)
+        per_request = 1
+        if request_counts is not None:
+            per_request = request_counts[key] = request_counts.get(key, 0) + 1
+
+        with self.lock:
+            now = time.time()
+            if now - self.window_start >= self.window:
+                self.previous = self.current if now - self.window_start < 2 * self.window else {}
+                self.current = {}
+                self.window_start = now
+            stats = self.current.get(key)
+            if stats is None:
+                if len(self.current) >= self.size:
+                    del self.current[min(self.current, key=lambda k: self.current[k]['seconds'])]
+                stats = self.current[key] = {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'rows': 0, 'max_per_request': 0}
+            stats['calls'] += 1
+            stats['seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            if rows > 0:
+                stats['rows'] += rows
+            stats['max_per_request'] = max(stats['max_per_request'], per_request)
+            if seconds >= self.slow_seconds:
+                self.slow.appendleft({
+                    'time': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now)), 'seconds': seconds,
+                    'rows': rows, 'endpoint': endpoint, 'origin': origin,
+                    'statement': _SPACES.sub(' ', statement).strip()
+                })
+
+    def top(self, limit=50):
+        """
+        Returns the entries with the most total time over the rolling window.
+
+        Args:
+            limit (int): The number of entries returned. Defaults to 50.
+
+        Returns:
+            list: A dictionary per fingerprint, endpoint and origin with its calls, seconds, avg_seconds,
+                max_seconds, rows, max_per_request and n_plus_one flag, the largest total time first.
+        """
+        with self.lock:
+            merged = {key: dict(stats) for key, stats in self.previous.items()}
+            for key, stats in self.current.items():
+                total = merged.get(key)
+                if total is None:
+                    merged[key] = dict(stats)
+                    continue
+                for name in ('calls', 'seconds', 'rows'):
+                    total[name] += stats[name]
+                for name in ('max_seconds', 'max_per_request'):
+                    total[name] = max(total[name], stats[name])
+        entries = []
+        for (sql, endpoint, origin), stats in merged.items():
+            stats.update(
+                fingerprint=sql, endpoint=endpoint, origin=origin,
+                avg_seconds=stats['seconds'] / stats['calls'],
+                n_plus_one=stats['max_per_request'] >= self.n_plus_one
+            )
+            entries.append(stats)
+        entries.sort(key=lambda stats: stats['seconds'], reverse=True)
+        return entries[:limit]
+
+    def reset(self):
+        """Clears the entries and the slow list."""
+        with self.lock:
+            self.current = {}
+            self.previous = {}
+            self.window_start = time.time()
+            self.slow.clear()
+
+
+query_log = QueryLog(
+    app.config['QUERY_LOG_SIZE'], app.config['QUERY_LOG_SLOW_MS'],
+    app.config['QUERY_LOG_WINDOW'], app.config['QUERY_LOG_N_PLUS_ONE']
+)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_log_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info['query_log_start'].pop()
+    if has_request_context():
+        endpoint = request.endpoint or 'unmatched'
+        request_counts = g.setdefault('query_log_counts', {})
+    else:
+        endpoint = f"thread:{threading.current_thread().name}"
+        request_counts = None
+    query_log.record(
+        statement, seconds, cursor.rowcount, endpoint, query_log.origin(sys._getframe(1)), request_counts
+    )
+
+
+if query_log.size > 0:
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
@@ -6,7 +6,7 @@ class QuizResult(db.Model):
     __tablename__ = 'quiz_results'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('frostbytes.id'), nullable=False)  # Link to Frostbyte
+    user_id = db.Column(db.Integer, db.ForeignKey('frostbytes.id'), nullable=False, index=True)  # Link to Frostbyte
     assigned_park = db.Column(db.String(100), nullable=False)  # National park assigned
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)  # When the quiz was taken
 
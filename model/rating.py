@@ -4,6 +4,8 @@ from sqlalchemy.orm import relationship
 #from model.post import Post
 from __init__ import db
 from api.jwt_authorize import token_required
+from model.rating_stats import track_ratings
+from model.retry import retry_on_lock
 
 
 class Rating(db.Model):
@@ -12,7 +14,7 @@ class Rating(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     stars = db.Column(db.Integer, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('frostbytes.id'), nullable=False)    
-    channel_id = db.Column(db.Integer, db.ForeignKey('channels.id'), nullable=True)
+    channel_id = db.Column(db.Integer, db.ForeignKey('channels.id'), nullable=True, index=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     user = relationship('Frostbyte')
@@ -27,6 +29,7 @@ class Rating(db.Model):
         self.user_id = user_id
         self.channel_id = channel_id
 
+    @retry_on_lock
     def create(self):
         """Save the rating to the database."""
         db.session.add(self)
@@ -53,6 +56,33 @@ class Rating(db.Model):
         db.session.delete(self)
         db.session.commit()
 
+    @staticmethod
+    @retry_on_lock
+    def rate(user_id, channel_id, stars):
+        """
+        Stores a user's rating of a channel, replacing their earlier rating of it.
+
+        Args:
+            user_id (int): The ID of the user.
+            channel_id (int): The ID of the channel.
+            stars (int): The rating, 1 to 5.
+
+        Returns:
+            Rating: The stored rating.
+        """
+        rating = Rating.query.filter_by(user_id=user_id, channel_id=channel_id).first()
+        if rating:
+            rating.stars = stars  # Update the stars if the rating already exists
+        else:
+            rating = Rating(stars=stars, user_id=user_id, channel_id=channel_id)
+            db.session.add(rating)
+        db.session.commit()
+        return rating
+
+
+# Keep the per channel totals in channel_rating_stats up to date
+track_ratings(Rating, 'ratings')
+
     
 def initRatings():
     from model.rating import Rating  # Import inside the function to avoid circular imports
@@ -0,0 +1,197 @@
+# rating_stats.py
+from sqlalchemy import case, event, func, inspect
+from __init__ import db
+from model.bulk import upsert_statement
+
+# Star values kept in the histogram
+STARS = range(1, 6)
+# The channel_id stored for ratings that have no channel, keys can not be NULL
+NO_CHANNEL = 0
+
+class ChannelRatingStats(db.Model):
+    """
+    ChannelRatingStats Model
+
+    The ChannelRatingStats class keeps the star totals of every channel, so averages and summaries are read
+    from one row per channel instead of aggregating every rating. Rows are kept up to date incrementally by the
+    mapper events of the Rating and Analytics models, and `flask custom rebuild_rating_stats` recomputes them.
+
+    Attributes:
+        source (db.Column): The table the totals are for, 'ratings' or 'analytics'.
+        channel_id (db.Column): The channel the totals are for, 0 for ratings without a channel.
+        stars_sum (db.Column): The sum of the stars.
+        count (db.Column): The number of ratings.
+        stars_1 ... stars_5 (db.Column): The number of ratings with each star value.
+    """
+    __tablename__ = 'channel_rating_stats'
+
+    source = db.Column(db.String(16), primary_key=True)
+    channel_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    stars_sum = db.Column(db.Integer, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    stars_1 = db.Column(db.Integer, nullable=False, default=0)
+    stars_2 = db.Column(db.Integer, nullable=False, default=0)
+    stars_3 = db.Column(db.Integer, nullable=False, default=0)
+    stars_4 = db.Column(db.Integer, nullable=False, default=0)
+    stars_5 = db.Column(db.Integer, nullable=False, default=0)
+
+    @property
+    def average(self):
+        """
+        Gets the average number of stars.
+
+        Returns:
+            float: The average rounded to one decimal, or None when there are no ratings.
+        """
+        return round(self.stars_sum / self.count, 1) if self.count else None
+
+    def read(self):
+        """
+        The read method retrieves the object data from the object's attributes and returns it as a dictionary.
+
+        Returns:
+            dict: A dictionary containing the channel_id, average, count and star histogram.
+        """
+        return {
+            'channel_id': None if self.channel_id == NO_CHANNEL else self.channel_id,
+            'average': self.average,
+            'count': self.count,
+            'histogram': {str(stars): getattr(self, f'stars_{stars}') for stars in STARS}
+        }
+
+    @staticmethod
+    def find(source, channel_id):
+        """
+        Returns the totals of one channel.
+
+        Args:
+            source (str): 'ratings' or 'analytics'.
+            channel_id (int): The channel ID, None for ratings without a channel.
+
+        Returns:
+            ChannelRatingStats: The totals, or None if the channel has never been rated.
+        """
+        return ChannelRatingStats.query.get((source, NO_CHANNEL if channel_id is None else int(channel_id)))
+
+    @staticmethod
+    def summary(source):
+        """
+        Returns the totals of every rated channel.
+
+        Args:
+            source (str): 'ratings' or 'analytics'.
+
+        Returns:
+            list: The ChannelRatingStats of each channel with at least one rating, by channel_id.
+        """
+        return ChannelRatingStats.query.filter(ChannelRatingStats.source == source, ChannelRatingStats.count > 0) \
+            .order_by(ChannelRatingStats.channel_id).all()
+
+    @staticmethod
+    def apply(connection, source, channel_id, stars, sign):
+        """
+        Adds (sign=1) or removes (sign=-1) one rating from the totals of its channel, in one upsert statement.
+        Called from the mapper events of the rated models, so it runs on the connection and in the transaction
+        of the flush that changed the rating.
+
+        Args:
+            connection (Connection): The connection of the flush.
+            source (str): 'ratings' or 'analytics'.
+            channel_id (int): The channel of the rating, None for no channel.
+            stars (int): The stars of the rating.
+            sign (int): 1 to add the rating, -1 to remove it.
+        """
+        ChannelRatingStats.apply_many(connection, source, [(channel_id, stars)], sign)
+
+    @staticmethod
+    def apply_many(connection, source, ratings, sign=1):
+        """
+        Adds or removes many ratings at once, with one upsert row per channel, used after bulk inserts.
+
+        Args:
+            connection (Connection): The connection of the transaction that changed the ratings.
+            source (str): 'ratings' or 'analytics'.
+            ratings (iterable): (channel_id, stars) of each rating.
+            sign (int): 1 to add the ratings, -1 to remove them.
+        """
+        rows = {}
+        for channel_id, stars in ratings:
+            if stars is None:
+                continue
+            channel_id = NO_CHANNEL if channel_id is None else int(channel_id)
+            row = rows.get(channel_id)
+            if row is None:
+                row = rows[channel_id] = {'source': source, 'channel_id': channel_id, 'stars_sum': 0, 'count': 0}
+                row.update({f'stars_{value}': 0 for value in STARS})
+            row['stars_sum'] += sign * int(stars)
+            row['count'] += sign
+            if int(stars) in STARS:
+                row[f'stars_{int(stars)}'] += sign
+        if not rows:
+            return
+        increment = ['stars_sum', 'count'] + [f'stars_{value}' for value in STARS]
+        table = ChannelRatingStats.__table__
+        connection.execute(upsert_statement(connection.dialect.name, table, list(rows.values()), increment))
+
+    @staticmethod
+    def rebuild(source, model):
+        """
+        Recomputes the totals of one source from its table, to reconcile any drift.
+
+        Args:
+            source (str): 'ratings' or 'analytics'.
+            model (db.Model): The rated model, with channel_id and stars columns.
+
+        Returns:
+            int: The number of channels with totals.
+        """
+        columns = [
+            model.channel_id,
+            func.coalesce(func.sum(model.stars), 0),
+            func.count(model.id)
+        ] + [func.sum(case((model.stars == value, 1), else_=0)) for value in STARS]
+        totals = db.session.query(*columns).group_by(model.channel_id).all()
+
+        ChannelRatingStats.query.filter_by(source=source).delete()
+        for channel_id, stars_sum, count, *histogram in totals:
+            stats = ChannelRatingStats(
+                source=source,
+                channel_id=NO_CHANNEL if channel_id is None else channel_id,
+                stars_sum=int(stars_sum),
+                count=count
+            )
+            for value, number in zip(STARS, histogram):
+                setattr(stats, f'stars_{value}', int(number or 0))
+            db.session.add(stats)
+        db.session.commit()
+        return len(totals)
+
+
+def track_ratings(model, source):
+    """
+    Registers the mapper events that keep the totals of a rated model up to date on every insert, update
+    and delete flushed through the ORM. Bulk query deletes skip mapper events, so delete rated rows one by one.
+
+    Args:
+        model (db.Model): The rated model, with channel_id and stars columns.
+        source (str): The source name of its totals.
+    """
+    def after_insert(mapper, connection, target):
+        ChannelRatingStats.apply(connection, source, target.channel_id, target.stars, 1)
+
+    def after_update(mapper, connection, target):
+        state = inspect(target)
+        stars, channel = state.attrs.stars.history, state.attrs.channel_id.history
+        if not stars.has_changes() and not channel.has_changes():
+            return
+        old_stars = stars.deleted[0] if stars.deleted else target.stars
+        old_channel = channel.deleted[0] if channel.deleted else target.channel_id
+        ChannelRatingStats.apply(connection, source, old_channel, old_stars, -1)
+        ChannelRatingStats.apply(connection, source, target.channel_id, target.stars, 1)
+
+    def after_delete(mapper, connection, target):
+        ChannelRatingStats.apply(connection, source, target.channel_id, target.stars, -1)
+
+    event.listen(model, 'after_insert', after_insert)
+    event.listen(model, 'after_update', after_update)
+    event.listen(model, 'after_delete', after_delete)
@@ -0,0 +1,67 @@
+# retry.py
+import functools
+import random
+import time
+from sqlalchemy.exc import OperationalError
+from __init__ import app, db
+
+"""
+Retrying writes that lose a lock race
+
+SQLite lets one writer at a time into the database. A writer that cannot get the lock within the busy timeout
+fails with "database is locked", as does a transaction whose read snapshot went stale before it started writing.
+MySQL reports the same situations as a lock wait timeout or a deadlock. In every case the transaction is lost,
+so its whole unit of work, from adding or changing the rows to the commit, has to run again in a new transaction.
+
+A write function wrapped with retry_on_lock is rolled back and run again after an exponential backoff with jitter,
+so writers that collided do not collide again in step.
+"""
+
+# MySQL error codes of a lock wait timeout and a deadlock
+MYSQL_LOCK_ERRORS = (1205, 1213)
+
+def is_lock_error(error):
+    """
+    Checks if a database error means the transaction lost a lock race and can be run again.
+
+    Args:
+        error (OperationalError): The error raised by SQLAlchemy.
+
+    Returns:
+        bool: True for SQLite locked or busy errors and MySQL lock timeouts and deadlocks.
+    """
+    orig = getattr(error, 'orig', None)
+    if orig is None:
+        return False
+    args = getattr(orig, 'args', ())
+    if args and args[0] in MYSQL_LOCK_ERRORS:
+        return True
+    message = str(orig).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+def retry_on_lock(func):
+    """
+    Runs a write function again when its transaction fails on a lock, up to DB_LOCK_RETRIES times.
+
+    The function must do its whole unit of work, adding or changing rows and committing, since the failed
+    transaction is rolled back before the next attempt.
+
+    Args:
+        func (function): The write function.
+
+    Returns:
+        function: The wrapped function.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        retries = app.config['DB_LOCK_RETRIES']
+        backoff = app.config['DB_LOCK_BACKOFF_MS'] / 1000
+        for attempt in range(retries + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                if attempt == retries or not is_lock_error(e):
+                    raise
+                db.session.rollback()
+                time.sleep(backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+    return wrapper
@@ -28,7 +28,7 @@ class review(db.Model):
     _comment = db.Column(db.String(255), nullable=False)
     _content = db.Column(JSON, nullable=False)
     _user_id = db.Column(db.Integer, db.ForeignKey('frostbytes.id'), nullable=False)
-    _channel_id = db.Column(db.Integer, db.ForeignKey('channels.id'), nullable=False)
+    _channel_id = db.Column(db.Integer, db.ForeignKey('channels.id'), nullable=False, index=True)
 
     def __init__(self, title, comment, user_id=None, channel_id=None, content={}, user_name=None, channel_name=None):
         """
@@ -85,6 +85,19 @@ class review(db.Model):
         """
         user = Frostbyte.query.get(self._user_id)
         channel = Channel.query.get(self._channel_id)
+        return self._read(user, channel)
+
+    def _read(self, user, channel):
+        """
+        Builds the review dictionary from already resolved user and channel objects.
+        
+        Args:
+            user (Frostbyte): The user who created the review, or None.
+            channel (Channel): The channel to which the review belongs, or None.
+        
+        Returns:
+            dict: A dictionary containing the review data, including user and channel names.
+        """
         data = {
             "id": self.id,
             "title": self._title,
@@ -0,0 +1,60 @@
+# serializer.py
+from model.frostbyte import Frostbyte
+from model.group import Group
+from model.channel import Channel
+from model.post import Post
+
+"""
+Foreign key columns that list endpoints resolve to names when serializing.
+Each entry maps the column attribute on a model to the keyword passed to the model's _read method
+and the model class the column references.
+"""
+REFERENCES = {
+    '_user_id': ('user', Frostbyte),
+    '_channel_id': ('channel', Channel),
+    '_group_id': ('group', Group),
+    '_post_id': ('post', Post),
+}
+
+def prefetch(items):
+    """
+    Loads every user, channel, group and post referenced by a list of model objects.
+
+    Uses:
+        One IN query per referenced table, no matter how many objects are in the list.
+
+    Args:
+        items (list): Model objects that have some of the foreign key columns in REFERENCES.
+
+    Returns:
+        dict: A dictionary of {column attribute: {id: object}} for the referenced tables.
+    """
+    lookups = {}
+    for attr, (_, model) in REFERENCES.items():
+        ids = {getattr(item, attr) for item in items if getattr(item, attr, None) is not None}
+        if ids:
+            lookups[attr] = {obj.id: obj for obj in model.query.filter(model.id.in_(ids)).all()}
+    return lookups
+
+def bulk_read(items):
+    """
+    Serializes a list of model objects with a fixed number of queries.
+
+    Each model keeps its own output format in a _read method that takes the resolved related
+    objects as keyword arguments (user, channel, group, post), while read() looks them up one by one.
+
+    Args:
+        items (list): Model objects of one type, for example the result of a filtered query.
+
+    Returns:
+        list: A list of dictionaries in the same format as each object's read().
+    """
+    lookups = prefetch(items)
+    json_ready = []
+    for item in items:
+        related = {}
+        for attr, (name, _) in REFERENCES.items():
+            if hasattr(type(item), attr):
+                related[name] = lookups.get(attr, {}).get(getattr(item, attr))
+        json_ready.append(item._read(**related))
+    return json_ready
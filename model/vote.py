@@ -1,4 +1,5 @@
 from __init__ import db, app
+from sqlalchemy import event, func, inspect
 from sqlalchemy.exc import IntegrityError
 from model.post import Post
 from model.frostbyte import Frostbyte
@@ -14,13 +15,17 @@ class Vote(db.Model):
         _vote_type (db.Column): A string representing the type of vote ("upvote" or "downvote").
         _user_id (db.Column): An integer representing the ID of the user who cast the vote.
         _post_id (db.Column): An integer representing the ID of the post that received the vote.
+
+    A user has at most one vote per post, and the upvote and downvote counters of the post are updated in the
+    same transaction as every vote insert, flip and delete.
     """
     __tablename__ = 'votes'
+    __table_args__ = (db.UniqueConstraint('_user_id', '_post_id', name='unique_user_post_vote'),)
 
     id = db.Column(db.Integer, primary_key=True)
     _vote_type = db.Column(db.String(10), nullable=False)  # "upvote" or "downvote"
     _user_id = db.Column(db.Integer, db.ForeignKey('frostbytes.id'), nullable=False)
-    _post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), nullable=False)
+    _post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), nullable=False, index=True)
 
     def __init__(self, vote_type, user_id, post_id):
         """
@@ -60,6 +65,16 @@ class Vote(db.Model):
             "post_id": self._post_id
         }
 
+    def update(self, vote_type):
+        """
+        Change the vote type and commit the transaction.
+
+        Args:
+            vote_type (str): The new type of the vote, either "upvote" or "downvote".
+        """
+        self._vote_type = vote_type
+        self.create()
+
     def delete(self):
         """
         Remove the vote from the database and commit the transaction.
@@ -71,6 +86,83 @@ class Vote(db.Model):
             db.session.rollback()
             raise e
 
+    @staticmethod
+    def cast(vote_type, user_id, post_id):
+        """
+        Create the vote of a user on a post, or change its type when the user already voted.
+        The unique index on (user, post) decides between concurrent first votes of the same user.
+
+        Args:
+            vote_type (str): Type of the vote, either "upvote" or "downvote".
+            user_id (int): ID of the user who casts the vote.
+            post_id (int): ID of the post that receives the vote.
+
+        Returns:
+            Vote: The stored vote.
+        """
+        vote = Vote.query.filter_by(_post_id=post_id, _user_id=user_id).first()
+        if vote is None:
+            try:
+                vote = Vote(vote_type, user_id, post_id)
+                vote.create()
+                return vote
+            except IntegrityError:
+                vote = Vote.query.filter_by(_post_id=post_id, _user_id=user_id).first()
+        if vote._vote_type != vote_type:
+            vote.update(vote_type)
+        return vote
+
+    @staticmethod
+    def recount():
+        """
+        Recompute the vote counters of every post from the votes table, to reconcile any drift.
+
+        Returns:
+            int: The number of posts with votes.
+        """
+        counts = db.session.query(
+            Vote._post_id,
+            func.sum(db.case((Vote._vote_type == 'upvote', 1), else_=0)),
+            func.sum(db.case((Vote._vote_type == 'downvote', 1), else_=0))
+        ).group_by(Vote._post_id).all()
+        Post.query.update({Post._upvotes: 0, Post._downvotes: 0}, synchronize_session=False)
+        for post_id, upvotes, downvotes in counts:
+            Post.query.filter_by(id=post_id).update({Post._upvotes: upvotes, Post._downvotes: downvotes}, synchronize_session=False)
+        db.session.commit()
+        return len(counts)
+
+
+def _count_vote(connection, post_id, vote_type, delta):
+    """Adds delta to the upvote or downvote counter of a post, on the connection of the flush."""
+    column = {'upvote': '_upvotes', 'downvote': '_downvotes'}.get(vote_type)
+    if column is None or post_id is None:
+        return
+    posts = Post.__table__
+    connection.execute(posts.update().where(posts.c.id == post_id).values({column: posts.c[column] + delta}))
+
+
+@event.listens_for(Vote, 'after_insert')
+def _vote_inserted(mapper, connection, target):
+    _count_vote(connection, target._post_id, target._vote_type, 1)
+
+
+@event.listens_for(Vote, 'after_update')
+def _vote_updated(mapper, connection, target):
+    """Moves the vote between counters when it is flipped, or between posts when its post changes."""
+    state = inspect(target)
+    vote_type, post_id = state.attrs._vote_type.history, state.attrs._post_id.history
+    if not vote_type.has_changes() and not post_id.has_changes():
+        return
+    old_type = vote_type.deleted[0] if vote_type.deleted else target._vote_type
+    old_post = post_id.deleted[0] if post_id.deleted else target._post_id
+    _count_vote(connection, old_post, old_type, -1)
+    _count_vote(connection, target._post_id, target._vote_type, 1)
+
+
+@event.listens_for(Vote, 'after_delete')
+def _vote_deleted(mapper, connection, target):
+    _count_vote(connection, target._post_id, target._vote_type, -1)
+
 def initVotes():
     """
     Initialize the Vote table with any required starter data.
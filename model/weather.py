@@ -1,34 +1,56 @@
 # models/weather.py
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
-from sqlalchemy.orm import relationship
+from datetime import datetime, timedelta
 from __init__ import db
-from model.frostbyte import Frostbyte
+from model.channel import Channel
+from model.group import Group
+from model.geo import haversine_km
 
 class Weather(db.Model):
+    """
+    Weather Model
+
+    The Weather class stores one observation of the current conditions at a park channel.
+    Observations are written by the background refresher in api/weather_service.py and the newest one
+    of a park is what GET /api/weather/<city> serves for that park.
+
+    Attributes:
+        id (db.Column): The primary key, an integer representing the unique identifier for the observation.
+        temperature (db.Column): The temperature in degrees Celsius.
+        description (db.Column): A short text description of the conditions.
+        humidity (db.Column): The relative humidity in percent.
+        pressure (db.Column): The air pressure in millibars.
+        wind_speed (db.Column): The wind speed in km/h.
+        _channel_id (db.Column): The park channel the observation is for.
+        created_at (db.Column): When the observation was stored.
+        updated_at (db.Column): When the observation was last changed.
+    """
     __tablename__ = 'weather'
+    __table_args__ = (db.Index('ix_weather_channel_created', '_channel_id', 'created_at'),)
 
     # Primary key
     id = db.Column(db.Integer, primary_key=True)
-    
+
     # Fields related to weather
     temperature = db.Column(db.Float, nullable=False)
     description = db.Column(db.String(255), nullable=False)
     humidity = db.Column(db.Integer, nullable=False)
-    pressure = db.Column(db.Integer, nullable=False)
+    pressure = db.Column(db.Float, nullable=False)
+    wind_speed = db.Column(db.Float, nullable=True)
 
-    # Foreign key for park relationship
-    park_id = db.Column(db.Integer, db.ForeignKey('parks.id'), nullable=False)
+    # Foreign key for the park channel relationship
+    _channel_id = db.Column(db.Integer, db.ForeignKey('channels.id', ondelete='CASCADE'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
-    # Relationship with the Park model (assuming parks model exists)
-    park = db.relationship('Park', backref=db.backref('weather', lazy=True))
+    channel = db.relationship('Channel')
 
-    def __init__(self, temperature, description, humidity, pressure, park_id):
+    def __init__(self, temperature, description, humidity, pressure, channel_id, wind_speed=None):
         self.temperature = temperature
         self.description = description
         self.humidity = humidity
         self.pressure = pressure
-        self.park_id = park_id
+        self.wind_speed = wind_speed
+        self._channel_id = channel_id
 
     def create(self):
         """Create and save a new Weather entry."""
@@ -52,7 +74,97 @@ class Weather(db.Model):
             'description': self.description,
             'humidity': self.humidity,
             'pressure': self.pressure,
+            'wind_speed': self.wind_speed,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
-            'park_id': self.park_id
+            'channel_id': self._channel_id
         }
+
+    @staticmethod
+    def latest(channel_id):
+        """
+        Returns the newest observation of a park channel.
+
+        Args:
+            channel_id (int): The ID of the park channel.
+
+        Returns:
+            Weather: The newest observation, or None if none is stored yet.
+        """
+        return Weather.query.filter_by(_channel_id=channel_id).order_by(Weather.created_at.desc()).first()
+
+    @staticmethod
+    def last_refresh():
+        """
+        Returns when the newest observation of any park was stored.
+
+        Returns:
+            datetime: The created_at of the newest observation, or None if none is stored yet.
+        """
+        return db.session.query(db.func.max(Weather.created_at)).scalar()
+
+    @staticmethod
+    def prune(days):
+        """
+        Deletes observations older than a number of days.
+
+        Args:
+            days (int): The number of days of observations to keep.
+
+        Returns:
+            int: The number of deleted observations.
+        """
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        deleted = Weather.query.filter(Weather.created_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+
+def park_channels():
+    """
+    Returns the park channels, the channels of the National Parks group.
+
+    Returns:
+        list: The park Channel objects.
+    """
+    return Channel.query.join(Group, Channel._group_id == Group.id).filter(Group._name == 'National Parks').all()
+
+
+def park_coordinates(channel):
+    """
+    Returns the coordinates of a park channel from its attributes, eg {"lat": 63.11, "lon": -151.19}.
+
+    Args:
+        channel (Channel): The park channel.
+
+    Returns:
+        tuple: The latitude and longitude, or None when the attributes have no coordinates.
+    """
+    attributes = channel._attributes or {}
+    lat = attributes.get('lat', attributes.get('latitude'))
+    lon = attributes.get('lon', attributes.get('longitude'))
+    if lat is None or lon is None:
+        return None
+    return float(lat), float(lon)
+
+
+def nearest_parks(latitude, longitude, k):
+    """
+    Finds the k parks nearest to a point, by the coordinates of the park channels themselves, so a park is
+    found whether or not anyone has shared a location in it. Parks without coordinates are left out.
+
+    Args:
+        latitude (float): The latitude of the point in degrees.
+        longitude (float): The longitude of the point in degrees.
+        k (int): The number of parks to return.
+
+    Returns:
+        list: Up to k (Channel, distance in km) tuples, nearest first.
+    """
+    parks = [(channel, park_coordinates(channel)) for channel in park_channels()]
+    parks = [(channel, point) for channel, point in parks if point is not None]
+    if not parks:
+        return []
+    distances = haversine_km(latitude, longitude, [point[0] for _, point in parks], [point[1] for _, point in parks])
+    order = sorted(range(len(parks)), key=lambda i: distances[i])
+    return [(parks[i][0], float(distances[i])) for i in order[:k]]
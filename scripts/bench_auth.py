@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+""" bench_auth.py
+Measures the authentication overhead of token_required per request,
+with the authenticated user cache disabled and then enabled.
+
+Usage: Run from the terminal as such, after the database has been initialized:
+
+Goto the scripts directory:
+> cd scripts; ./bench_auth.py
+
+Or run from the root of the project:
+> scripts/bench_auth.py [requests]
+"""
+import sys
+import os
+import time
+
+import jwt
+
+# Add the directory containing main.py to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Import application object
+from main import app
+from model.frostbyte import user_cache
+
+def run(client, requests):
+    """Time a number of GET /api/id requests and return the mean milliseconds per request."""
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get('/api/id')
+        if response.status_code != 200:
+            print(f"Request failed with {response.status_code}: {response.get_data(as_text=True)}")
+            sys.exit(1)
+    return (time.perf_counter() - start) * 1000 / requests
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    token = jwt.encode({"_uid": app.config['ADMIN_USER']}, app.config["SECRET_KEY"], algorithm="HS256")
+    client = app.test_client()
+    client.set_cookie(app.config["JWT_TOKEN_NAME"], token)
+
+    # Warm up the app and database connection
+    run(client, 10)
+
+    maxsize = user_cache.maxsize
+    user_cache.maxsize = 0
+    user_cache.clear()
+    uncached = run(client, requests)
+
+    user_cache.maxsize = maxsize or 1024
+    user_cache.clear()
+    cached = run(client, requests)
+
+    print(f"{requests} authenticated requests to /api/id")
+    print(f"  without user cache: {uncached:.3f} ms/request")
+    print(f"  with user cache:    {cached:.3f} ms/request")
+    print(f"  cache counters:     {user_cache.stats()}")
+
+if __name__ == "__main__":
+    main()
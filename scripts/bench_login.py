@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+""" bench_login.py
+Measures logins/sec through POST /api/authenticate under concurrency,
+with password checks on the request thread and then in the hashing process pool.
+
+Usage: Run from the terminal as such, after the database has been initialized:
+
+Goto the scripts directory:
+> cd scripts; ./bench_login.py
+
+Or run from the root of the project:
+> scripts/bench_login.py [logins] [threads]
+
+The pbkdf2 cost of new hashes is set with the PASSWORD_HASH_ITERATIONS environment variable,
+existing users keep the cost they were hashed with until their password changes.
+"""
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the directory containing main.py to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Import application object
+from main import app
+
+def login(_):
+    """Authenticate the admin user once and return the status code."""
+    client = app.test_client()
+    response = client.post('/api/authenticate', json={
+        "uid": app.config['ADMIN_USER'],
+        "password": app.config['ADMIN_PASSWORD']
+    })
+    return response.status_code
+
+def run(logins, threads):
+    """Run logins spread over threads and return logins per second."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        statuses = list(executor.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    failed = [status for status in statuses if status != 200]
+    if failed:
+        print(f"{len(failed)} logins failed, first status {failed[0]}")
+        sys.exit(1)
+    return logins / elapsed
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    workers = app.config['PASSWORD_HASH_WORKERS'] or os.cpu_count() or 1
+
+    app.config['PASSWORD_HASH_WORKERS'] = 0
+    inline = run(logins, threads)
+
+    app.config['PASSWORD_HASH_WORKERS'] = workers
+    run(workers, workers)  # start the pool processes before timing
+    pooled = run(logins, threads)
+
+    print(f"{logins} logins over {threads} threads")
+    print(f"  hashing on request threads:      {inline:.2f} logins/sec")
+    print(f"  hashing in {workers} pool process(es): {pooled:.2f} logins/sec")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+""" bench_sqlite_writes.py
+Measures concurrent writes/sec and failed writes on the SQLite database through the rating and analytics
+write paths (POST /api/rating and POST /api/analytics), with worker processes writing at the same time as
+gunicorn workers do. It runs once with SQLite's defaults (rollback journal, no retries) and once with the
+settings from __init__.py (WAL, busy timeout and tuned pragmas, writes retried on lock errors).
+
+Usage: Run from the terminal as such, after the database has been initialized:
+
+Goto the scripts directory:
+> cd scripts; ./bench_sqlite_writes.py
+
+Or run from the root of the project:
+> scripts/bench_sqlite_writes.py [writes per process] [processes]
+
+The database file is copied before the run and put back afterwards, so the benchmark leaves no rows behind.
+"""
+import sys
+import os
+import shutil
+import time
+import multiprocessing
+
+import jwt
+from sqlalchemy import event, text
+
+# Keep the park weather refresher from writing during the run
+os.environ.setdefault('WEATHER_REFRESH_INTERVAL', '0')
+# Add the directory containing main.py to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Import application object
+from main import app, db
+from __init__ import set_sqlite_pragmas
+from model.channel import Channel
+
+def writer(args):
+    """Send writes alternating between a rating and an analytics event, return (ok, failed)."""
+    index, writes, channel_ids = args
+    with app.app_context():
+        db.engine.dispose(close=False)
+    client = app.test_client()
+    token = jwt.encode({"_uid": app.config['ADMIN_USER']}, app.config["SECRET_KEY"], algorithm="HS256")
+    client.set_cookie(app.config["JWT_TOKEN_NAME"], token)
+    ok = failed = 0
+    for i in range(writes):
+        channel_id = channel_ids[index % len(channel_ids)]
+        try:
+            if i % 2:
+                response = client.post('/api/rating', json={'stars': i % 5 + 1, 'channel_id': channel_id})
+            else:
+                response = client.post('/api/analytics', json={'channel_id': channel_id, 'user_id': 1, 'stars': i % 5 + 1})
+            ok, failed = (ok + 1, failed) if response.status_code in (200, 201) else (ok, failed + 1)
+        except Exception:
+            failed += 1
+    return ok, failed
+
+def run(writes, processes, channel_ids):
+    """Run writer processes at once and return (writes/sec, failed writes)."""
+    start = time.perf_counter()
+    with multiprocessing.get_context('fork').Pool(processes) as pool:
+        results = pool.map(writer, [(index, writes, channel_ids) for index in range(processes)])
+    elapsed = time.perf_counter() - start
+    ok = sum(result[0] for result in results)
+    failed = sum(result[1] for result in results)
+    return ok / elapsed, failed
+
+def main():
+    writes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        print("This benchmark is for the SQLite database")
+        sys.exit(1)
+    app.config['ANALYTICS_BUFFER_MS'] = 0
+    app.config['PROPAGATE_EXCEPTIONS'] = False
+
+    with app.app_context():
+        db_path = db.engine.url.database
+        channel_ids = [channel.id for channel in Channel.query.limit(processes).all()]
+        db.session.execute(text('PRAGMA wal_checkpoint(TRUNCATE)'))
+        db.session.commit()
+        db.session.remove()
+        db.engine.dispose()
+    backup_path = db_path + '.bench'
+    shutil.copyfile(db_path, backup_path)
+
+    try:
+        # SQLite defaults: rollback journal, pysqlite's own lock wait and no retries
+        retries = app.config['DB_LOCK_RETRIES']
+        app.config['DB_LOCK_RETRIES'] = 0
+        with app.app_context():
+            event.remove(db.engine, 'connect', set_sqlite_pragmas)
+            db.session.execute(text('PRAGMA journal_mode=DELETE'))
+            db.session.remove()
+            db.engine.dispose()
+        default_rate, default_failed = run(writes, processes, channel_ids)
+
+        # Tuned: the connect hook turns WAL and the pragmas back on, lock errors are retried
+        app.config['DB_LOCK_RETRIES'] = retries
+        with app.app_context():
+            event.listen(db.engine, 'connect', set_sqlite_pragmas)
+            db.engine.dispose()
+        tuned_rate, tuned_failed = run(writes, processes, channel_ids)
+    finally:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        for suffix in ('-wal', '-shm', '-journal'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        shutil.move(backup_path, db_path)
+
+    print(f"{writes} writes in each of {processes} processes, ratings and analytics events")
+    print(f"  SQLite defaults:     {default_rate:8.1f} writes/sec, {default_failed} failed")
+    print(f"  WAL, pragmas, retry: {tuned_rate:8.1f} writes/sec, {tuned_failed} failed")
+
+if __name__ == "__main__":
+    main()
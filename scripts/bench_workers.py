@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+""" bench_workers.py
+Measures requests/sec of the production server (gunicorn with gunicorn.conf.py) as the number of
+worker processes grows, by starting the server once per worker count and loading it over HTTP.
+
+Usage: Run from the terminal as such, after the database has been initialized and gunicorn is installed:
+
+Goto the scripts directory:
+> cd scripts; ./bench_workers.py
+
+Or run from the root of the project:
+> scripts/bench_workers.py [requests] [client threads] [worker counts] [path]
+
+eg scripts/bench_workers.py 2000 32 1,2,4,8 /api/id
+
+The worker class and threads per worker are read from GUNICORN_WORKER_CLASS and GUNICORN_THREADS as in production.
+"""
+import sys
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+import requests
+
+# Add the directory containing main.py to the Python path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+# Import application object
+from main import app
+
+BIND = '127.0.0.1:8199'
+
+def start_server(workers):
+    """Start gunicorn with a number of workers and wait until it answers."""
+    env = dict(os.environ, GUNICORN_WORKERS=str(workers), GUNICORN_BIND=BIND, WEATHER_REFRESH_INTERVAL='0')
+    server = subprocess.Popen(['gunicorn', 'main:app'], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            requests.get(f'http://{BIND}/', timeout=1)
+            return server
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    server.kill()
+    print("The server did not start, check that gunicorn main:app runs")
+    sys.exit(1)
+
+def run(path, cookies, total, threads):
+    """Send total requests spread over client threads and return requests per second."""
+    def worker(count):
+        session = requests.Session()
+        failed = 0
+        for _ in range(count):
+            if session.get(f'http://{BIND}{path}', cookies=cookies).status_code != 200:
+                failed += 1
+        return failed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        failed = sum(executor.map(worker, [total // threads] * threads))
+    elapsed = time.perf_counter() - start
+    if failed:
+        print(f"{failed} requests failed")
+    return (total // threads) * threads / elapsed
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    counts = [int(count) for count in sys.argv[3].split(',')] if len(sys.argv) > 3 else [1, 2, 4]
+    path = sys.argv[4] if len(sys.argv) > 4 else '/api/id'
+    token = jwt.encode({"_uid": app.config['ADMIN_USER']}, app.config["SECRET_KEY"], algorithm="HS256")
+    cookies = {app.config["JWT_TOKEN_NAME"]: token}
+
+    print(f"{total} requests to {path} over {threads} client threads, "
+          f"{os.environ.get('GUNICORN_WORKER_CLASS') or 'gthread'} workers with "
+          f"{os.environ.get('GUNICORN_THREADS') or 4} threads, {os.cpu_count()} CPU(s)")
+    baseline = None
+    for workers in counts:
+        server = start_server(workers)
+        try:
+            run(path, cookies, threads * 4, threads)  # warm up every worker
+            rate = run(path, cookies, total, threads)
+        finally:
+            server.terminate()
+            server.wait()
+        baseline = baseline or rate
+        print(f"  {workers} worker(s): {rate:8.1f} requests/sec  ({rate / baseline:.2f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -31,6 +31,7 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 # Import application object
 from main import app, db, generate_data
+from sqlalchemy import text
 
 # Backup the old database
 def backup_database(db_uri, backup_uri):
@@ -38,6 +39,9 @@ def backup_database(db_uri, backup_uri):
     if backup_uri:
         db_path = db_uri.replace('sqlite:///', 'instance/')
         backup_path = backup_uri.replace('sqlite:///', 'instance/')
+        # Move the committed pages from the write-ahead log into the database file before copying it
+        with app.app_context():
+            db.session.execute(text('PRAGMA wal_checkpoint(TRUNCATE)'))
         shutil.copyfile(db_path, backup_path)
         print(f"Database backed up to {backup_path}")
     else:
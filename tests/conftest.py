@@ -0,0 +1,149 @@
+# conftest.py
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+"""
+Test settings, applied before the app is imported
+
+The tests run against their own SQLite database, instance/volumes/frostbyte_test.db, which is recreated for each
+test session, so the development database is never touched. Background threads are turned off and passwords are
+hashed with a low iteration count to keep the data generation fast.
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ['DB_NAME'] = 'frostbyte_test'
+os.environ['WEATHER_REFRESH_INTERVAL'] = '0'
+os.environ['PASSWORD_HASH_ITERATIONS'] = '1000'
+os.environ['PASSWORD_HASH_WORKERS'] = '0'
+os.environ['METRICS_FLUSH_SECONDS'] = '0'
+os.environ['USER_CACHE_STAMP'] = os.path.join(ROOT, 'instance', 'user-cache-test.stamp')
+os.makedirs(os.path.join(ROOT, 'instance', 'volumes'), exist_ok=True)
+
+import jwt
+import pytest
+from sqlalchemy import event
+
+
+@pytest.fixture(scope='session')
+def app():
+    """The app with a freshly generated test database."""
+    from main import app, db, generate_data
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.drop_all()
+        generate_data.callback.__wrapped__()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    paths = [os.path.join(app.instance_path, 'volumes', 'frostbyte_test.db' + suffix) for suffix in ('', '-wal', '-shm')]
+    for path in paths + [app.config['USER_CACHE_STAMP']]:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def queries(app):
+    """
+    Returns a context manager that yields the list of SQL statements run while it is open.
+    """
+    from __init__ import db
+    with app.app_context():
+        engine = db.engine
+
+    @contextmanager
+    def queries():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+    return queries
+
+
+@pytest.fixture
+def login(app, client):
+    """Signs the test client in as a user, by uid, or out with None."""
+    def login(uid):
+        if uid is None:
+            client.delete_cookie(app.config['JWT_TOKEN_NAME'])
+            return
+        token = jwt.encode({'_uid': uid}, app.config['SECRET_KEY'], algorithm='HS256')
+        client.set_cookie(app.config['JWT_TOKEN_NAME'], token)
+    return login
+
+
+class FakeChunk:
+    """A model response or a piece of a streamed one."""
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeChat:
+    """
+    A model chat that answers each prompt with the prompt and the earlier user prompts of the chat, so a test can
+    tell which history an answer was generated with.
+    """
+    def __init__(self, model, history):
+        self.model = model
+        self.history = list(history)
+
+    def send_message(self, prompt, stream=False):
+        self.model.calls.append((prompt, len(self.history)))
+        self.model.release.wait(5)
+        if prompt in self.model.failing:
+            raise RuntimeError('model unavailable')
+        earlier = [turn['parts'][0] for turn in self.history if turn['role'] == 'user']
+        text = ' | '.join([f'Answer to {prompt}', *earlier])
+        self.history += [{'role': 'user', 'parts': [prompt]}, {'role': 'model', 'parts': [text]}]
+        if stream:
+            return [FakeChunk(text[i:i + 8]) for i in range(0, len(text), 8)]
+        return FakeChunk(text)
+
+
+class FakeModel:
+    """
+    A local stand-in for the Gemini model.
+
+    Attributes:
+        calls (list): The (prompt, history length) of every prompt sent to the model.
+        failing (set): Prompts the model raises an error for.
+        release (threading.Event): Answers wait until it is set, clear it to hold replies as pending.
+    """
+    def __init__(self):
+        self.calls = []
+        self.failing = set()
+        self.release = threading.Event()
+        self.release.set()
+
+    def start_chat(self, history):
+        return FakeChat(self, history)
+
+
+@pytest.fixture
+def fake_model(app, monkeypatch):
+    """Replaces the chatbot model, and starts from no messages, chat sessions or cached responses."""
+    import api.gemini as gemini
+    from model.gemini import AIMessage
+    model = FakeModel()
+    monkeypatch.setattr(gemini, 'model', model)
+    with app.app_context():
+        AIMessage.query.delete()
+        gemini.db.session.commit()
+        gemini.response_cache.clear()
+    gemini.chat_sessions.sessions.clear()
+    return model
@@ -0,0 +1,62 @@
+# test_bulk_errors.py
+import pytest
+from sqlalchemy.exc import OperationalError
+import model.bulk as bulk
+from model.analytics import Analytics
+from model.channel import Channel
+from model.frostbyte import Frostbyte
+
+"""
+Bulk endpoints when the database fails partway
+
+The chunks before the failure stay committed, and the response tells which entries were written, which were
+rejected and which are pending, so a client can send the pending ones again.
+"""
+
+
+@pytest.fixture
+def failing_second_chunk(monkeypatch):
+    """Inserts in chunks of 2 rows and fails the second chunk with an operational error."""
+    insert_chunk = bulk._insert_chunk
+    calls = []
+
+    def fail_second(model, mappings, before_commit):
+        calls.append(len(mappings))
+        if len(calls) == 2:
+            raise OperationalError('INSERT', {}, Exception('disk I/O error'))
+        return insert_chunk(model, mappings, before_commit)
+
+    monkeypatch.setattr(bulk, '_insert_chunk', fail_second)
+    monkeypatch.setattr(bulk.bulk_insert, '__defaults__', (2, None))
+
+
+def test_analytics_bulk_reports_a_partial_insert(app, client, failing_second_chunk):
+    with app.app_context():
+        user_id = Frostbyte.query.first().id
+        channel_id = Channel.query.first().id
+        before = Analytics.query.count()
+    entries = [{'user_id': user_id, 'channel_id': channel_id, 'stars': stars} for stars in (1, 2, 3, 4, 5)]
+    entries.insert(1, {'user_id': user_id, 'channel_id': channel_id, 'stars': 9})
+
+    response = client.post('/api/analytics/bulk', json=entries)
+    assert response.status_code == 503
+    results = response.get_json()
+    assert results['success'] == 2
+    assert results['pending'] == [3, 4, 5]
+    assert [error['data']['stars'] for error in results['errors']] == [9, 3, 4, 5]
+    with app.app_context():
+        assert Analytics.query.count() == before + 2
+
+
+def test_post_bulk_reports_a_partial_insert(app, client, login, failing_second_chunk):
+    with app.app_context():
+        channel_id = Channel.query.first().id
+    posts = [{'title': f'Bulk {number}', 'comment': 'partial insert', 'channel_id': channel_id} for number in range(5)]
+
+    login('risha')
+    response = client.post('/api/posts', json=posts)
+    assert response.status_code == 503
+    results = response.get_json()
+    assert results['success_count'] == 2
+    assert results['pending'] == [2, 3, 4]
+    assert results['error_count'] == 3
@@ -0,0 +1,62 @@
+# test_chatbot_async.py
+import threading
+import api.gemini as gemini
+
+"""
+Queued chatbot replies
+
+POST /api/chatbot/async queues a prompt and returns the ID of the pending reply at once, and the signed in user
+who sent it reads the reply with GET /api/chatbot/async/<id>, optionally long-polling with ?wait=.
+"""
+
+PROMPT = 'What should I pack for a desert hike?'
+
+
+def enqueue(client, user_input=PROMPT):
+    return client.post('/api/chatbot/async', json={'user_input': user_input})
+
+
+def test_queued_reply_is_polled_until_complete(client, login, fake_model):
+    login('risha')
+    fake_model.release.clear()
+    response = enqueue(client)
+    assert response.status_code == 202
+    queued = response.get_json()
+    assert queued['status'] == 'pending'
+
+    reply = client.get(f"/api/chatbot/async/{queued['ai_message_id']}").get_json()
+    assert reply == {'ai_message_id': queued['ai_message_id'], 'status': 'pending', 'model_response': None}
+
+    fake_model.release.set()
+    reply = client.get(f"/api/chatbot/async/{queued['ai_message_id']}?wait=5").get_json()
+    assert reply['status'] == 'complete'
+    assert reply['model_response'] == f'Answer to {PROMPT}'
+
+
+def test_queued_reply_requires_the_sender(client, login, fake_model):
+    login(None)
+    assert enqueue(client).status_code == 401
+
+    login('risha')
+    ai_message_id = enqueue(client).get_json()['ai_message_id']
+    assert client.get(f'/api/chatbot/async/{ai_message_id}?wait=5').get_json()['status'] == 'complete'
+
+    login(None)
+    assert client.get(f'/api/chatbot/async/{ai_message_id}').status_code == 401
+    login('abby')
+    assert client.get(f'/api/chatbot/async/{ai_message_id}').status_code == 404
+
+
+def test_full_queue_is_refused(client, login, fake_model, monkeypatch):
+    monkeypatch.setattr(gemini.chat_queue, 'slots', threading.BoundedSemaphore(1))
+    login('risha')
+    fake_model.release.clear()
+    first = enqueue(client)
+    busy = enqueue(client, 'Which stove works at altitude?')
+    fake_model.release.set()
+
+    assert first.status_code == 202
+    assert busy.status_code == 503
+    reply = client.get(f"/api/chatbot/async/{busy.get_json()['ai_message_id']}").get_json()
+    assert reply['status'] == 'error'
+    assert client.get(f"/api/chatbot/async/{first.get_json()['ai_message_id']}?wait=5").get_json()['status'] == 'complete'
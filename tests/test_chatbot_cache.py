@@ -0,0 +1,74 @@
+# test_chatbot_cache.py
+import json
+import api.gemini as gemini
+
+"""
+Chatbot response cache
+
+A standalone prompt is answered from the shared response cache even in a conversation with history, so its cached
+answer must never be generated with one user's earlier messages.
+"""
+
+SECRET = 'Plan my trip to the hidden lake near my house'
+PROMPT = 'What are the best tent brands?'
+
+
+def chat(client, user_input):
+    response = client.post('/api/chatbot', json={'user_input': user_input})
+    assert response.status_code == 200
+    return response.get_json()['model_response']
+
+
+def stream(client, user_input):
+    response = client.post('/api/chatbot/stream', json={'user_input': user_input})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    return ''.join(line['text'] for line in lines if line['type'] == 'chunk')
+
+
+def test_cached_reply_never_comes_from_a_session_with_history(client, login, fake_model):
+    login('risha')
+    chat(client, SECRET)
+    reply = chat(client, PROMPT)
+    assert SECRET not in reply
+    assert fake_model.calls[-1] == (PROMPT, 0)  # answered in a chat without the history
+
+    login('abby')
+    calls = len(fake_model.calls)
+    assert chat(client, PROMPT) == reply
+    assert len(fake_model.calls) == calls  # served from the cache
+
+
+def test_streamed_cached_reply_never_comes_from_a_session_with_history(client, login, fake_model):
+    login('risha')
+    stream(client, SECRET)
+    reply = stream(client, PROMPT)
+    assert SECRET not in reply
+    assert fake_model.calls[-1] == (PROMPT, 0)
+
+    login(None)
+    calls = len(fake_model.calls)
+    assert chat(client, PROMPT) == reply
+    assert len(fake_model.calls) == calls
+
+
+def test_follow_up_is_answered_with_the_history(client, login, fake_model):
+    login('risha')
+    chat(client, SECRET)
+    chat(client, PROMPT)
+    reply = chat(client, 'is it warm there in May?')
+    assert SECRET in reply and PROMPT in reply  # the cached exchange is resent with the history
+
+
+def test_failed_turn_is_not_recorded(app, client, login, fake_model):
+    login('risha')
+    chat(client, SECRET)
+    fake_model.failing.add('is it warm there in May?')
+    assert chat(client, 'is it warm there in May?') == gemini.FALLBACK_RESPONSE
+
+    with app.app_context():
+        from model.frostbyte import Frostbyte
+        user_id = Frostbyte.query.filter_by(_uid='risha').first().id
+    session = gemini.chat_sessions.sessions[user_id]
+    assert [turn['parts'][0] for turn in session.history if turn['role'] == 'user'] == [SECRET]
+    assert session.chat is None
@@ -0,0 +1,55 @@
+# test_chatbot_stream.py
+import json
+from model.frostbyte import Frostbyte
+from model.gemini import AIMessage
+
+"""
+Streamed chatbot replies
+
+POST /api/chatbot/stream answers with newline delimited JSON: a {"type": "chunk"} line per piece of the reply as
+the model produces it, then one {"type": "done"} line, and saves exactly one user and one AI message per turn.
+"""
+
+
+def stream(client, user_input):
+    response = client.post('/api/chatbot/stream', json={'user_input': user_input})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    body = response.get_data(as_text=True)
+    assert body.endswith('\n')
+    return [json.loads(line) for line in body.split('\n')[:-1]]
+
+
+def messages(app, user_id):
+    with app.app_context():
+        return [(message.category, message.message)
+                for message in AIMessage.query.filter_by(_user_id=user_id).order_by(AIMessage.id)]
+
+
+def test_stream_framing_and_one_message_pair_per_turn(app, client, login, fake_model):
+    with app.app_context():
+        user_id = Frostbyte.query.filter_by(_uid='risha').first().id
+    login('risha')
+
+    for turn, user_input in enumerate(['Plan a winter trip to Yellowstone', 'is it crowded then?'], start=1):
+        lines = stream(client, user_input)
+        chunks, done = lines[:-1], lines[-1]
+        assert len(chunks) > 1 and all(line['type'] == 'chunk' for line in chunks)
+        assert done['type'] == 'done'
+        assert done['model_response'] == ''.join(chunk['text'] for chunk in chunks)
+        assert done['user_input'] == user_input
+
+        saved = messages(app, user_id)
+        assert len(saved) == 2 * turn
+        assert saved[-2:] == [('user_message', user_input), ('ai_response', done['model_response'])]
+
+    # The follow-up was answered in the user's session, with the first prompt as context
+    assert 'Plan a winter trip to Yellowstone' in done['model_response']
+
+
+def test_stream_error_still_saves_one_message_pair(app, client, login, fake_model):
+    fake_model.failing.add('Where can I camp tonight?')
+    login(None)
+    lines = stream(client, 'Where can I camp tonight?')
+    assert [line['type'] for line in lines] == ['error', 'done']
+    assert messages(app, None) == [('user_message', 'Where can I camp tonight?'), ('ai_response', lines[-1]['model_response'])]
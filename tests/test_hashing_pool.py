@@ -0,0 +1,29 @@
+# test_hashing_pool.py
+import pytest
+from model import hashing
+
+"""
+Password hashing pool
+
+The hashing processes are spawned, not forked, since the pool is created from a request thread of a threaded worker.
+"""
+
+
+@pytest.fixture
+def hashing_pool(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_WORKERS', 1)
+    hashing._reset_pool()
+    yield
+    pool = hashing._get_pool()
+    hashing._reset_pool()
+    pool.shutdown()
+
+
+def test_pool_spawns_its_processes(hashing_pool):
+    assert hashing._get_pool()._mp_context.get_start_method() == 'spawn'
+
+    pwhash = hashing.hash_password('secret')
+    assert hashing.check_password(pwhash, 'secret')
+    assert not hashing.check_password(pwhash, 'wrong')
+    assert all(hashing.check_password(pwhash, password)
+               for pwhash, password in zip(hashing.hash_passwords(['a', 'b']), ['a', 'b']))
@@ -0,0 +1,41 @@
+# test_image_limits.py
+import struct
+import zlib
+from io import BytesIO
+import pytest
+from PIL import Image
+from model.images import decode_image
+
+"""
+Image size limit
+
+An upload is rejected from the size in its header when it has more than IMAGE_MAX_PIXELS pixels, before any
+pixel is decoded, including the sizes Pillow itself only warns about.
+"""
+
+
+def png(width, height):
+    """Returns a 1x1 PNG whose header claims width x height pixels."""
+    buffer = BytesIO()
+    Image.new('RGB', (1, 1)).save(buffer, 'PNG')
+    data = bytearray(buffer.getvalue())
+    ihdr = bytes(data[12:16]) + struct.pack('>II', width, height) + bytes(data[24:29])
+    data[16:24] = ihdr[4:12]
+    data[29:33] = struct.pack('>I', zlib.crc32(ihdr))
+    return bytes(data)
+
+
+def test_image_over_the_limit_is_rejected_before_decoding(app):
+    # More pixels than IMAGE_MAX_PIXELS but fewer than twice it, where Pillow only warns
+    with pytest.warns(Image.DecompressionBombWarning), pytest.raises(ValueError, match='too large'):
+        decode_image(png(10000, 8000))
+
+
+def test_image_within_the_limit_is_decoded(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'IMAGE_MAX_PIXELS', 100)
+    with pytest.raises(ValueError, match='too large'):
+        decode_image(png(20, 20))
+
+    buffer = BytesIO()
+    Image.new('RGB', (10, 10)).save(buffer, 'PNG')
+    assert decode_image(buffer.getvalue()).size == (10, 10)
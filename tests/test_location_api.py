@@ -0,0 +1,43 @@
+# test_location_api.py
+import pytest
+from model.channel import Channel
+
+"""
+Location API
+
+Locations are validated before they are stored: channel_id must be an integer ID and the coordinates numbers in
+range. JSON true and false are rejected, although Python treats bool as an int.
+"""
+
+
+@pytest.fixture
+def channel_id(app):
+    with app.app_context():
+        return Channel.query.first().id
+
+
+@pytest.mark.parametrize('field, value', [
+    ('channel_id', True), ('latitude', True), ('longitude', False), ('latitude', 91), ('longitude', '10')
+])
+def test_invalid_location_is_rejected(client, login, channel_id, field, value):
+    login('risha')
+    location = dict({'channel_id': channel_id, 'latitude': 32.7, 'longitude': -117.2}, **{field: value})
+    assert client.post('/api/location', json=location).status_code == 400
+
+    results = client.post('/api/locations/batch', json=[location]).get_json()
+    assert results['success_count'] == 0 and results['error_count'] == 1
+
+
+def test_valid_location_is_stored(client, login, channel_id):
+    login('risha')
+    response = client.post('/api/location', json={'channel_id': channel_id, 'latitude': 32, 'longitude': -117.2})
+    assert response.status_code == 200
+
+
+def test_nearest_parks_are_ranked_by_park_coordinates(client, login):
+    login('risha')
+    response = client.get('/api/locations/nearest?lat=63.1&lon=-151.2&k=2&by=park')
+    assert response.status_code == 200
+    parks = response.get_json()
+    assert [park['name'] for park in parks][:1] == ['Denali'] and len(parks) == 2
+    assert parks[0]['distance_km'] < 5 <= parks[1]['distance_km']
@@ -0,0 +1,26 @@
+# test_post_queries.py
+from __init__ import db
+from model.post import Post
+
+"""
+Query count of the post list
+
+GET /api/posts serializes every post with its user and channel. They are loaded in bulk, so the number of SQL
+statements stays the same however many posts there are, instead of growing with a lookup per post.
+"""
+
+MAX_POST_LIST_QUERIES = 3  # the posts, then their users and their channels with one IN query each
+
+
+def test_post_list_query_count(app, client, queries):
+    with app.app_context():
+        post_count = Post.query.count()
+        user_count = db.session.query(Post._user_id).distinct().count()
+    assert post_count > 1 and user_count > 1, 'the generated data should have posts by several users'
+
+    with queries() as statements:
+        response = client.get('/api/posts')
+
+    assert response.status_code == 200
+    assert len(response.get_json()) == post_count
+    assert len(statements) <= MAX_POST_LIST_QUERIES, '\n'.join(statements)
@@ -0,0 +1,36 @@
+# test_rating_stats.py
+from model.channel import Channel
+
+"""
+Channel ratings
+
+GET /api/rating answers from the stored rating totals of a channel, the rating rows are opt-in and paged.
+"""
+
+
+def test_rating_summary_comes_from_the_totals(app, client, login, queries):
+    with app.app_context():
+        channel_id = Channel.query.order_by(Channel.id.desc()).first().id
+    for uid, stars in (('risha', 5), ('abby', 3), ('ava', 3)):
+        login(uid)
+        assert client.post('/api/rating', json={'stars': stars, 'channel_id': channel_id}).status_code == 201
+
+    with queries() as statements:
+        response = client.get(f'/api/rating?channel_id={channel_id}')
+    assert response.status_code == 200
+    assert response.get_json() == {
+        'channel_id': channel_id, 'average': 3.7, 'count': 3,
+        'histogram': {'1': 0, '2': 0, '3': 2, '4': 0, '5': 1}
+    }
+    assert not [statement for statement in statements if 'FROM ratings' in statement]
+
+    first = client.get(f'/api/rating?channel_id={channel_id}&ratings=true&limit=2').get_json()
+    assert len(first['ratings']) == 2
+    last = client.get(f"/api/rating?channel_id={channel_id}&ratings=true&after={first['next_cursor']}").get_json()
+    assert len(last['ratings']) == 1 and last['next_cursor'] is None
+
+
+def test_rating_summary_of_unrated_channel(client, login):
+    login('risha')
+    assert client.get('/api/rating?channel_id=999999').status_code == 404
+    assert client.get('/api/rating?channel_id=abc').status_code == 400
@@ -0,0 +1,31 @@
+# test_review_api.py
+from model.channel import Channel
+
+"""
+Review API
+
+The review endpoints create, read, update and delete reviews, and list them with their users and channels.
+"""
+
+
+def test_review_crud_and_lists(app, client, login):
+    with app.app_context():
+        channel_id = Channel.query.first().id
+    login('abby')
+
+    created = client.post('/api/review', json={'title': 'Great', 'comment': 'Clear skies', 'channel_id': channel_id})
+    assert created.status_code == 200
+    review_id = created.get_json()['id']
+    assert client.get('/api/review', json={'id': review_id}).get_json()['title'] == 'Great'
+    updated = client.put('/api/review', json={'id': review_id, 'title': 'Greater', 'content': {}, 'channel_id': channel_id})
+    assert updated.get_json()['title'] == 'Greater'
+
+    results = client.post('/api/reviews', json=[{'title': 'Bulk', 'comment': 'one', 'channel_id': channel_id}, {'title': 'Bulk'}])
+    assert results.get_json()['success_count'] == 1 and results.get_json()['error_count'] == 1
+
+    titles = [review['title'] for review in client.post('/api/reviews/filter', json={'channel_id': channel_id}).get_json()]
+    assert titles == ['Greater', 'Bulk']
+    assert [review['user_name'] for review in client.get('/api/review/user').get_json()] == ['Abby Manalo'] * 2
+
+    assert client.delete('/api/review', json={'id': review_id}).status_code == 200
+    assert client.get('/api/review', json={'id': review_id}).status_code == 404
@@ -0,0 +1,42 @@
+# test_user_cache.py
+from __init__ import db
+from model.frostbyte import Frostbyte, _touch_stamp
+
+"""
+Authenticated user cache
+
+A signed in request is answered from the user cache without a database query, and a change to a user committed
+by any server worker takes effect on the next request through the user cache stamp.
+"""
+
+
+def current_role(client):
+    response = client.get('/api/id')
+    assert response.status_code == 200
+    return response.get_json()['role']
+
+
+def test_cache_hit_runs_no_user_query(client, login, queries):
+    login('abby')
+    current_role(client)
+    with queries() as statements:
+        current_role(client)
+    assert not [statement for statement in statements if 'frostbytes' in statement]
+
+
+def test_change_from_another_worker_is_seen_on_the_next_request(app, client, login):
+    login('elliot')
+    assert current_role(client) == 'User'
+
+    # Another worker commits the change: the row and the stamp change, this worker's cache is left as it is
+    with app.app_context():
+        db.session.execute(db.text("UPDATE frostbytes SET _role = 'Admin' WHERE _uid = 'elliot'"))
+        db.session.commit()
+    _touch_stamp()
+    assert current_role(client) == 'Admin'
+
+    with app.app_context():
+        user = Frostbyte.query.filter_by(_uid='elliot').first()
+        user._role = 'User'
+        db.session.commit()
+    assert current_role(client) == 'User'
@@ -0,0 +1,105 @@
+# test_weather_service.py
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+import api.weather_service as weather_service
+
+"""
+Weather service against a local fake of the weatherapi.com current conditions endpoint
+
+Concurrent lookups of one location make a single upstream call, and conditions are reused for WEATHER_TTL seconds,
+shared between a city name and nearby coordinates.
+"""
+
+CITIES = {'san diego': (32.72, -117.16)}
+UPSTREAM_DELAY = 0.2  # seconds each upstream call takes, so concurrent lookups overlap
+
+
+class FakeWeatherAPI(ThreadingHTTPServer):
+    """Answers current.json requests like weatherapi.com and counts the queries it receives."""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeWeatherHandler)
+        self.queries = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/v1/current.json'
+
+
+class FakeWeatherHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)['q'][0]
+        with self.server.lock:
+            self.server.queries.append(query)
+        time.sleep(UPSTREAM_DELAY)
+        if query in CITIES:
+            lat, lon = CITIES[query]
+        else:
+            try:
+                lat, lon = (float(value) for value in query.split(','))
+            except ValueError:
+                self.send_error(400)  # no matching location
+                return
+        body = json.dumps({
+            'location': {'lat': lat, 'lon': lon},
+            'current': {'temp_c': 21.0, 'condition': {'text': 'Sunny'}, 'humidity': 40, 'pressure_mb': 1015.0,
+                        'wind_kph': 8.0}
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def upstream(app, monkeypatch):
+    """Points the weather service at a local fake API, with empty caches."""
+    server = FakeWeatherAPI()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setitem(app.config, 'WEATHER_API_URL', server.url)
+    weather_service.geocode_cache.clear()
+    weather_service.conditions_cache.clear()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_concurrent_lookups_make_one_upstream_call(upstream):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: weather_service.current_by_city('San-Diego'), range(8)))
+    assert upstream.queries == ['san diego']
+    assert all(result == results[0] for result in results)
+    assert results[0]['temperature'] == 21.0
+
+
+def test_conditions_are_cached_for_the_ttl(upstream, monkeypatch):
+    monkeypatch.setattr(weather_service.conditions_cache, 'ttl', 0.5)
+    weather_service.current_by_coordinates(40.001, -105.002)
+    weather_service.current_by_coordinates(40.0, -105.0)  # the same rounded key
+    assert upstream.queries == ['40.0,-105.0']
+
+    time.sleep(0.6)
+    weather_service.current_by_coordinates(40.0, -105.0)
+    assert len(upstream.queries) == 2
+
+
+def test_city_and_coordinates_share_one_entry(upstream):
+    weather_service.current_by_city('san diego')
+    weather_service.current_by_coordinates(32.7201, -117.1601)
+    weather_service.current_by_city('SAN DIEGO ')
+    assert upstream.queries == ['san diego']
+
+
+def test_unknown_city_is_not_found(upstream):
+    assert weather_service.current_by_city('Atlantis') is None